@@ -0,0 +1,173 @@
+import argparse
+import http.client
+import random
+import signal
+import socket
+import threading
+import time
+from collections import deque
+import config
+
+# Keep UDP datagrams under a typical Ethernet MTU
+MAX_DATAGRAM_BYTES = 1400
+
+def format_line(metric, value, host, labels=None, timestamp=None):
+    """Format one point in the ingest line protocol"""
+    tags = ''.join(f",{key}={value}" for key, value in sorted((labels or {}).items()))
+    line = f"{metric},host={host}{tags} {value}"
+    return f"{line} {timestamp}" if timestamp is not None else line
+
+def parse_labels(text):
+    """Parse a 'key=value,key=value' label string (as agents send and storage keeps it) into a dict"""
+    return dict(pair.split('=', 1) for pair in text.split(',') if pair) if text else {}
+
+class MetricsAgent:
+    def __init__(self, host_name, labels=None, server=None, http_port=None, udp_port=None, transport='http'):
+        self.host_name = host_name
+        self.labels = labels or {}
+        self.server = server or config.INGEST_CONFIG['bind_address']
+        self.http_port = http_port or config.INGEST_CONFIG['http_port']
+        self.udp_port = udp_port or config.INGEST_CONFIG['udp_port']
+        self.transport = transport
+
+        # Lines refused by the server (503) are held and resent with the next batch
+        self.backlog = deque(maxlen=config.INGEST_CONFIG['agent_backlog'])
+        self.sent = 0
+        self.deferred = 0
+        self.dropped = 0
+        self._connection = None
+        self._socket = None
+
+    def lines_for(self, sample):
+        """Format every numeric metric in a sample as protocol lines"""
+        timestamp = sample['timestamp'].timestamp() if 'timestamp' in sample else time.time()
+        return [
+            format_line(metric, value, self.host_name, self.labels, round(timestamp, 3))
+            for metric, value in sample.items()
+            if metric != 'timestamp' and isinstance(value, (int, float))
+        ]
+
+    def send(self, sample):
+        """Push one sample, plus anything held back earlier; returns False if the server pushed back or refused it"""
+        lines = list(self.backlog) + self.lines_for(sample)
+        self.backlog.clear()
+        if self.transport == 'udp':
+            self._send_udp(lines)
+            self.sent += len(lines)
+            return True
+
+        try:
+            status = self._post(lines)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Failed to send metrics: {str(e)}")
+            self._close()
+            status = None
+
+        if status == 202:
+            self.sent += len(lines)
+            return True
+        if status is None or status == 503:
+            # The backlog is bounded, so past its size the oldest lines fall off the front
+            overflow = len(lines) - self.backlog.maxlen
+            if overflow > 0:
+                print(f"Dropped the {overflow} oldest held-back metric lines; the agent backlog is full")
+                self.dropped += overflow
+            self.backlog.extend(lines)
+            self.deferred += 1
+            return False
+        # Any other status (a 400 for a malformed batch, say) would be refused again on every retry
+        print(f"Dropped {len(lines)} metric lines refused with HTTP {status}")
+        self.dropped += len(lines)
+        return False
+
+    def _post(self, lines):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.server, self.http_port, timeout=10)
+        self._connection.request(
+            'POST', '/ingest', body='\n'.join(lines).encode('utf-8'), headers={'Content-Type': 'text/plain'}
+        )
+        response = self._connection.getresponse()
+        response.read()
+        return response.status
+
+    def _send_udp(self, lines):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        datagram = []
+        size = 0
+        for line in lines:
+            encoded = line.encode('utf-8')
+            if datagram and size + len(encoded) + 1 > MAX_DATAGRAM_BYTES:
+                self._socket.sendto(b'\n'.join(datagram), (self.server, self.udp_port))
+                datagram, size = [], 0
+            datagram.append(encoded)
+            size += len(encoded) + 1
+        if datagram:
+            self._socket.sendto(b'\n'.join(datagram), (self.server, self.udp_port))
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def close(self):
+        """Close the HTTP connection and UDP socket"""
+        self._close()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+def simulated_sample():
+    """Random system and server metrics for a simulated fleet host"""
+    return {
+        'cpu_usage': random.uniform(5, 95),
+        'memory_usage': random.uniform(20, 90),
+        'disk_usage': random.uniform(30, 95),
+        'response_time': random.uniform(200, 3000),
+        'requests_per_second': random.randint(100, 1000),
+        'error_rate': random.uniform(0.1, 8.0)
+    }
+
+def main(argv=None):
+    """Push this machine's metrics, or a simulated fleet's, to an ingest server"""
+    parser = argparse.ArgumentParser(description="Push metrics to a MetricsDashboard ingest server")
+    parser.add_argument('--host-name', default=socket.gethostname())
+    parser.add_argument('--labels', default='', help="extra labels, e.g. region=eu,role=web")
+    parser.add_argument('--server', default=config.INGEST_CONFIG['bind_address'])
+    parser.add_argument('--http-port', type=int, default=config.INGEST_CONFIG['http_port'])
+    parser.add_argument('--udp-port', type=int, default=config.INGEST_CONFIG['udp_port'])
+    parser.add_argument('--transport', choices=['http', 'udp'], default='http')
+    parser.add_argument('--interval', type=float, default=config.COLLECTOR_INTERVAL, help="seconds between pushes")
+    parser.add_argument('--simulate', type=int, default=0, help="push random metrics for this many fake hosts")
+    args = parser.parse_args(argv)
+
+    shutdown = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: shutdown.set())
+
+    labels = parse_labels(args.labels)
+    names = [f"{args.host_name}-{i}" for i in range(args.simulate)] if args.simulate else [args.host_name]
+    agents = [
+        MetricsAgent(name, labels, args.server, args.http_port, args.udp_port, args.transport)
+        for name in names
+    ]
+
+    sampler = None
+    if not args.simulate:
+        from sampler import SystemSampler
+        sampler = SystemSampler()
+        sampler.start()
+
+    print(f"Pushing metrics for {len(agents)} host(s) to {args.server} over {args.transport}")
+    while not shutdown.wait(args.interval):
+        for agent in agents:
+            agent.send(simulated_sample() if sampler is None else sampler.latest())
+
+    for agent in agents:
+        agent.close()
+    if sampler is not None:
+        sampler.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import math
+import threading
+from collections import deque
+from itertools import islice
+import numpy as np
+from storage import to_epoch
+import config
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values):
+        """Build stats for an array of values in one vectorized pass"""
+        stats = cls()
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            stats.count = len(values)
+            stats.total = float(values.sum())
+            stats.mean = stats.total / stats.count
+            stats.m2 = float(((values - stats.mean) ** 2).sum())
+            stats.min = float(values.min())
+            stats.max = float(values.max())
+        return stats
+
+    def add(self, value):
+        """Fold one value in with Welford's update"""
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Fold another set of stats in (Chan's parallel combination)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.total, self.mean, self.m2 = other.count, other.total, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        return RunningStats().merge(self)
+
+    @property
+    def variance(self):
+        """Sample variance, matching pandas' default ddof=1"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def snapshot(self):
+        """Current stats as a plain dict"""
+        empty = self.count == 0
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.mean if not empty else None,
+            'min': self.min if not empty else None,
+            'max': self.max if not empty else None,
+            'variance': self.variance,
+            'std': math.sqrt(self.variance)
+        }
+
+class WindowedStats:
+    def __init__(self, window, bucket):
+        self.window = window
+        self.bucket = bucket
+        self.buckets = deque()
+        self._closed = None
+
+    def _bucket_for(self, start):
+        """Get the bucket starting at start, opening it if it is the newest"""
+        if not self.buckets or start > self.buckets[-1][0]:
+            self.buckets.append((start, RunningStats()))
+            self._closed = None
+            return self.buckets[-1][1]
+        if start == self.buckets[-1][0]:
+            return self.buckets[-1][1]
+
+        # Late sample: fold it into its bucket if that is still held
+        self._closed = None
+        for bucket_start, stats in self.buckets:
+            if bucket_start == start:
+                return stats
+        return None
+
+    def add(self, timestamp, value):
+        """Add a sample to its time bucket and expire buckets past the window"""
+        stats = self._bucket_for(timestamp - timestamp % self.bucket)
+        if stats is not None:
+            stats.add(value)
+        self.expire(timestamp)
+
+    def extend(self, timestamps, values):
+        """Add sorted arrays of samples, pre-aggregating each bucket in bulk"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        starts = timestamps - timestamps % self.bucket
+        bounds = np.flatnonzero(np.diff(starts)) + 1
+        for chunk_starts, chunk in zip(np.split(starts, bounds), np.split(np.asarray(values, dtype=np.float64), bounds)):
+            stats = self._bucket_for(float(chunk_starts[0]))
+            if stats is not None:
+                stats.merge(RunningStats.from_values(chunk))
+        self.expire(float(timestamps[-1]))
+
+    def expire(self, now):
+        """Drop buckets that ended before the start of the window"""
+        cutoff = now - self.window
+        while self.buckets and self.buckets[0][0] + self.bucket <= cutoff:
+            self.buckets.popleft()
+            self._closed = None
+
+    def stats(self, now=None):
+        """Stats over the window, to bucket granularity"""
+        if now is not None:
+            self.expire(now)
+        if not self.buckets:
+            return RunningStats()
+
+        # Closed buckets only change when one opens or expires, so their merge
+        # is cached and each read only folds in the open bucket
+        if self._closed is None:
+            self._closed = RunningStats()
+            for _, stats in islice(self.buckets, len(self.buckets) - 1):
+                self._closed.merge(stats)
+        return self._closed.copy().merge(self.buckets[-1][1])
+
+class MetricAggregator:
+    def __init__(self, metrics=None, windows=None):
+        self.metrics = metrics or config.AGGREGATE_CONFIG['metrics']
+        self.windows = windows or config.AGGREGATE_CONFIG['windows']
+        self.totals = {metric: RunningStats() for metric in self.metrics}
+        self.windowed = {
+            name: {metric: WindowedStats(window, bucket) for metric in self.metrics}
+            for name, (window, bucket) in self.windows.items()
+        }
+        self._lock = threading.Lock()
+
+    def add(self, sample):
+        """Fold one sample into the lifetime and windowed stats"""
+        timestamp = to_epoch(sample['timestamp'])
+        with self._lock:
+            for metric in self.metrics:
+                value = sample.get(metric)
+                if value is None:
+                    continue
+                value = float(value)
+                self.totals[metric].add(value)
+                for series in self.windowed.values():
+                    series[metric].add(timestamp, value)
+
+    def backfill(self, df):
+        """Seed the stats from a wide DataFrame such as MetricsStorage.query_window returns"""
+        if len(df) == 0:
+            return
+        df = df.sort_values('timestamp')
+        timestamps = df['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64) / 1e9
+        with self._lock:
+            for metric in self.metrics:
+                if metric not in df:
+                    continue
+                values = df[metric].to_numpy(dtype=np.float64)
+                keep = ~np.isnan(values)
+                self.totals[metric].merge(RunningStats.from_values(values[keep]))
+                for series in self.windowed.values():
+                    series[metric].extend(timestamps[keep], values[keep])
+
+    def stats(self, metric, window=None, now=None):
+        """Stats for one metric, over its lifetime or a named window such as '1h'"""
+        with self._lock:
+            if window is None:
+                return self.totals[metric].snapshot()
+            now = to_epoch(now) if now is not None else None
+            return self.windowed[window][metric].stats(now).snapshot()
+
+    def summary(self, window=None, now=None):
+        """Stats for every metric as {metric: stats}"""
+        return {metric: self.stats(metric, window, now) for metric in self.metrics}
@@ -0,0 +1,106 @@
+import bisect
+import math
+import threading
+from collections import Counter, defaultdict, deque
+from itertools import islice
+import config
+
+class AlertStore:
+    def __init__(self, capacity=None, storage=None):
+        self.capacity = capacity or config.ALERT_HISTORY_SIZE
+        self.storage = storage
+
+        # Alerts by sequence number, with insertion order for eviction and the
+        # time index plus per-field indexes as sorted (timestamp, seq) lists;
+        # ingested batches carry remote timestamps, so arrival order is not time order
+        self.order = deque(maxlen=self.capacity)
+        self.alerts = {}
+        self.by_time = []
+        self.by_metric = defaultdict(list)
+        self.by_severity = defaultdict(list)
+        self.severity_counts = Counter()
+        self.next_seq = 0
+        self._lock = threading.Lock()
+
+        if storage is not None:
+            self.load(storage.query_alerts(limit=self.capacity))
+
+    def _insert(self, alert):
+        # Evict the oldest arrival first
+        if len(self.order) == self.capacity:
+            oldest = self.order.popleft()
+            evicted = self.alerts.pop(oldest)
+            key = (evicted['timestamp'], oldest)
+            for index in (self.by_time, self.by_metric[evicted['metric']], self.by_severity[evicted['severity']]):
+                del index[bisect.bisect_left(index, key)]
+            self.severity_counts[evicted['severity']] -= 1
+
+        seq = self.next_seq
+        self.next_seq += 1
+        self.order.append(seq)
+        self.alerts[seq] = alert
+        # Alerts mostly arrive in time order, so these inserts are mostly appends
+        key = (alert['timestamp'], seq)
+        bisect.insort(self.by_time, key)
+        bisect.insort(self.by_metric[alert['metric']], key)
+        bisect.insort(self.by_severity[alert['severity']], key)
+        self.severity_counts[alert['severity']] += 1
+
+    def load(self, alerts):
+        """Insert alerts that are already persisted, oldest first"""
+        with self._lock:
+            for alert in alerts:
+                self._insert(alert)
+
+    def add(self, alert):
+        """Record an alert in memory and in persistent storage"""
+        with self._lock:
+            self._insert(alert)
+        if self.storage is not None:
+            self.storage.write_alert(alert)
+
+    def recent(self, limit=10):
+        """Get the newest alerts, oldest first"""
+        with self._lock:
+            return [self.alerts[seq] for seq in reversed(list(islice(reversed(self.order), limit)))]
+
+    def query(self, metric=None, severity=None, start=None, end=None, limit=None):
+        """Filter alerts by metric, severity and time range, newest first"""
+        with self._lock:
+            # Bisect the time range out of the narrowest index, then walk it newest first
+            keys = self.by_time
+            if metric is not None:
+                keys = self.by_metric.get(metric, [])
+            if severity is not None:
+                by_severity = self.by_severity.get(severity, [])
+                if len(by_severity) < len(keys):
+                    keys = by_severity
+
+            first = bisect.bisect_left(keys, (start,)) if start is not None else 0
+            last = bisect.bisect_right(keys, (end, math.inf)) if end is not None else len(keys)
+
+            # Alerts sharing a timestamp come newest-arrival first
+            results = []
+            for position in range(last - 1, first - 1, -1):
+                alert = self.alerts[keys[position][1]]
+                if metric is not None and alert['metric'] != metric:
+                    continue
+                if severity is not None and alert['severity'] != severity:
+                    continue
+                results.append(alert)
+                if len(results) == limit:
+                    break
+            return results
+
+    def counts(self):
+        """Get the number of alerts held per severity"""
+        with self._lock:
+            return {severity: count for severity, count in self.severity_counts.items() if count}
+
+    def metrics(self):
+        """Get the metrics that currently have alerts"""
+        with self._lock:
+            return sorted(metric for metric, seqs in self.by_metric.items() if seqs)
+
+    def __len__(self):
+        return len(self.order)
@@ -1,14 +1,25 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+import numpy as np
 import config
+from alert_store import AlertStore
+from notifications import NotificationDispatcher
+from rule_engine import RuleEngine
 
 class AlertSystem:
-    def __init__(self):
-        self.alert_history = []
+    def __init__(self, storage=None):
+        self.alert_store = AlertStore(storage=storage)
         self.last_alert_time = {}
         self.cooldown_period = 300  # 5 minutes in seconds
+        self.notifier = NotificationDispatcher()
+        self.rule_engine = RuleEngine(config.ALERT_RULES)
+        # Remote hosts each get their own rule windows so their samples never mix with local ones
+        self.host_rule_engines = {}
+        
+        # Cooldown state for batch evaluation: one row per host, one column per threshold metric
+        self._batch_metrics = list(config.ALERT_THRESHOLDS)
+        self._batch_hosts = {}
+        self._batch_last_alert = np.full((0, len(self._batch_metrics)), -np.inf)
+        self._batch_rows_cache = None
         
     def check_thresholds(self, metrics):
         """Check if any metrics exceed defined thresholds"""
@@ -36,12 +47,135 @@ class AlertSystem:
                         
         return alerts
     
+    def check_rules(self, metrics, host=None):
+        """Feed a sample from the local collector (or a remote host) to the windowed alert rules and return any that started firing"""
+        if host is None:
+            return self.rule_engine.evaluate(metrics)
+        
+        engine = self.host_rule_engines.get(host)
+        if engine is None:
+            engine = self.host_rule_engines[host] = RuleEngine(config.ALERT_RULES)
+        alerts = engine.evaluate(metrics)
+        for alert in alerts:
+            alert['host'] = host
+        return alerts
+    
+    def check_anomalies(self, scores, current_time=None):
+        """Raise alerts for metrics whose anomaly score crosses the configured limit"""
+        alerts = []
+        current_time = current_time or datetime.now()
+        threshold = config.ANOMALY_CONFIG['score_threshold']
+        
+        for metric, result in scores.items():
+            key = f"anomaly:{metric}"
+            if result['score'] >= threshold and self._can_send_alert(key, current_time):
+                alerts.append({
+                    'metric': metric,
+                    'value': result['value'],
+                    'threshold': threshold,
+                    'timestamp': current_time,
+                    'severity': 'CRITICAL' if result['score'] >= config.ANOMALY_CONFIG['critical_score'] else 'HIGH',
+                    'rule': 'anomaly',
+                    'expr': f"{result['detector']} anomaly score {result['score']:.1f} >= {threshold:g}",
+                    'anomaly_score': result['score']
+                })
+                self.last_alert_time[key] = current_time
+        
+        return alerts
+    
+    def check_thresholds_batch(self, hosts, metrics, values, current_time=None):
+        """Check a hosts x metrics block of samples against thresholds in one vectorized pass"""
+        current_time = current_time or datetime.now()
+        now = current_time.timestamp()
+        values = np.asarray(values, dtype=np.float64).reshape(len(hosts), len(metrics))
+        
+        # Only columns with a configured threshold take part
+        columns = [i for i, metric in enumerate(metrics) if metric in config.ALERT_THRESHOLDS]
+        if not columns or not len(hosts):
+            return []
+        names = [metrics[i] for i in columns]
+        block = values[:, columns]
+        thresholds = np.array([config.ALERT_THRESHOLDS[name] for name in names])
+        above = np.array([config.ALERT_DIRECTIONS.get(name) == 'above' for name in names])
+        below = np.array([config.ALERT_DIRECTIONS.get(name) == 'below' for name in names])
+        
+        with np.errstate(invalid='ignore'):
+            exceeded = (above & (block > thresholds)) | (below & (block < thresholds))
+        
+        # Cooldown is tracked per (host, metric)
+        rows = self._batch_host_rows(hosts)
+        state_columns = np.array([self._batch_metrics.index(name) for name in names])
+        last_alert = self._batch_last_alert[np.ix_(rows, state_columns)]
+        fired = exceeded & (now - last_alert >= self.cooldown_period)
+        if not fired.any():
+            return []
+        
+        host_idx, metric_idx = np.nonzero(fired)
+        self._batch_last_alert[rows[host_idx], state_columns[metric_idx]] = now
+        
+        # Severity bands, applied least severe first so stronger bands overwrite
+        severity_names = [config.ALERT_DEFAULT_SEVERITY]
+        severity = np.zeros(block.shape, dtype=np.int64)
+        depth = max((len(config.ALERT_SEVERITY_BANDS.get(name, [])) for name in names), default=0)
+        for level in reversed(range(depth)):
+            multipliers = np.full(len(names), np.nan)
+            codes = np.zeros(len(names), dtype=np.int64)
+            for j, name in enumerate(names):
+                bands = config.ALERT_SEVERITY_BANDS.get(name, [])
+                if level < len(bands):
+                    multipliers[j] = bands[level][0]
+                    if bands[level][1] not in severity_names:
+                        severity_names.append(bands[level][1])
+                    codes[j] = severity_names.index(bands[level][1])
+            limits = thresholds * multipliers
+            with np.errstate(invalid='ignore'):
+                in_band = (above & (block > limits)) | (below & (block < limits))
+            severity = np.where(in_band, codes, severity)
+        
+        return [
+            {
+                'host': hosts[h],
+                'metric': names[m],
+                'value': value,
+                'threshold': float(thresholds[m]),
+                'timestamp': current_time,
+                'severity': severity_names[code]
+            }
+            for h, m, value, code in zip(
+                host_idx.tolist(), metric_idx.tolist(),
+                block[host_idx, metric_idx].tolist(), severity[host_idx, metric_idx].tolist()
+            )
+        ]
+    
+    def _batch_host_rows(self, hosts):
+        """Map hosts to cooldown rows, reusing the mapping when the host list repeats"""
+        hosts = tuple(hosts)
+        if self._batch_rows_cache is not None and self._batch_rows_cache[0] == hosts:
+            return self._batch_rows_cache[1]
+        
+        rows = np.array([self._batch_host_row(host) for host in hosts], dtype=np.int64)
+        self._batch_rows_cache = (hosts, rows)
+        return rows
+    
+    def _batch_host_row(self, host):
+        """Get the cooldown row for a host, growing the state matrix on first sight"""
+        row = self._batch_hosts.get(host)
+        if row is None:
+            row = len(self._batch_hosts)
+            self._batch_hosts[host] = row
+            if row >= len(self._batch_last_alert):
+                grown = np.full((max(16, 2 * row), len(self._batch_metrics)), -np.inf)
+                grown[:len(self._batch_last_alert)] = self._batch_last_alert
+                self._batch_last_alert = grown
+        return row
+    
     def _is_threshold_exceeded(self, metric, value, threshold):
         """Check if a specific metric exceeds its threshold"""
-        if metric in ['cpu_usage', 'memory_usage', 'error_rate', 'response_time']:
+        direction = config.ALERT_DIRECTIONS.get(metric)
+        if direction == 'above':
             return value > threshold
-        elif metric == 'revenue':
-            return value < threshold  # Alert if revenue drops below threshold
+        elif direction == 'below':
+            return value < threshold  # e.g. alert if revenue drops below threshold
         return False
     
     def _can_send_alert(self, metric, current_time):
@@ -54,65 +188,29 @@ class AlertSystem:
     
     def _get_severity(self, metric, value, threshold):
         """Determine alert severity"""
-        if metric in ['cpu_usage', 'memory_usage']:
-            if value > threshold * 1.2:
-                return 'CRITICAL'
-            elif value > threshold * 1.1:
-                return 'HIGH'
-            else:
-                return 'MEDIUM'
-        elif metric == 'error_rate':
-            if value > threshold * 2:
-                return 'CRITICAL'
-            else:
-                return 'HIGH'
-        else:
-            return 'MEDIUM'
+        for multiplier, severity in config.ALERT_SEVERITY_BANDS.get(metric, []):
+            if self._is_threshold_exceeded(metric, value, threshold * multiplier):
+                return severity
+        return config.ALERT_DEFAULT_SEVERITY
     
     def send_email_alert(self, alert):
-        """Send email notification for alerts"""
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = config.EMAIL_CONFIG['sender_email']
-            msg['To'] = config.EMAIL_CONFIG['recipient_email']
-            msg['Subject'] = f"🚨 KPI Alert: {alert['metric'].upper()} - {alert['severity']}"
-            
-            body = f"""
-            Alert Details:
-            
-            Metric: {alert['metric'].replace('_', ' ').title()}
-            Current Value: {alert['value']:.2f}
-            Threshold: {alert['threshold']:.2f}
-            Severity: {alert['severity']}
-            Time: {alert['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
-            
-            Please investigate immediately.
-            
-            MetricsDashboard Alert System
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            server = smtplib.SMTP(config.EMAIL_CONFIG['smtp_server'], config.EMAIL_CONFIG['smtp_port'])
-            server.starttls()
-            server.login(config.EMAIL_CONFIG['sender_email'], config.EMAIL_CONFIG['sender_password'])
-            text = msg.as_string()
-            server.sendmail(config.EMAIL_CONFIG['sender_email'], config.EMAIL_CONFIG['recipient_email'], text)
-            server.quit()
-            
-            return True
-        except Exception as e:
-            print(f"Failed to send email alert: {str(e)}")
-            return False
+        """Queue an email notification for an alert"""
+        # Delivery, batching and retries happen on the dispatcher's worker thread
+        self.notifier.start()
+        return self.notifier.submit(alert)
     
     def log_alert(self, alert):
         """Log alert to history"""
-        self.alert_history.append(alert)
-        
-        # Keep only last 100 alerts
-        if len(self.alert_history) > 100:
-            self.alert_history = self.alert_history[-100:]
+        self.alert_store.add(alert)
     
     def get_recent_alerts(self, limit=10):
         """Get recent alerts"""
-        return self.alert_history[-limit:] if self.alert_history else []
+        return self.alert_store.recent(limit)
+    
+    def query_alerts(self, metric=None, severity=None, start=None, end=None, limit=None):
+        """Filter alert history by metric, severity and time range, newest first"""
+        return self.alert_store.query(metric, severity, start, end, limit)
+    
+    def get_alert_counts(self):
+        """Get the number of alerts in history per severity"""
+        return self.alert_store.counts()
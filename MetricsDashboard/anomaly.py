@@ -0,0 +1,117 @@
+import math
+from datetime import datetime
+import config
+
+# Scales a median absolute deviation to a standard deviation for normal data
+MAD_TO_SIGMA = 1.4826
+
+class EWMAStats:
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def score(self, value):
+        """Z-score of a value against the current mean and variance"""
+        if self.count == 0 or self.var <= 0:
+            return 0.0
+        return (value - self.mean) / math.sqrt(self.var)
+
+    def update(self, value):
+        """Fold a value into the exponentially weighted mean and variance"""
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return
+
+        diff = value - self.mean
+        increment = self.alpha * diff
+        self.mean += increment
+        self.var = (1 - self.alpha) * (self.var + diff * increment)
+
+class StreamingMedian:
+    def __init__(self, step):
+        self.step = step
+        self.median = 0.0
+        self.mad = 0.0
+        self.spread = 0.0
+        self.count = 0
+
+    def score(self, value):
+        """Robust z-score of a value against the running median and MAD"""
+        if self.count == 0 or self.mad <= 0:
+            return 0.0
+        return (value - self.median) / (MAD_TO_SIGMA * self.mad)
+
+    def update(self, value):
+        """Nudge the median and MAD estimates toward the value in constant memory"""
+        self.count += 1
+        if self.count == 1:
+            self.median = value
+            return
+
+        # Frugal quantile estimation: step toward each sample by a fraction of
+        # the typical spread, which converges on the median (and on the median
+        # of absolute deviations) without keeping any samples
+        deviation = abs(value - self.median)
+        self.spread += self.step * (deviation - self.spread)
+        increment = self.step * self.spread
+
+        if value > self.median:
+            self.median += increment
+        elif value < self.median:
+            self.median -= increment
+
+        if deviation > self.mad:
+            self.mad += increment
+        elif deviation < self.mad:
+            self.mad = max(self.mad - increment, 0.0)
+
+class SeriesAnomalyDetector:
+    def __init__(self, settings=None):
+        self.settings = {**config.ANOMALY_CONFIG, **(settings or {})}
+        self.ewma = EWMAStats(self.settings['ewma_alpha'])
+        self.robust = StreamingMedian(self.settings['robust_step'])
+        self.seasonal = [EWMAStats(self.settings['seasonal_alpha']) for _ in range(24)]
+
+    def update(self, value, timestamp):
+        """Score a value against each baseline, then fold it into them"""
+        warmup = self.settings['warmup_samples']
+        baseline = self.seasonal[timestamp.hour]
+
+        scores = {
+            'ewma': self.ewma.score(value) if self.ewma.count >= warmup else 0.0,
+            'robust': self.robust.score(value) if self.robust.count >= warmup else 0.0,
+            'seasonal': baseline.score(value) if baseline.count >= warmup else 0.0
+        }
+        detector = max(scores, key=lambda name: abs(scores[name]))
+        scores['score'] = abs(scores[detector])
+        scores['detector'] = detector
+
+        self.ewma.update(value)
+        self.robust.update(value)
+        baseline.update(value)
+        return scores
+
+class AnomalyMonitor:
+    def __init__(self, metrics=None, settings=None):
+        self.metrics = metrics or config.ANOMALY_CONFIG['metrics']
+        self.settings = settings
+        self.detectors = {}
+        self.latest_scores = {}
+
+    def update(self, sample):
+        """Score every monitored metric in a sample and return {metric: scores}"""
+        timestamp = sample.get('timestamp') or datetime.now()
+        scores = {}
+        for metric in self.metrics:
+            if metric not in sample:
+                continue
+            detector = self.detectors.get(metric)
+            if detector is None:
+                detector = self.detectors[metric] = SeriesAnomalyDetector(self.settings)
+            scores[metric] = {'value': sample[metric], **detector.update(float(sample[metric]), timestamp)}
+
+        self.latest_scores = scores
+        return scores
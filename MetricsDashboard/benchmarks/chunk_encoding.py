@@ -0,0 +1,71 @@
+# Benchmark: list of {timestamp, value} dicts vs. compressed ChunkedSeries history
+# Run from the MetricsDashboard directory: python -m benchmarks.chunk_encoding
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from chunk_encoding import ChunkedSeries
+
+def make_series(seconds, rng):
+    """One host's metric at 1 s cadence with a little jitter, in a few value shapes"""
+    start = datetime(2024, 1, 1)
+    timestamps = (start - datetime(1970, 1, 1)).total_seconds() + np.arange(seconds) + rng.uniform(-0.002, 0.002, seconds)
+    walk = np.clip(50 + np.cumsum(rng.normal(0, 0.5, seconds)), 0, 100)
+    return start, timestamps, {
+        'cpu (0.1 steps)': np.round(walk, 1),
+        'requests (ints)': np.round(walk * 10),
+        'flag (constant)': np.ones(seconds),
+        'random float': rng.uniform(0, 100, seconds)
+    }
+
+def measure(build):
+    """Time a build function, then rebuild under tracemalloc for the memory it holds"""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, held
+
+def main(days=1):
+    rng = np.random.default_rng(42)
+    seconds = int(days * 86400)
+    start, timestamps, shapes = make_series(seconds, rng)
+    offsets = (timestamps - timestamps[0]).tolist()
+    print(f"{seconds} samples ({days} day(s) of 1 s data) per series")
+    print(f"{'values':<16} {'repr':<8} {'B/sample':>9} {'write M/s':>10} {'read M/s':>9}")
+
+    for name, values in shapes.items():
+        python_values = values.tolist()
+        dicts, write, held = measure(lambda: [
+            {'timestamp': start + timedelta(seconds=offset), 'value': value} for offset, value in zip(offsets, python_values)
+        ])
+        began = time.perf_counter()
+        total = sum(row['value'] for row in dicts)
+        read = time.perf_counter() - began
+        print(f"{name:<16} {'dicts':<8} {held / seconds:>9.2f} {seconds / write / 1e6:>10.2f} {seconds / read / 1e6:>9.2f}")
+        del dicts
+
+        series, write, held = measure(lambda: _extend(timestamps, values))
+        began = time.perf_counter()
+        _, decoded = series.arrays()
+        read = time.perf_counter() - began
+        assert np.array_equal(decoded, values) and abs(decoded.sum() - total) < 1e-6 * max(abs(total), 1)
+        print(f"{'':<16} {'chunks':<8} {series.nbytes / seconds:>9.2f} {seconds / write / 1e6:>10.2f} {seconds / read / 1e6:>9.2f}")
+
+    # The collector appends one sample at a time rather than in arrays
+    series = ChunkedSeries()
+    began = time.perf_counter()
+    for stamp, value in zip(timestamps.tolist(), shapes['cpu (0.1 steps)'].tolist()):
+        series.append(stamp, value)
+    print(f"single-sample append: {seconds / (time.perf_counter() - began) / 1e6:.2f} M/s")
+
+def _extend(timestamps, values):
+    series = ChunkedSeries()
+    series.extend(timestamps, values)
+    return series
+
+if __name__ == '__main__':
+    main()
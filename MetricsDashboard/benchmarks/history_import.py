@@ -0,0 +1,34 @@
+# Benchmark: bulk CSV history import, fresh and re-run (every row already stored)
+# Run from the MetricsDashboard directory: python -m benchmarks.history_import
+import os
+import tempfile
+from data_generator import DataGenerator
+from storage import MetricsStorage
+from segments import SegmentStore
+from importer import import_history
+
+def write_csv(path, days, seed=42):
+    """Write 1 s history in the generate_historical_data schema, one block at a time"""
+    for i, df in enumerate(DataGenerator().iter_historical_data(days=days, freq='s', seed=seed, chunk_size=250000)):
+        df.to_csv(path, mode='a' if i else 'w', header=not i, index=False)
+
+def main(days=3):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'history.csv')
+        write_csv(path, days)
+        size_mb = os.path.getsize(path) / 1e6
+
+        storage = MetricsStorage(db_path=os.path.join(directory, 'metrics.db'))
+        segments = SegmentStore(directory=os.path.join(directory, 'segments'))
+        print(f"{days} day(s) of 1 s history, {size_mb:.0f} MB CSV")
+        print(f"{'run':<8} {'rows':>9} {'inserted':>9} {'seconds':>8} {'rows/s':>9} {'MB/s':>6}")
+        for run in ('fresh', 're-run'):
+            stats = import_history(path, storage, segments)
+            print(
+                f"{run:<8} {stats['rows']:>9} {stats['inserted']:>9} {stats['seconds']:>8.1f} "
+                f"{stats['rows'] / stats['seconds']:>9.0f} {size_mb / stats['seconds']:>6.1f}"
+            )
+        storage.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Benchmark: range reads from SQLite (query_window) vs. memory-mapped history segments
+# Run from the MetricsDashboard directory: python -m benchmarks.segment_reads
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from storage import MetricsStorage, to_epoch
+from segments import SegmentStore
+
+def fill_storage(storage, start, seconds, rng):
+    """Insert one metric at 1 s cadence straight into the samples table"""
+    timestamps = to_epoch(start) + np.arange(seconds, dtype=np.float64)
+    values = np.round(50 + np.cumsum(rng.normal(0, 0.5, seconds)), 1)
+    with storage._lock:
+        storage.conn.executemany(
+            "INSERT INTO samples (metric, timestamp, value) VALUES ('cpu_usage', ?, ?)",
+            zip(timestamps.tolist(), values.tolist())
+        )
+        storage.conn.commit()
+
+def read_segments(segments, start, end):
+    """Map a range and touch every value so the mapped pages are actually read"""
+    _, values = segments.arrays('cpu_usage', start, end)
+    values.sum()
+    return values
+
+def best_of(repeats, read):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = read()
+        times.append(time.perf_counter() - start)
+    return min(times), rows
+
+def main(days=7, ranges=(1, 7), repeats=3):
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = MetricsStorage(db_path=os.path.join(directory, 'metrics.db'))
+        segments = SegmentStore(directory=os.path.join(directory, 'segments'))
+        end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=days)
+        fill_storage(storage, start, days * 86400, rng)
+
+        began = time.perf_counter()
+        segments.seal(storage, metrics=['cpu_usage'], now=end + timedelta(hours=1))
+        print(f"sealed {len(segments.segments)} day segment(s) in {time.perf_counter() - began:.2f}s")
+
+        print(f"{'range':>6} {'rows':>8} {'sqlite ms':>10} {'segments ms':>12} {'speedup':>8}")
+        for span in ranges:
+            window_start = end - timedelta(days=span)
+            sqlite, df = best_of(repeats, lambda: storage.query_window(['cpu_usage'], start=window_start, end=end))
+            mapped, values = best_of(repeats, lambda: read_segments(segments, window_start, end))
+            assert len(values) == len(df)
+            print(f"{span:>5}d {len(values):>8} {sqlite * 1000:>10.1f} {mapped * 1000:>12.1f} {sqlite / mapped:>7.0f}x")
+        storage.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Benchmark: per-dict AlertSystem.check_thresholds vs. check_thresholds_batch
+# Run from the MetricsDashboard directory: python -m benchmarks.threshold_eval
+import time
+import numpy as np
+from alert_system import AlertSystem
+
+def make_block(hosts, rng):
+    """Build a hosts x metrics block of mostly healthy samples with a few breaches"""
+    metrics = ['cpu_usage', 'memory_usage', 'disk_usage', 'revenue', 'response_time', 'error_rate', 'active_users']
+    values = np.column_stack([
+        rng.uniform(5, 82, hosts),
+        rng.uniform(20, 87, hosts),
+        rng.uniform(10, 90, hosts),
+        rng.uniform(9500, 90000, hosts),
+        rng.uniform(200, 2050, hosts),
+        rng.uniform(0.1, 5.2, hosts),
+        rng.integers(100, 2000, hosts)
+    ])
+    return [f"host-{i:04d}" for i in range(hosts)], metrics, values
+
+def run_per_dict(systems, metrics, values):
+    """Evaluate the block one host at a time with the per-dict path"""
+    alerts = []
+    for system, row in zip(systems, values):
+        alerts.extend(system.check_thresholds(dict(zip(metrics, row))))
+    return alerts
+
+def main(host_counts=(10, 100, 1000, 5000), repeats=5):
+    rng = np.random.default_rng(42)
+    print(f"{'hosts':>6} {'per-dict ms':>12} {'batch ms':>10} {'speedup':>8} {'alerts':>7}")
+    for hosts in host_counts:
+        host_names, metrics, values = make_block(hosts, rng)
+
+        per_dict = []
+        batch = []
+        for _ in range(repeats):
+            # check_thresholds keys cooldown by metric only, so each host needs its own instance
+            systems = [AlertSystem() for _ in host_names]
+            start = time.perf_counter()
+            expected = run_per_dict(systems, metrics, values)
+            per_dict.append(time.perf_counter() - start)
+
+            system = AlertSystem()
+            start = time.perf_counter()
+            alerts = system.check_thresholds_batch(host_names, metrics, values)
+            batch.append(time.perf_counter() - start)
+
+        assert len(alerts) == len(expected)
+        per_dict_ms = min(per_dict) * 1000
+        batch_ms = min(batch) * 1000
+        print(f"{hosts:>6} {per_dict_ms:>12.2f} {batch_ms:>10.2f} {per_dict_ms / batch_ms:>7.1f}x {len(alerts):>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import struct
+import numpy as np
+import config
+
+# count, first timestamp, first delta, first value bits
+CHUNK_HEADER = struct.Struct('<Iqq8s')
+
+def _zigzag(values):
+    """Map signed ints to unsigned so small magnitudes of either sign stay small"""
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+def _unzigzag(values):
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -(values & np.uint64(1)).view(np.int64)
+
+def _pack(values, width):
+    """Bit-pack unsigned ints at a fixed width, little-endian within the stream"""
+    if width == 0 or not len(values):
+        return b''
+    bits = (values[:, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)
+    return np.packbits(bits.astype(np.uint8).ravel(), bitorder='little').tobytes()
+
+def _unpack(data, offset, count, width):
+    """Inverse of _pack; returns (values, next offset)"""
+    if width == 0 or not count:
+        return np.zeros(count, dtype=np.uint64), offset
+    size = (count * width + 7) // 8
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=size, offset=offset), count=count * width, bitorder='little')
+    weights = np.left_shift(np.uint64(1), np.arange(width, dtype=np.uint64))
+    values = (bits.reshape(count, width).astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    return values, offset + size
+
+def _trailing_zeros(value):
+    return (value & -value).bit_length() - 1 if value else 0
+
+def encode_chunk(timestamps, values, miniblock=None):
+    """Compress int64 timestamps and float64 values into one chunk"""
+    miniblock = miniblock or config.CHUNK_CONFIG['miniblock']
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64)
+    count = len(timestamps)
+
+    first_delta = int(timestamps[1] - timestamps[0]) if count > 1 else 0
+    parts = [CHUNK_HEADER.pack(count, int(timestamps[0]) if count else 0, first_delta, bits[:1].tobytes().ljust(8, b'\0'))]
+
+    # Gorilla's two transforms: timestamps become delta-of-deltas (zero for a
+    # steady cadence) and values are XORed with their predecessor (few
+    # meaningful bits when a value barely changes). Instead of Gorilla's
+    # per-value variable-length codes, each miniblock is bit-packed at one
+    # width so packing and unpacking are whole-array operations.
+    dods = _zigzag(np.diff(timestamps, n=2)) if count > 2 else np.empty(0, dtype=np.uint64)
+    xors = bits[1:] ^ bits[:-1]
+
+    for start in range(0, len(dods), miniblock):
+        block = dods[start:start + miniblock]
+        width = int(block.max()).bit_length()
+        parts.append(bytes([width]))
+        parts.append(_pack(block, width))
+
+    for start in range(0, len(xors), miniblock):
+        block = xors[start:start + miniblock]
+        shift = _trailing_zeros(int(np.bitwise_or.reduce(block)))
+        block = block >> np.uint64(shift)
+        width = int(block.max()).bit_length()
+        parts.append(bytes([shift, width]))
+        parts.append(_pack(block, width))
+
+    return b''.join(parts)
+
+def decode_chunk(data, miniblock=None):
+    """Decompress a chunk back to (int64 timestamps, float64 values)"""
+    miniblock = miniblock or config.CHUNK_CONFIG['miniblock']
+    count, first_time, first_delta, first_bits = CHUNK_HEADER.unpack_from(data)
+    offset = CHUNK_HEADER.size
+
+    dods = []
+    for start in range(0, max(count - 2, 0), miniblock):
+        width = data[offset]
+        block, offset = _unpack(data, offset + 1, min(miniblock, count - 2 - start), width)
+        dods.append(block)
+
+    xors = []
+    for start in range(0, max(count - 1, 0), miniblock):
+        shift, width = data[offset], data[offset + 1]
+        block, offset = _unpack(data, offset + 2, min(miniblock, count - 1 - start), width)
+        xors.append(block << np.uint64(shift))
+
+    # Two cumulative sums undo the delta-of-delta; a cumulative XOR undoes the XOR chain
+    deltas = np.empty(max(count - 1, 0), dtype=np.int64)
+    if count > 1:
+        deltas[0] = first_delta
+        if dods:
+            deltas[1:] = first_delta + np.cumsum(_unzigzag(np.concatenate(dods)))
+    timestamps = np.empty(count, dtype=np.int64)
+    if count:
+        timestamps[0] = first_time
+        timestamps[1:] = first_time + np.cumsum(deltas)
+
+    bits = np.empty(count, dtype=np.uint64)
+    if count:
+        bits[0] = np.frombuffer(first_bits, dtype=np.uint64)[0]
+        if xors:
+            bits[1:] = np.bitwise_xor.accumulate(np.concatenate([bits[:1], np.concatenate(xors)]))[1:]
+    return timestamps, bits.view(np.float64)
+
+class ChunkedSeries:
+    def __init__(self, chunk_size=None, resolution=None):
+        self.chunk_size = chunk_size or config.CHUNK_CONFIG['chunk_size']
+        self.resolution = resolution or config.CHUNK_CONFIG['timestamp_resolution']
+
+        # Sealed chunks with their time bounds, plus an uncompressed head being filled
+        self.chunks = []
+        self.chunk_bounds = []
+        self.sealed_count = 0
+        self._head_times = np.empty(0, dtype=np.int64)
+        self._head_values = np.empty(0, dtype=np.float64)
+        self._head_count = 0
+
+    def _reserve(self, count):
+        """Grow the head geometrically up to one chunk, so idle series stay small"""
+        if count <= len(self._head_times):
+            return
+        capacity = min(self.chunk_size, max(count, 2 * len(self._head_times), 16))
+        self._head_times = np.concatenate([self._head_times[:self._head_count], np.empty(capacity - self._head_count, dtype=np.int64)])
+        self._head_values = np.concatenate([self._head_values[:self._head_count], np.empty(capacity - self._head_count, dtype=np.float64)])
+
+    def append(self, timestamp, value):
+        """Append one sample with an epoch timestamp in seconds"""
+        self._reserve(self._head_count + 1)
+        self._head_times[self._head_count] = round(timestamp * self.resolution)
+        self._head_values[self._head_count] = value
+        self._head_count += 1
+        if self._head_count == self.chunk_size:
+            self._seal()
+
+    def extend(self, timestamps, values):
+        """Append arrays of samples, sealing chunks as the head fills"""
+        times = np.round(np.asarray(timestamps, dtype=np.float64) * self.resolution).astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        position = 0
+        while position < len(times):
+            take = min(self.chunk_size - self._head_count, len(times) - position)
+            self._reserve(self._head_count + take)
+            self._head_times[self._head_count:self._head_count + take] = times[position:position + take]
+            self._head_values[self._head_count:self._head_count + take] = values[position:position + take]
+            self._head_count += take
+            position += take
+            if self._head_count == self.chunk_size:
+                self._seal()
+
+    def _seal(self):
+        times = self._head_times[:self._head_count]
+        self.chunks.append(encode_chunk(times, self._head_values[:self._head_count]))
+        self.chunk_bounds.append((int(times[0]), int(times[-1])))
+        self.sealed_count += self._head_count
+        self._head_count = 0
+
+    def arrays(self, start=None, end=None):
+        """Decode samples between two epoch times (seconds) as (timestamps, values) arrays"""
+        low = -np.inf if start is None else start * self.resolution
+        high = np.inf if end is None else end * self.resolution
+
+        times = []
+        values = []
+        for chunk, (first, last) in zip(self.chunks, self.chunk_bounds):
+            if last >= low and first <= high:
+                chunk_times, chunk_values = decode_chunk(chunk)
+                times.append(chunk_times)
+                values.append(chunk_values)
+        times.append(self._head_times[:self._head_count])
+        values.append(self._head_values[:self._head_count])
+
+        times = np.concatenate(times)
+        values = np.concatenate(values)
+        keep = (times >= low) & (times <= high)
+        return times[keep] / self.resolution, values[keep]
+
+    def trim(self, before):
+        """Drop sealed chunks that end before an epoch time (seconds)"""
+        cutoff = before * self.resolution
+        dropped = 0
+        while self.chunk_bounds and self.chunk_bounds[0][1] < cutoff:
+            self.chunks.pop(0)
+            self.chunk_bounds.pop(0)
+            dropped += 1
+        if dropped:
+            self.sealed_count = sum(CHUNK_HEADER.unpack_from(chunk)[0] for chunk in self.chunks)
+        return dropped
+
+    @property
+    def nbytes(self):
+        """Bytes held by sealed chunks and the head buffers"""
+        return sum(len(chunk) for chunk in self.chunks) + self._head_times.nbytes + self._head_values.nbytes
+
+    def __len__(self):
+        return self.sealed_count + self._head_count
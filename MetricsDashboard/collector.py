@@ -0,0 +1,199 @@
+import argparse
+import math
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from data_generator import DataGenerator
+from alert_system import AlertSystem
+from storage import MetricsStorage
+from anomaly import AnomalyMonitor
+from aggregates import MetricAggregator
+from series_index import SeriesIndex
+from segments import SegmentStore
+from metrics_store import MetricsRingBuffer
+import config
+
+class MetricsCollector:
+    def __init__(self, interval=None, storage=None, tail_remote=None):
+        self.interval = interval or config.COLLECTOR_INTERVAL
+        self.data_generator = DataGenerator()
+        self.storage = storage or MetricsStorage()
+        self.alert_system = AlertSystem(storage=self.storage)
+        self.anomaly_monitor = AnomalyMonitor()
+        self.aggregates = MetricAggregator()
+        self.series_index = SeriesIndex()
+        # An ingest server embedded in the dashboard feeds the index directly; one running as
+        # its own process only reaches it through storage (the headless daemon has no index readers)
+        self.tail_remote = not config.INGEST_CONFIG['embedded'] if tail_remote is None else tail_remote
+        self._last_point_id = None
+        self.segments = SegmentStore()
+        # The newest samples stay in memory so live charts never query storage
+        self.history = MetricsRingBuffer(config.MAX_DATA_POINTS)
+        self.backfill_aggregates()
+        self.backfill_history()
+        self.refresh_remote_series()
+
+        self.sequence = 0
+        self._latest = {}
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sealer = None
+
+        # Publish one sample up front so viewers never see an empty collector
+        self.collect()
+
+    def collect(self):
+        """Sample every metric family once and publish it to all viewers"""
+        families = {
+            'system': self.data_generator.get_system_metrics(),
+            'business': self.data_generator.get_business_metrics(),
+            'server': self.data_generator.get_server_metrics()
+        }
+        sample = {**families['system'], **families['business'], **families['server']}
+
+        self.storage.write_sample(sample)
+        self.history.append(sample)
+        self.aggregates.add(sample)
+        for family, family_metrics in families.items():
+            self.series_index.observe_sample(family_metrics, {'host': 'local', 'family': family})
+        self.evaluate_alerts(sample)
+
+        with self._condition:
+            self._latest = families
+            self.sequence += 1
+            self._condition.notify_all()
+        return sample
+
+    def backfill_aggregates(self):
+        """Seed the windowed aggregates from stored history so a restart keeps its reports"""
+        longest = max(window for window, _ in self.aggregates.windows.values())
+        try:
+            df = self.storage.query_window(
+                self.aggregates.metrics, start=datetime.now() - timedelta(seconds=longest)
+            )
+            self.aggregates.backfill(df)
+        except Exception as e:
+            print(f"Failed to backfill aggregates: {str(e)}")
+
+    def backfill_history(self):
+        """Seed the in-memory history from the newest stored samples so a restart keeps its live charts"""
+        metrics = [metric for family in config.METRIC_FAMILIES.values() for metric in family]
+        try:
+            self.history.extend(self.storage.query_window(metrics, limit=self.history.capacity))
+        except Exception as e:
+            print(f"Failed to backfill history: {str(e)}")
+
+    def refresh_remote_series(self):
+        """Index remote series stored since the last refresh by an ingest server in another process"""
+        if not self.tail_remote:
+            return
+        try:
+            self._last_point_id = self.series_index.load_remote(self.storage, self._last_point_id)
+        except Exception as e:
+            print(f"Failed to refresh remote series: {str(e)}")
+
+    def evaluate_alerts(self, sample):
+        """Check a sample against alert thresholds and log anything that fires"""
+        alerts = self.alert_system.check_thresholds(sample) + self.alert_system.check_rules(sample)
+        alerts += self.alert_system.check_anomalies(self.anomaly_monitor.update(sample), sample.get('timestamp'))
+        for alert in alerts:
+            self.alert_system.log_alert(alert)
+            if config.EMAIL_CONFIG['enabled']:
+                self.alert_system.send_email_alert(alert)
+        return alerts
+
+    def start(self):
+        """Start the background collection thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+        self._thread.start()
+        # Sealing reads whole days back from storage, so it runs apart from the sampling loop
+        self._sealer = threading.Thread(target=self._seal_segments, name="segment-sealer", daemon=True)
+        self._sealer.start()
+
+    def stop(self, timeout=None):
+        """Stop collecting and flush pending storage writes"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._sealer is not None:
+            self._sealer.join(timeout)
+            self._sealer = None
+        self.data_generator.stop(timeout)
+        self.alert_system.notifier.stop(timeout)
+        self.storage.flush()
+
+    def _run(self):
+        # Wait for absolute deadlines so the time spent collecting does not
+        # accumulate as drift between samples
+        next_run = time.monotonic() + self.interval
+        while not self._stop_event.wait(max(0.0, next_run - time.monotonic())):
+            try:
+                self.collect()
+            except Exception as e:
+                print(f"Failed to collect metrics: {str(e)}")
+            self.refresh_remote_series()
+
+            next_run += self.interval
+            behind = time.monotonic() - next_run
+            if behind > 0:
+                # Skip the ticks we missed rather than collecting in a burst
+                next_run += math.ceil(behind / self.interval) * self.interval
+
+    def _seal_segments(self):
+        while True:
+            try:
+                self.segments.seal(self.storage)
+            except Exception as e:
+                print(f"Failed to seal history segments: {str(e)}")
+            if self._stop_event.wait(config.SEGMENT_CONFIG['seal_check_interval']):
+                break
+
+    def latest(self, family=None):
+        """Get the latest published sample, merged or for one metric family"""
+        with self._condition:
+            if family is not None:
+                return dict(self._latest[family])
+            return {**self._latest['system'], **self._latest['business'], **self._latest['server']}
+
+    def has_sample(self):
+        """Whether a sample has been published; always true once constructed"""
+        with self._condition:
+            return bool(self._latest)
+
+    def wait_for_sample(self, after_sequence, timeout=None):
+        """Block until a sample newer than after_sequence is published"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after_sequence, timeout)
+            return self.sequence
+
+def main(argv=None):
+    """Run the collector as a headless daemon until SIGINT or SIGTERM"""
+    parser = argparse.ArgumentParser(description="Collect metrics into storage without the dashboard UI")
+    parser.add_argument('--interval', type=float, default=config.COLLECTOR_INTERVAL, help="seconds between samples")
+    parser.add_argument('--db-path', default=config.STORAGE_CONFIG['db_path'], help="SQLite database to write to")
+    args = parser.parse_args(argv)
+
+    shutdown = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: shutdown.set())
+
+    collector = MetricsCollector(interval=args.interval, storage=MetricsStorage(db_path=args.db_path), tail_remote=False)
+    collector.start()
+    print(f"Collecting metrics every {args.interval}s into {args.db_path}")
+
+    while not shutdown.wait(1):
+        pass
+
+    print("Shutting down collector")
+    collector.stop(timeout=10)
+    collector.storage.close()
+
+if __name__ == '__main__':
+    main()
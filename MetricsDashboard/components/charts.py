@@ -2,18 +2,32 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 import config
+from components.downsampling import downsample
 
-def create_real_time_line_chart(data, x_col, y_col, title, color=None):
+def downsample_series(x, y, max_points=None, mode=None):
+    """Reduce a series to roughly the chart's pixel width before plotting"""
+    max_points = max_points or config.CHART_DOWNSAMPLING['max_points']
+    mode = mode or config.CHART_DOWNSAMPLING['mode']
+    
+    if len(y) <= max_points:
+        return x, y
+    return downsample(x, y, max_points, mode)
+
+def create_real_time_line_chart(data, x_col, y_col, title, color=None, max_points=None, downsample_mode=None):
     """Create a real-time line chart"""
     if color is None:
         color = config.COLORS['primary']
     
+    x, y = downsample_series(data[x_col].to_numpy(), data[y_col].to_numpy(), max_points, downsample_mode)
+    
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=data[x_col],
-        y=data[y_col],
-        mode='lines+markers',
+        x=x,
+        y=y,
+        # Markers only help while every point is still being drawn
+        mode='lines+markers' if len(y) == len(data) else 'lines',
         name=title,
         line=dict(color=color, width=2),
         marker=dict(size=4)
@@ -30,6 +44,66 @@ def create_real_time_line_chart(data, x_col, y_col, title, color=None):
     
     return fig
 
+def create_history_chart(storage, metric, title, color=None, start=None, end=None, limit=None, host=None):
+    """Create a line chart from a time window queried from storage"""
+    data = storage.query_window([metric], start=start, end=end, limit=limit, host=host)
+    return create_real_time_line_chart(data, 'timestamp', metric, title, color)
+
+def create_range_chart(storage, metric, title, start, end=None, color=None, max_points=None):
+    """Create a long-range chart from whichever rollup tier suits the range and chart width"""
+    if color is None:
+        color = config.COLORS['primary']
+    max_points = max_points or config.CHART_DOWNSAMPLING['max_points']
+    
+    data = storage.query_series(metric, start, end, max_points)
+    tier = data.attrs.get('tier', 'raw')
+    fig = create_real_time_line_chart(data, 'timestamp', metric, f"{title} ({tier})", color, max_points)
+    
+    # Rollup buckets carry their spread; shade it when every bucket is drawn
+    if 'min' in data and 0 < len(data) <= max_points:
+        fig.add_trace(go.Scatter(
+            x=data['timestamp'], y=data['max'], mode='lines', line=dict(width=0), hoverinfo='skip', showlegend=False
+        ))
+        fig.add_trace(go.Scatter(
+            x=data['timestamp'], y=data['min'], mode='lines', line=dict(width=0), fill='tonexty',
+            fillcolor='rgba(128, 128, 128, 0.2)', hoverinfo='skip', showlegend=False
+        ))
+    return fig
+
+def create_segment_chart(segments, metric, title, start, end=None, color=None, max_points=None):
+    """Create a long-range chart of raw samples mapped from sealed history segments"""
+    timestamps, values = segments.arrays(metric, start, end)
+    x, y = downsample_series(timestamps, values, max_points)
+    return create_real_time_line_chart(
+        pd.DataFrame({'timestamp': x, metric: y}), 'timestamp', metric, f"{title} (segments)", color
+    )
+
+def get_live_history_chart(figures, key, history, metric, title, color=None, limit=20):
+    """Build a chart of the collector's in-memory history once per key, then only append newer points to it"""
+    fig = figures.get(key)
+    if fig is None:
+        fig = create_real_time_line_chart(history.to_frame(limit, [metric]), 'timestamp', metric, title, color)
+        # A constant uirevision lets Plotly diff the update in place and keep zoom/pan state
+        fig.update_layout(uirevision=key)
+        figures[key] = fig
+        return fig
+    
+    trace = fig.data[0]
+    x = np.asarray(trace.x, dtype='datetime64[ns]')
+    y = np.asarray(trace.y, dtype=np.float64)
+    
+    new_points = history.since(x[-1] if len(x) else None, [metric], limit)
+    if new_points.empty or metric not in new_points:
+        return fig
+    
+    # Extend the existing trace and keep the same sliding window, like Plotly.extendTraces
+    x = np.concatenate([x, new_points['timestamp'].to_numpy()])[-limit:]
+    y = np.concatenate([y, new_points[metric].to_numpy(dtype=np.float64)])[-limit:]
+    with fig.batch_update():
+        trace.x = x
+        trace.y = y
+    return fig
+
 def create_gauge_chart(value, title, max_value=100, threshold=None):
     """Create a gauge chart for KPI display"""
     fig = go.Figure(go.Indicator(
@@ -56,7 +130,7 @@ def create_gauge_chart(value, title, max_value=100, threshold=None):
     fig.update_layout(height=250, margin=dict(l=20, r=20, t=40, b=20))
     return fig
 
-def create_multi_metric_chart(data, metrics, title):
+def create_multi_metric_chart(data, metrics, title, max_points=None, downsample_mode=None):
     """Create a chart with multiple metrics"""
     fig = make_subplots(
         rows=len(metrics), cols=1,
@@ -69,10 +143,11 @@ def create_multi_metric_chart(data, metrics, title):
     
     for i, metric in enumerate(metrics):
         if metric in data.columns:
+            x, y = downsample_series(data['timestamp'].to_numpy(), data[metric].to_numpy(), max_points, downsample_mode)
             fig.add_trace(
                 go.Scatter(
-                    x=data['timestamp'],
-                    y=data[metric],
+                    x=x,
+                    y=y,
                     mode='lines',
                     name=metric,
                     line=dict(color=colors[i % len(colors)])
@@ -0,0 +1,84 @@
+import numpy as np
+
+def _as_numeric(x):
+    """View datetime axes as int64 nanoseconds so they can be used in arithmetic"""
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def lttb_indices(x, y, threshold):
+    """Select point indices with Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _as_numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # First and last points are always kept; the rest is split into
+    # threshold - 2 buckets, each contributing the point that forms the
+    # largest triangle with the previous pick and the next bucket's mean
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts = edges[:-1]
+    ends = edges[1:]
+
+    counts = ends - starts
+    x_means = np.add.reduceat(x[:-1], starts) / counts
+    y_means = np.add.reduceat(y[:-1], starts) / counts
+    next_x = np.append(x_means[1:], x[-1])
+    next_y = np.append(y_means[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        xa, ya = x[previous], y[previous]
+        area = np.abs(
+            (xa - next_x[i]) * (y[start:end] - ya) - (xa - x[start:end]) * (next_y[i] - ya)
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+
+    return selected
+
+def minmax_indices(y, threshold):
+    """Select the minimum and maximum point of each bucket so spikes survive"""
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    missing = np.isnan(padded)
+    lows = np.argmin(np.where(missing, np.inf, padded), axis=1) + offsets
+    highs = np.argmax(np.where(missing, -np.inf, padded), axis=1) + offsets
+
+    indices = np.unique(np.concatenate(([0, n - 1], lows, highs)))
+    return indices[indices < n]
+
+def downsample(x, y, threshold, mode='lttb'):
+    """Reduce a series to about threshold points, returning (x, y)"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    keep = ~np.isnan(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+
+    if mode == 'lttb':
+        indices = lttb_indices(x, y, threshold)
+    elif mode == 'minmax':
+        indices = minmax_indices(y, threshold)
+    else:
+        raise ValueError(f"Unknown downsampling mode: {mode}")
+
+    return x[indices], y[indices]
@@ -88,6 +88,15 @@ def display_business_metrics(metrics, previous_metrics=None):
             delta = metrics['orders'] - previous_metrics.get('orders', 0)
         display_kpi_card_enhanced("Orders", metrics['orders'], delta=delta, icon="🛒")
 
+def display_latency_percentiles(percentiles):
+    """Display p50/p95/p99 cards for each latency metric"""
+    for metric, values in percentiles.items():
+        cols = st.columns(len(values))
+        for col, (q, value) in zip(cols, values.items()):
+            with col:
+                display_kpi_card_enhanced(f"{metric.replace('_', ' ').title()} p{q * 100:g}", value,
+                                        format_func=lambda x: f"{x:.0f}ms" if x is not None else "—", icon="⏱️")
+
 def display_server_metrics(metrics):
     """Display server performance metrics with enhanced styling"""
     col1, col2, col3, col4 = st.columns(4)
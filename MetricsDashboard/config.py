@@ -6,22 +6,175 @@ DASHBOARD_TITLE = "MetricsDashboard Pro"
 REFRESH_INTERVAL = 2  # seconds
 MAX_DATA_POINTS = 100
 
+# System Sampler Configuration
+SAMPLE_INTERVAL = 1  # seconds between background psutil samples
+SAMPLE_BUFFER_SIZE = 300  # samples kept in the sampler ring buffer
+COLLECTOR_INTERVAL = 1  # seconds between shared collector publishes
+
+# 'embedded' collects inside the Streamlit server; 'viewer' only reads the
+# storage written by a separate `python -m collector` process
+DASHBOARD_MODE = os.environ.get('DASHBOARD_MODE', 'embedded')
+
+# Metrics published by each family, used to read the latest sample back from storage
+METRIC_FAMILIES = {
+    'system': ['cpu_usage', 'memory_usage', 'disk_usage', 'network_sent', 'network_recv'],
+    'business': ['revenue', 'active_users', 'conversion_rate', 'bounce_rate', 'avg_session_duration',
+                 'page_load_time', 'error_rate', 'orders', 'cart_abandonment'],
+    'server': ['response_time', 'requests_per_second', 'active_connections', 'database_connections',
+               'cache_hit_rate', 'uptime']
+}
+
+# Storage Configuration
+STORAGE_CONFIG = {
+    'db_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'metrics.db'),
+    'batch_size': 500,  # rows buffered before a batched insert
+    'flush_interval': 5,  # seconds before pending rows are flushed anyway (and between retries of a failed flush)
+    'max_pending': 100000,  # rows held while flushes fail; the oldest are dropped past this
+    'retention_days': 30,
+    'retention_check_interval': 3600  # seconds between retention sweeps
+}
+
+# Sealed History Segments (memory-mapped column files)
+SEGMENT_CONFIG = {
+    'directory': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'segments'),
+    'segment_seconds': 86400,  # one segment per day
+    'seal_delay': 300,  # seconds after a day ends before it is sealed, so late writes land first
+    'seal_check_interval': 600,  # seconds between checks for newly completed days
+    'retention_days': 365
+}
+
+# Bulk History Import (CSV/Parquet in the generate_historical_data schema)
+IMPORT_CONFIG = {
+    'chunk_rows': 250000,  # file rows parsed and written per transaction
+    'column_aliases': {'users': 'active_users'}  # file column: stored metric
+}
+
+# Streaming Export (served at GET /export by the ingest server)
+EXPORT_CONFIG = {
+    'chunk_seconds': 3600,  # raw history window serialized per chunk
+    'chunk_buckets': 10000,  # rollup buckets serialized per chunk
+    'public_url': None,  # ingest server base URL as browsers reach it (e.g. behind a proxy); defaults to the dashboard's host
+    'max_inline_bytes': 50 * 1048576  # largest export built in the Streamlit process when no ingest server is reachable
+}
+
+# Remote Agent Ingestion
+INGEST_CONFIG = {
+    'bind_address': '127.0.0.1',
+    'http_port': 8186,  # POST /ingest, GET /health
+    'udp_port': 8125,
+    'queue_size': 1000,  # batches waiting to be written before new ones are refused
+    'max_batch_points': 5000,  # points coalesced into one storage write
+    'max_body_bytes': 1048576,
+    'agent_backlog': 10000,  # lines an agent holds while the server pushes back
+    'embedded': False  # also run the ingest server inside the Streamlit process
+}
+
+# Rollup Tiers
+ROLLUP_CONFIG = {
+    'tiers': {'1m': 60, '1h': 3600, '1d': 86400},  # name: bucket seconds
+    'retention_days': {'1m': 90, '1h': 365, '1d': 1825},
+    'min_fill': 0.5  # a tier must give at least this many buckets per chart point to be chosen
+}
+
+# Quantile Sketches
+SKETCH_CONFIG = {
+    'metrics': ['response_time', 'page_load_time'],
+    'relative_accuracy': 0.01,  # quantile estimates are within 1% of the true value
+    'max_bins': 2048,
+    'quantiles': [0.5, 0.95, 0.99]
+}
+
+# Compressed In-Memory Series History
+CHUNK_CONFIG = {
+    'chunk_size': 1024,  # samples per compressed chunk
+    'miniblock': 128,  # samples bit-packed at one shared width
+    'timestamp_resolution': 1000,  # timestamp ticks per second (milliseconds)
+    'history_days': 14  # per-series history kept in memory
+}
+
+# Incremental Aggregates
+AGGREGATE_CONFIG = {
+    'metrics': ['cpu_usage', 'memory_usage', 'revenue', 'active_users', 'response_time', 'requests_per_second'],
+    'windows': {
+        # name: (window seconds, bucket seconds)
+        '1h': (3600, 60),
+        '24h': (86400, 300)
+    }
+}
+REPORT_WINDOW = '24h'
+
+# Chart Downsampling
+CHART_DOWNSAMPLING = {
+    'max_points': 800,  # roughly the pixel width of a dashboard chart
+    'mode': 'lttb'  # 'lttb' or 'minmax'
+}
+
 # Alert Configuration
 ALERT_THRESHOLDS = {
     'cpu_usage': 80.0,
     'memory_usage': 85.0,
     'revenue': 10000.0,
-    'response_time': 2000.0,  # milliseconds
     'error_rate': 5.0  # percentage
 }
 
+# 'above' alerts when a value exceeds its threshold, 'below' when it drops under it
+ALERT_DIRECTIONS = {
+    'cpu_usage': 'above',
+    'memory_usage': 'above',
+    'revenue': 'below',
+    'error_rate': 'above'
+}
+
+# Severity bands as (threshold multiplier, severity), most severe first; a value
+# beyond threshold * multiplier in the alert direction gets that severity
+ALERT_SEVERITY_BANDS = {
+    'cpu_usage': [(1.2, 'CRITICAL'), (1.1, 'HIGH')],
+    'memory_usage': [(1.2, 'CRITICAL'), (1.1, 'HIGH')],
+    'error_rate': [(2.0, 'CRITICAL'), (1.0, 'HIGH')]
+}
+ALERT_DEFAULT_SEVERITY = 'MEDIUM'
+ALERT_HISTORY_SIZE = 5000  # alerts kept in memory; older ones stay in storage
+
+# Windowed alert rules: [agg(metric, window)] <op> <value> [for N samples | for <duration>]
+# agg is one of avg, min, max, sum, count, rate, last; durations use s, m or h
+ALERT_RULES = [
+    {'name': 'response_time_sustained', 'expr': 'avg(response_time, 60s) > 2000 for 3 samples', 'severity': 'HIGH'},
+    {'name': 'error_rate_sustained', 'expr': 'avg(error_rate, 2m) > 5 for 30s', 'severity': 'HIGH'},
+    {'name': 'cpu_saturated', 'expr': 'min(cpu_usage, 5m) > 95', 'severity': 'CRITICAL'}
+]
+ALERT_RULE_MIN_COVERAGE = 0.9  # fraction of a rule's window its samples must span before it can fire
+
+# Streaming Anomaly Detection
+ANOMALY_CONFIG = {
+    'metrics': ['revenue', 'active_users', 'orders', 'response_time', 'error_rate'],
+    'ewma_alpha': 0.05,  # weight of each new sample in the short-term baseline
+    'seasonal_alpha': 0.01,  # weight of each new sample in its hour-of-day baseline
+    'robust_step': 0.02,  # median/MAD step as a fraction of the typical deviation
+    'warmup_samples': 120,  # samples a baseline needs before it scores
+    'score_threshold': 4.0,  # anomaly score (in standard deviations) that raises an alert
+    'critical_score': 8.0
+}
+
 # Email Configuration (Optional)
 EMAIL_CONFIG = {
     'smtp_server': 'smtp.gmail.com',
     'smtp_port': 587,
     'sender_email': 'your_email@gmail.com',
     'sender_password': 'your_app_password',
-    'recipient_email': 'recipient@gmail.com'
+    'recipient_email': 'recipient@gmail.com',
+    'use_tls': True,
+    'enabled': False  # email every alert the collector logs
+}
+
+# Notification Dispatcher Configuration
+NOTIFICATION_CONFIG = {
+    'queue_size': 1000,  # alerts waiting for delivery before new ones are dropped
+    'batch_window': 2.0,  # seconds to gather alerts into one digest email
+    'max_batch_size': 50,
+    'max_retries': 3,
+    'retry_backoff': 1.0,  # seconds, doubled on every retry
+    'idle_timeout': 60,  # seconds before an unused SMTP connection is closed
+    'smtp_timeout': 10
 }
 
 # Sky Blue Theme Colors
@@ -2,24 +2,34 @@ import random
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import psutil
+import threading
 import time
+from sampler import SystemSampler
 
 class DataGenerator:
-    def __init__(self):
+    def __init__(self, sampler=None):
         self.base_revenue = 50000
         self.base_users = 1000
+        # Without an injected sampler one is started on the first live read, so
+        # batch users (historical data, imports, benchmarks) never spawn a thread
+        self.sampler = sampler
+        self._sampler_lock = threading.Lock()
         
     def get_system_metrics(self):
         """Get real-time system performance metrics"""
-        return {
-            'timestamp': datetime.now(),
-            'cpu_usage': psutil.cpu_percent(interval=1),
-            'memory_usage': psutil.virtual_memory().percent,
-            'disk_usage': psutil.disk_usage('/').percent,
-            'network_sent': psutil.net_io_counters().bytes_sent,
-            'network_recv': psutil.net_io_counters().bytes_recv
-        }
+        if self.sampler is None:
+            with self._sampler_lock:
+                if self.sampler is None:
+                    sampler = SystemSampler()
+                    sampler.start()
+                    self.sampler = sampler
+        # Read the latest background sample instead of blocking on psutil
+        return self.sampler.latest()
+    
+    def stop(self, timeout=None):
+        """Stop the background sampler, if live metrics were ever read"""
+        if self.sampler is not None:
+            self.sampler.stop(timeout)
     
     def get_business_metrics(self):
         """Generate realistic business KPI data"""
@@ -56,28 +66,43 @@ class DataGenerator:
             'uptime': random.uniform(99.0, 99.99)
         }
     
-    def generate_historical_data(self, days=30):
+    def generate_historical_data(self, days=30, freq='H', seed=None):
         """Generate historical data for trends"""
-        end_date = datetime.now()
+        frame = next(self.iter_historical_data(days=days, freq=freq, seed=seed, chunk_size=None), None)
+        if frame is None:
+            # A range with no rows (days < 0) yields no chunks; callers still get the columns
+            frame = self._build_historical_frame(pd.DatetimeIndex([]), np.random.default_rng(seed))
+        return frame
+    
+    def iter_historical_data(self, days=30, freq='H', seed=None, chunk_size=1000000, end_date=None):
+        """Generate historical data in DataFrame chunks of at most chunk_size rows"""
+        rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        end_date = end_date or datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        dates = pd.date_range(start=start_date, end=end_date, freq='H')
-        data = []
+        # Only the timestamps are built up front (date_range handles calendar
+        # frequencies such as 'MS' or 'B'); the rows are built one chunk at a time
+        dates = pd.date_range(start=start_date, end=end_date, freq=freq)
+        chunk_size = chunk_size or max(len(dates), 1)
+        
+        for offset in range(0, len(dates), chunk_size):
+            yield self._build_historical_frame(dates[offset:offset + chunk_size], rng)
+    
+    def _build_historical_frame(self, dates, rng):
+        """Build one block of historical rows with vectorized random draws"""
+        n = len(dates)
+        hours = np.asarray(dates.hour)
         
-        for date in dates:
-            hour = date.hour
-            # Simulate realistic patterns
-            if 9 <= hour <= 17:
-                base_multiplier = random.uniform(1.2, 1.8)
-            else:
-                base_multiplier = random.uniform(0.4, 0.9)
-                
-            data.append({
-                'timestamp': date,
-                'revenue': self.base_revenue * base_multiplier * random.uniform(0.8, 1.2),
-                'users': int(self.base_users * base_multiplier * random.uniform(0.7, 1.3)),
-                'conversion_rate': random.uniform(2.5, 4.2),
-                'response_time': random.uniform(300, 2000)
-            })
+        # Simulate realistic patterns
+        business_hours = (hours >= 9) & (hours <= 17)
+        low = np.where(business_hours, 1.2, 0.4)
+        high = np.where(business_hours, 1.8, 0.9)
+        base_multiplier = rng.uniform(low, high)
         
-        return pd.DataFrame(data)
+        return pd.DataFrame({
+            'timestamp': dates,
+            'revenue': self.base_revenue * base_multiplier * rng.uniform(0.8, 1.2, n),
+            'users': (self.base_users * base_multiplier * rng.uniform(0.7, 1.3, n)).astype(np.int64),
+            'conversion_rate': rng.uniform(2.5, 4.2, n),
+            'response_time': rng.uniform(300, 2000, n)
+        })
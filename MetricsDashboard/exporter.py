@@ -0,0 +1,137 @@
+import io
+from datetime import timedelta
+import pandas as pd
+from storage import from_epoch, to_epoch
+from rollups import bucket_start
+import config
+
+# format: (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+EXPORT_SOURCES = ['raw', *config.ROLLUP_CONFIG['tiers']]
+
+# Windows are half-open; query_rollup includes both ends, so each window stops just short
+_BEFORE = timedelta(microseconds=1)
+
+def iter_history(storage, metrics, start, end, host=None, chunk_seconds=None):
+    """Yield raw samples as wide DataFrames (timestamp plus one column per metric), one time window at a time"""
+    step = timedelta(seconds=chunk_seconds or config.EXPORT_CONFIG['chunk_seconds'])
+    # Samples still waiting for a batched insert are written first so the export includes them
+    storage.flush()
+
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + step, end + _BEFORE)
+        columns = []
+        for metric in metrics:
+            timestamps, values = storage.query_arrays(metric, window_start, window_end, host)
+            column = pd.Series(values, index=timestamps, name=metric)
+            columns.append(column[~column.index.duplicated(keep='last')])
+        # Columns are aligned on their timestamps, like query_window's pivot but without regrouping rows
+        df = pd.concat(columns, axis=1).sort_index()
+        if len(df):
+            df.index = pd.to_datetime(df.index, unit='s').round('us')
+            yield df.rename_axis('timestamp').reset_index()
+        window_start = window_end
+
+def iter_rollups(storage, metrics, tier, start, end, chunk_buckets=None):
+    """Yield rollup buckets as long DataFrames (timestamp, metric, avg, min, max, count, last), metric by metric"""
+    width = storage.rollups.tiers[tier]
+    step = timedelta(seconds=width * (chunk_buckets or config.EXPORT_CONFIG['chunk_buckets']))
+    first = from_epoch(bucket_start(to_epoch(start), width))
+
+    for metric in metrics:
+        # Window edges fall on bucket boundaries so no bucket lands in two chunks
+        window_start = first
+        while window_start <= end:
+            window_end = min(window_start + step, end + _BEFORE)
+            df = storage.query_rollup(metric, tier, start=window_start, end=window_end - _BEFORE)
+            if len(df):
+                df = df.rename(columns={metric: 'avg'})
+                df.insert(1, 'metric', metric)
+                yield df.astype({'avg': 'float64', 'min': 'float64', 'max': 'float64', 'count': 'int64', 'last': 'float64'})
+            window_start = window_end
+
+def _csv_chunks(frames):
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+def _ndjson_chunks(frames):
+    for df in frames:
+        yield df.to_json(orient='records', lines=True, date_format='iso', date_unit='us').encode('utf-8')
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _parquet_chunks(frames, pa, pq):
+    # Every chunk becomes one row group, flushed to the caller as soon as it is written
+    sink = _ChunkSink()
+    writer = None
+    for df in frames:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+def serialize(frames, fmt):
+    """Turn a stream of DataFrame chunks into a stream of bytes in csv, ndjson or parquet"""
+    if fmt == 'csv':
+        return _csv_chunks(frames)
+    if fmt == 'ndjson':
+        return _ndjson_chunks(frames)
+    if fmt == 'parquet':
+        # Checked up front so a missing dependency fails before anything is sent
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Exporting Parquet needs pyarrow (pip install pyarrow)")
+        return _parquet_chunks(frames, pa, pq)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+def export(storage, source, fmt, metrics, start, end, host=None):
+    """Stream an export of raw history or one rollup tier as (bytes chunks, MIME type, file name)"""
+    if source not in EXPORT_SOURCES:
+        raise ValueError(f"Unknown export source: {source}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if not metrics:
+        raise ValueError("Choose at least one metric to export")
+    if start > end:
+        raise ValueError("Export start is after its end")
+
+    if source == 'raw':
+        frames = iter_history(storage, metrics, start, end, host)
+    else:
+        frames = iter_rollups(storage, metrics, source, start, end)
+    mime, extension = EXPORT_FORMATS[fmt]
+    return serialize(frames, fmt), mime, f"metrics_{source}_{start:%Y%m%d-%H%M}_{end:%Y%m%d-%H%M}.{extension}"
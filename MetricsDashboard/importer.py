@@ -0,0 +1,144 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from storage import MetricsStorage, to_epoch
+from segments import SegmentStore
+import config
+
+# The schema generate_historical_data emits and components/data/📄 sample_data.csv uses
+HISTORY_COLUMNS = ['timestamp', 'revenue', 'users', 'conversion_rate', 'response_time']
+
+def read_chunks(path, chunk_rows=None):
+    """Yield DataFrames of at most chunk_rows rows from a CSV or Parquet history file"""
+    chunk_rows = chunk_rows or config.IMPORT_CONFIG['chunk_rows']
+
+    if str(path).lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Importing Parquet files needs pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(path)
+        _check_columns(parquet.schema_arrow.names, path)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=HISTORY_COLUMNS):
+            yield batch.to_pandas()
+        return
+
+    _check_columns(pd.read_csv(path, nrows=0).columns, path)
+    # Each chunk's column types are inferred in one pass; values are coerced in prepare_chunk anyway
+    yield from pd.read_csv(path, usecols=HISTORY_COLUMNS, chunksize=chunk_rows, low_memory=False)
+
+def _check_columns(columns, path):
+    missing = [column for column in HISTORY_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"{path} is missing history columns: {', '.join(missing)}")
+
+def prepare_chunk(df):
+    """Validate a chunk into (epoch timestamps, {metric: values}, rejected row count)"""
+    # Rows without a usable timestamp or any usable value are rejected; a single
+    # value that is not a finite non-negative number is dropped (NaN) on its own
+    timestamps = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce')
+    if timestamps.dt.tz is not None:
+        # Storage keeps naive local wall-clock time, like the collector writes
+        timestamps = timestamps.dt.tz_convert(datetime.now().astimezone().tzinfo).dt.tz_localize(None)
+    epochs = timestamps.to_numpy(dtype='datetime64[ns]').view(np.int64) / 1e9
+
+    aliases = config.IMPORT_CONFIG['column_aliases']
+    columns = {}
+    for column in HISTORY_COLUMNS[1:]:
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        values[~(np.isfinite(values) & (values >= 0))] = np.nan
+        columns[aliases.get(column, column)] = values
+
+    # A file repeating a timestamp keeps its last row
+    valid = timestamps.notna().to_numpy() & ~np.all(np.isnan(np.column_stack(list(columns.values()))), axis=1)
+    keep = valid & ~pd.Series(np.where(valid, epochs, np.nan)).duplicated(keep='last').to_numpy()
+    return epochs[keep], {metric: values[keep] for metric, values in columns.items()}, int((~valid).sum())
+
+def import_history(path, storage=None, segments=None, chunk_rows=None, progress=None, now=None):
+    """Bulk-load a CSV or Parquet history file, one chunk per transaction: samples still inside
+    storage retention go to SQLite, and days the sealer will not read back go to segments"""
+    storage = storage or MetricsStorage()
+    segments = segments or SegmentStore()
+    now = now or datetime.now()
+    started = time.perf_counter()
+    stats = {'rows': 0, 'rejected': 0, 'expired': 0, 'inserted': 0, 'sealed': 0, 'skipped': 0}
+
+    # Anything older than segment retention would be deleted by the next sweep, so it is not written;
+    # older than sample retention it is only kept in segments (and the rollup tiers that still cover it)
+    segment_cutoff = to_epoch(now - timedelta(days=segments.retention_days))
+    sample_cutoff = to_epoch(now - timedelta(days=storage.retention_days))
+
+    for df in read_chunks(path, chunk_rows):
+        epochs, columns, rejected = prepare_chunk(df)
+        expired = epochs < segment_cutoff
+        recent = epochs >= sample_cutoff
+        # Whole microseconds in nanoseconds, the same rounding the sealer uses
+        times = np.round(epochs * 1e6).astype(np.int64) * 1000
+        # The sealer only reads samples for days it has not passed yet
+        to_segments = ~expired & (~recent | segments.is_sealed(times))
+
+        present = {metric: ~np.isnan(values) for metric, values in columns.items()}
+        inserted = storage.import_samples({
+            metric: (epochs[present[metric] & recent], values[present[metric] & recent])
+            for metric, values in columns.items()
+        })
+        added = segments.merge({
+            metric: (times[present[metric] & to_segments], values[present[metric] & to_segments])
+            for metric, values in columns.items()
+        })
+        # Rollups of recent samples were written with them; older ones only reached segments
+        older = {}
+        for metric, (added_times, added_values) in added.items():
+            timestamps = added_times / 1e9
+            old = timestamps < sample_cutoff
+            older[metric] = (timestamps[old], added_values[old])
+        storage.import_rollups(older)
+
+        sealed_old = sum(len(timestamps) for timestamps, _ in older.values())
+        staged_recent = sum(int((mask & recent).sum()) for mask in present.values())
+        staged_old = sum(int((mask & ~expired & ~recent).sum()) for mask in present.values())
+        stats['rows'] += len(df)
+        stats['rejected'] += rejected
+        stats['expired'] += int(expired.sum())
+        stats['inserted'] += inserted
+        stats['sealed'] += sum(len(added_times) for added_times, _ in added.values())
+        stats['skipped'] += staged_recent - inserted + staged_old - sealed_old
+        if progress is not None:
+            progress(stats)
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+def main(argv=None):
+    """Import history files from the command line"""
+    parser = argparse.ArgumentParser(description="Bulk-import historical KPI data from CSV or Parquet files")
+    parser.add_argument('paths', nargs='+', help=f"files with the columns {','.join(HISTORY_COLUMNS)}")
+    parser.add_argument('--db-path', default=config.STORAGE_CONFIG['db_path'], help="SQLite database to write to")
+    parser.add_argument('--segments-dir', default=config.SEGMENT_CONFIG['directory'], help="history segments directory to write to")
+    parser.add_argument('--chunk-rows', type=int, default=config.IMPORT_CONFIG['chunk_rows'])
+    args = parser.parse_args(argv)
+
+    storage = MetricsStorage(db_path=args.db_path)
+    segments = SegmentStore(directory=args.segments_dir)
+    try:
+        for path in args.paths:
+            try:
+                stats = import_history(
+                    path, storage, segments, args.chunk_rows,
+                    progress=lambda stats: print(f"  {stats['rows']:,} rows read, {stats['inserted']:,} samples inserted", end='\r')
+                )
+            except (OSError, ValueError, ImportError) as e:
+                print(f"Failed to import {path}: {str(e)}")
+                continue
+            print(
+                f"\r{path}: {stats['rows']:,} rows, {stats['inserted']:,} samples inserted, {stats['sealed']:,} sealed into segments, "
+                f"{stats['skipped']:,} already stored, {stats['rejected']:,} rows rejected, "
+                f"{stats['expired']:,} rows past retention in {stats['seconds']:.1f}s"
+            )
+    finally:
+        storage.close()
+
+if __name__ == '__main__':
+    main()
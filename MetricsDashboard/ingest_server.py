@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import json
+import math
+import signal
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+import numpy as np
+from alert_system import AlertSystem
+from storage import MetricsStorage, from_epoch, to_epoch
+from series_index import SeriesIndex
+from exporter import export
+import config
+
+HTTP_REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 503: 'Service Unavailable'
+}
+
+def format_labels(labels):
+    """Canonical 'key=value,...' form of a label set, sorted by key"""
+    return ','.join(f"{key}={value}" for key, value in sorted(labels.items()))
+
+def parse_line(line, default_timestamp):
+    """Parse 'metric,host=web-1[,label=value...] value [unix_time]' into a storage point"""
+    parts = line.split()
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Malformed metric line: {line}")
+
+    name, *tags = parts[0].split(',')
+    labels = {}
+    for tag in tags:
+        key, sep, value = tag.partition('=')
+        if not sep or not key or not value:
+            raise ValueError(f"Malformed tag '{tag}' in line: {line}")
+        labels[key] = value
+
+    host = labels.pop('host', None)
+    if not name or not host:
+        raise ValueError(f"Metric line needs a name and a host tag: {line}")
+
+    value = float(parts[1])
+    if not math.isfinite(value):
+        raise ValueError(f"Metric value is not a finite number: {line}")
+    # Agents send Unix time; storage keeps local wall-clock epochs like the collector
+    timestamp = to_epoch(datetime.fromtimestamp(float(parts[2]))) if len(parts) == 3 else default_timestamp
+    return (name, timestamp, value, host, format_labels(labels))
+
+def parse_payload(payload, default_timestamp=None):
+    """Parse a newline-separated batch of metric lines into (points, rejected_count)"""
+    default_timestamp = default_timestamp if default_timestamp is not None else to_epoch(datetime.now())
+    points = []
+    rejected = 0
+    for line in payload.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            points.append(parse_line(line, default_timestamp))
+        except (ValueError, OverflowError, OSError):
+            # Out-of-range timestamps overflow (or fail in the platform's localtime) instead of raising ValueError
+            rejected += 1
+    return points, rejected
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        points, rejected = parse_payload(data.decode('utf-8', errors='replace'))
+        self.server.rejected += rejected
+        # There is no way to push back on a datagram; refused batches are counted as dropped
+        self.server.submit(points)
+
+class IngestServer:
+    def __init__(self, storage=None, alert_system=None, settings=None, series_index=None):
+        self.storage = storage or MetricsStorage()
+        self.alert_system = alert_system or AlertSystem(storage=self.storage)
+        self.series_index = series_index or SeriesIndex()
+        self.settings = {**config.INGEST_CONFIG, **(settings or {})}
+
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.http_port = None
+        self.udp_port = None
+
+        self.queue = None
+        self._connections = {}
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def submit(self, points):
+        """Queue a parsed batch for writing; returns False (and counts a drop) when the queue is full"""
+        if not points:
+            return True
+        try:
+            self.queue.put_nowait(points)
+        except asyncio.QueueFull:
+            self.dropped += len(points)
+            return False
+        self.accepted += len(points)
+        return True
+
+    def start(self):
+        """Run the server on a background event loop thread and wait until it is listening"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._ready.clear()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.serve()), name="ingest-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+
+    def stop(self, timeout=None):
+        """Stop accepting data, write everything already queued, then stop the loop"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    async def serve(self):
+        """Listen for HTTP and UDP ingestion until stopped"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self.queue = asyncio.Queue(maxsize=self.settings['queue_size'])
+
+        address = self.settings['bind_address']
+        http = await asyncio.start_server(self._handle_http, address, self.settings['http_port'])
+        udp, _ = await self._loop.create_datagram_endpoint(
+            lambda: _UDPProtocol(self), local_addr=(address, self.settings['udp_port'])
+        )
+        self.http_port = http.sockets[0].getsockname()[1]
+        self.udp_port = udp.get_extra_info('sockname')[1]
+        writer = asyncio.create_task(self._write_batches())
+        self._ready.set()
+
+        try:
+            await self._stop.wait()
+        finally:
+            http.close()
+            udp.close()
+            # Closing idle keep-alive connections lets their handlers finish on their own
+            for connection in list(self._connections.values()):
+                connection.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await http.wait_closed()
+            await self.queue.join()
+            writer.cancel()
+            await self._loop.run_in_executor(None, self.storage.flush)
+
+    async def _write_batches(self):
+        # A single writer drains the queue, coalescing whatever is waiting into
+        # one storage write so bursts cost one transaction instead of many
+        while True:
+            points = await self.queue.get()
+            taken = 1
+            while not self.queue.empty() and len(points) < self.settings['max_batch_points']:
+                points = points + self.queue.get_nowait()
+                taken += 1
+            try:
+                await self._loop.run_in_executor(None, self.write, points)
+            except Exception as e:
+                print(f"Failed to write ingested metrics: {str(e)}")
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+
+    def write(self, points):
+        """Store a batch of points, evaluate thresholds once per host and feed each host's windowed rules"""
+        self.storage.write_points(points)
+        self.series_index.observe_points(points)
+
+        # Alert on each host's latest value per metric in the batch
+        hosts = {}
+        metrics = list(config.ALERT_THRESHOLDS)
+        latest = {}
+        # Rules keep windows, so they see every sample, grouped per host and timestamp in time order
+        rule_metrics = self.alert_system.rule_engine.metrics
+        samples = {}
+        for metric, timestamp, value, host, _ in points:
+            if metric in config.ALERT_THRESHOLDS:
+                row = hosts.setdefault(host, len(hosts))
+                key = (row, metrics.index(metric))
+                if key not in latest or timestamp >= latest[key][0]:
+                    latest[key] = (timestamp, value)
+            if metric in rule_metrics:
+                samples.setdefault((host, timestamp), {})[metric] = value
+
+        alerts = []
+        if latest:
+            values = np.full((len(hosts), len(metrics)), np.nan)
+            for (row, column), (_, value) in latest.items():
+                values[row, column] = value
+            alerts = self.alert_system.check_thresholds_batch(list(hosts), metrics, values)
+        for (host, timestamp), sample in sorted(samples.items(), key=lambda item: item[0][1]):
+            alerts += self.alert_system.check_rules({**sample, 'timestamp': from_epoch(timestamp)}, host=host)
+
+        for alert in alerts:
+            self.alert_system.log_alert(alert)
+            if config.EMAIL_CONFIG['enabled']:
+                self.alert_system.send_email_alert(alert)
+        return alerts
+
+    def stats(self):
+        """Ingestion counters and current queue depth"""
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'queued_batches': self.queue.qsize() if self.queue is not None else 0
+        }
+
+    async def _handle_http(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > self.settings['max_body_bytes']:
+                    await self._respond(writer, 413, {'error': 'payload too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                path, _, query = path.partition('?')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                if path == '/export' and method == 'GET':
+                    keep_alive = await self._export(writer, query, keep_alive)
+                else:
+                    status, payload, extra_headers = self._route(method, path, body)
+                    await self._respond(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def _route(self, method, path, body):
+        if path == '/health':
+            return 200, self.stats(), {}
+        if path == '/export':
+            return 405, {'error': 'use GET'}, {}
+        if path != '/ingest':
+            return 404, {'error': 'not found'}, {}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}, {}
+
+        points, rejected = parse_payload(body.decode('utf-8', errors='replace'))
+        self.rejected += rejected
+        if rejected and not points:
+            return 400, {'accepted': 0, 'rejected': rejected}, {}
+        if not self.submit(points):
+            # Backpressure: the agent keeps the batch and retries later
+            return 503, {'error': 'ingest queue full', 'accepted': 0, 'rejected': rejected}, {'Retry-After': '1'}
+        return 202, {'accepted': len(points), 'rejected': rejected}, {}
+
+    async def _export(self, writer, query, keep_alive):
+        """Stream GET /export?source=&format=&metrics=&start=&end=&host= as a chunked response; returns keep-alive"""
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        try:
+            end = datetime.fromisoformat(params['end']) if 'end' in params else datetime.now()
+            start = datetime.fromisoformat(params['start']) if 'start' in params else end - timedelta(days=1)
+            metrics = [metric for metric in params.get('metrics', '').split(',') if metric] or config.AGGREGATE_CONFIG['metrics']
+            chunks, mime, file_name = export(
+                self.storage, params.get('source', 'raw'), params.get('format', 'csv'), metrics, start, end,
+                params.get('host') or None
+            )
+        except (ValueError, ImportError) as e:
+            await self._respond(writer, 400, {'error': str(e)}, keep_alive)
+            return keep_alive
+
+        head = "HTTP/1.1 200 OK\r\n"
+        head += f"Content-Type: {mime}\r\nContent-Disposition: attachment; filename=\"{file_name}\"\r\n"
+        head += f"Transfer-Encoding: chunked\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        writer.write(head.encode('latin-1'))
+
+        # Each chunk is built in a worker thread and drained before the next is read,
+        # so a slow client paces the export instead of it piling up in memory
+        try:
+            while True:
+                chunk = await self._loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    writer.write(f"{len(chunk):X}\r\n".encode('latin-1') + chunk + b"\r\n")
+                    await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # The status line is already sent; closing without the final chunk marks the body incomplete
+            print(f"Failed to export metrics: {str(e)}")
+            return False
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+    async def _respond(self, writer, status, payload, keep_alive=True, extra_headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **(extra_headers or {})
+        }
+        head = f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+        head += ''.join(f"{key}: {value}\r\n" for key, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+        await writer.drain()
+
+def main(argv=None):
+    """Run the ingestion server until SIGINT or SIGTERM"""
+    parser = argparse.ArgumentParser(description="Accept metrics pushed by remote agents over HTTP and UDP")
+    parser.add_argument('--bind', default=config.INGEST_CONFIG['bind_address'], help="address to listen on")
+    parser.add_argument('--http-port', type=int, default=config.INGEST_CONFIG['http_port'])
+    parser.add_argument('--udp-port', type=int, default=config.INGEST_CONFIG['udp_port'])
+    parser.add_argument('--db-path', default=config.STORAGE_CONFIG['db_path'], help="SQLite database to write to")
+    args = parser.parse_args(argv)
+
+    shutdown = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: shutdown.set())
+
+    server = IngestServer(
+        storage=MetricsStorage(db_path=args.db_path),
+        settings={'bind_address': args.bind, 'http_port': args.http_port, 'udp_port': args.udp_port}
+    )
+    server.start()
+    print(f"Ingesting on http://{args.bind}:{server.http_port}/ingest and udp://{args.bind}:{server.udp_port}")
+    print(f"Exports stream from http://{args.bind}:{server.http_port}/export")
+
+    while not shutdown.wait(1):
+        pass
+
+    print("Shutting down ingest server")
+    server.stop(timeout=30)
+    server.alert_system.notifier.stop(timeout=10)
+    server.storage.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,19 @@
+import re
+import urllib.request
+from urllib.parse import urlencode, urlsplit
 import streamlit as st
 import pandas as pd
-import time
 from datetime import datetime, timedelta
 import config
-from data_generator import DataGenerator
-from alert_system import AlertSystem
-from components.kpi_cards import display_system_metrics, display_business_metrics, display_server_metrics
-from components.charts import create_real_time_line_chart, create_gauge_chart, create_multi_metric_chart
+from collector import MetricsCollector
+from viewer import MetricsViewer
+from ingest_server import IngestServer
+from series_index import AGGREGATIONS
+from importer import HISTORY_COLUMNS, import_history
+from exporter import EXPORT_FORMATS, EXPORT_SOURCES, export
+from metrics_provider import MetricsProvider
+from components.kpi_cards import display_system_metrics, display_business_metrics, display_server_metrics, display_latency_percentiles
+from components.charts import create_real_time_line_chart, create_gauge_chart, create_multi_metric_chart, get_live_history_chart, create_range_chart, create_history_chart, create_segment_chart
 
 # Page configuration
 st.set_page_config(
@@ -298,17 +305,72 @@ def load_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# One collector per server process, shared by every browser session; in viewer
+# mode it only tails the storage written by `python -m collector`
+@st.cache_resource
+def get_collector():
+    collector = MetricsViewer() if config.DASHBOARD_MODE == 'viewer' else MetricsCollector()
+    collector.start()
+    return collector
+
+collector = get_collector()
+
+# Optionally accept pushes from remote agents in this process, sharing the collector's store and alerts
+@st.cache_resource
+def get_ingest_server():
+    server = IngestServer(
+        storage=collector.storage, alert_system=collector.alert_system, series_index=collector.series_index
+    )
+    server.start()
+    return server
+
+if config.INGEST_CONFIG['embedded'] and config.DASHBOARD_MODE != 'viewer':
+    get_ingest_server()
+
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+@st.cache_data(ttl=30)
+def get_ingest_port():
+    """HTTP port of a running ingest server that can stream exports, or None"""
+    if config.INGEST_CONFIG['embedded'] and config.DASHBOARD_MODE != 'viewer':
+        return get_ingest_server().http_port
+
+    # A wildcard bind is reached locally through loopback
+    bind_address = config.INGEST_CONFIG['bind_address']
+    local_address = '127.0.0.1' if bind_address in ('0.0.0.0', '::', '') else bind_address
+    try:
+        with urllib.request.urlopen(f"http://{local_address}:{config.INGEST_CONFIG['http_port']}/health", timeout=0.5):
+            return config.INGEST_CONFIG['http_port']
+    except OSError:
+        return None
+
+def get_export_url():
+    """Base URL at which this session's browser can reach the ingest server's export stream, or None"""
+    if config.EXPORT_CONFIG['public_url']:
+        return config.EXPORT_CONFIG['public_url'].rstrip('/')
+    port = get_ingest_port()
+    if port is None:
+        return None
+
+    # The browser knows this host by the name it used to open the dashboard
+    browser_host = urlsplit(f"//{st.context.headers.get('Host', '')}").hostname or 'localhost'
+    bind_address = config.INGEST_CONFIG['bind_address']
+    if bind_address in ('0.0.0.0', '::', ''):
+        host = browser_host
+    elif bind_address in LOOPBACK_HOSTS or bind_address.startswith('127.'):
+        # Only a browser on this machine can reach a loopback-bound server
+        if browser_host not in LOOPBACK_HOSTS and not browser_host.startswith('127.'):
+            return None
+        host = bind_address
+    else:
+        host = bind_address
+    return f"http://[{host}]:{port}" if ':' in host else f"http://{host}:{port}"
+
 # Initialize session state
-if 'data_generator' not in st.session_state:
-    st.session_state.data_generator = DataGenerator()
-    st.session_state.alert_system = AlertSystem()
-    st.session_state.metrics_history = []
+if 'previous_metrics' not in st.session_state:
     st.session_state.previous_metrics = None
     st.session_state.active_section = 'overview'
-
-# Function to generate unique timestamp-based keys
-def get_unique_key(base_name):
-    return f"{base_name}_{int(time.time() * 1000000)}"
+    st.session_state.chart_figures = {}
 
 # Load custom CSS
 load_custom_css()
@@ -414,105 +476,147 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-# Generate current metrics for all sections
-current_time = datetime.now()
-system_metrics = st.session_state.data_generator.get_system_metrics()
-business_metrics = st.session_state.data_generator.get_business_metrics()
-server_metrics = st.session_state.data_generator.get_server_metrics()
-all_metrics = {**system_metrics, **business_metrics, **server_metrics}
-
-# Store metrics history
-st.session_state.metrics_history.append(all_metrics)
-if len(st.session_state.metrics_history) > config.MAX_DATA_POINTS:
-    st.session_state.metrics_history = st.session_state.metrics_history[-config.MAX_DATA_POINTS:]
-
-# Display content based on active section
-if st.session_state.active_section == 'overview':
+# Section renderers
+def render_overview(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>📊 Dashboard Overview</h2></div>', unsafe_allow_html=True)
     
     # Quick Stats
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("🖥️ CPU Usage", f"{system_metrics['cpu_usage']:.1f}%")
+        st.metric("🖥️ CPU Usage", f"{metrics.system['cpu_usage']:.1f}%")
     with col2:
-        st.metric("💰 Revenue", f"${business_metrics['revenue']:,.0f}")
+        st.metric("💰 Revenue", f"${metrics.business['revenue']:,.0f}")
     with col3:
-        st.metric("👥 Active Users", f"{business_metrics['active_users']:,}")
+        st.metric("👥 Active Users", f"{metrics.business['active_users']:,}")
     with col4:
-        st.metric("⚡ Response Time", f"{server_metrics['response_time']:.0f}ms")
+        st.metric("⚡ Response Time", f"{metrics.server['response_time']:.0f}ms")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'system':
+def render_system(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>🖥️ System Performance Metrics</h2></div>', unsafe_allow_html=True)
-    display_system_metrics(system_metrics)
+    display_system_metrics(metrics.system)
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'business':
+def render_business(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>💼 Business KPI Dashboard</h2></div>', unsafe_allow_html=True)
-    display_business_metrics(business_metrics, st.session_state.previous_metrics)
+    display_business_metrics(metrics.business, st.session_state.previous_metrics)
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'analytics':
+def render_analytics(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>📈 Real-Time Analytics</h2></div>', unsafe_allow_html=True)
     
-    if len(st.session_state.metrics_history) > 1:
-        df = pd.DataFrame(st.session_state.metrics_history)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-            cpu_chart = create_real_time_line_chart(
-                df.tail(20), 'timestamp', 'cpu_usage', 
-                'CPU Usage Trend', config.COLORS['warning']
-            )
-            st.plotly_chart(cpu_chart, use_container_width=True, key=get_unique_key("analytics_cpu"))
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-            revenue_chart = create_real_time_line_chart(
-                df.tail(20), 'timestamp', 'revenue',
-                'Revenue Analytics', config.COLORS['success']
-            )
-            st.plotly_chart(revenue_chart, use_container_width=True, key=get_unique_key("analytics_revenue"))
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-            memory_gauge = create_gauge_chart(
-                system_metrics['memory_usage'], 'Memory Usage', 100, 85
-            )
-            st.plotly_chart(memory_gauge, use_container_width=True, key=get_unique_key("analytics_memory"))
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-            users_chart = create_real_time_line_chart(
-                df.tail(20), 'timestamp', 'active_users',
-                'User Activity Analytics', config.COLORS['info']
+    # The live charts read the collector's in-memory window, so a rerun runs no storage query
+    history = collector.history
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        cpu_chart = get_live_history_chart(
+            st.session_state.chart_figures, "analytics_cpu", history, 'cpu_usage', 'CPU Usage Trend',
+            config.COLORS['warning'], limit=20
+        )
+        st.plotly_chart(cpu_chart, use_container_width=True, key="analytics_cpu")
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        revenue_chart = get_live_history_chart(
+            st.session_state.chart_figures, "analytics_revenue", history, 'revenue', 'Revenue Analytics',
+            config.COLORS['success'], limit=20
+        )
+        st.plotly_chart(revenue_chart, use_container_width=True, key="analytics_revenue")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        memory_gauge = create_gauge_chart(
+            metrics.system['memory_usage'], 'Memory Usage', 100, 85
+        )
+        st.plotly_chart(memory_gauge, use_container_width=True, key="analytics_memory")
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        users_chart = get_live_history_chart(
+            st.session_state.chart_figures, "analytics_users", history, 'active_users', 'User Activity Analytics',
+            config.COLORS['info'], limit=20
+        )
+        st.plotly_chart(users_chart, use_container_width=True, key="analytics_users")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Every metric is a series of name plus labels (host, family, and any agent labels)
+    st.subheader("🔎 Series Explorer")
+    series_index = collector.series_index
+    selector = st.text_input("Series selector", 'cpu_usage{host=~".+"}', key="series_selector",
+                             help='e.g. cpu_usage{region="eu"}, {family="business"}, response_time{host!="local"}')
+    group_col, agg_col = st.columns(2)
+    with group_col:
+        group_by = st.multiselect("Group by", series_index.label_keys(), key="series_group_by")
+    with agg_col:
+        aggregation = st.selectbox("Aggregation", AGGREGATIONS, key="series_aggregation")
+    
+    try:
+        series_ids = series_index.select(selector)
+        st.caption(f"{len(series_ids)} matching series")
+        if group_by:
+            grouped = series_index.aggregate(selector, by=group_by, func=aggregation)
+            st.dataframe(pd.DataFrame(
+                [(*group, value) for group, value in grouped.items()], columns=[*group_by, aggregation]
+            ), use_container_width=True, hide_index=True)
+        else:
+            st.dataframe(series_index.frame(series_ids[:500]), use_container_width=True, hide_index=True)
+        
+        # Recent history is kept compressed in memory per series, so charting one needs no query
+        if series_ids:
+            labels = {series_id: series_index.labels(series_id) for series_id in series_ids[:100]}
+            chosen = st.selectbox(
+                "Chart series", list(labels), key="series_chart",
+                format_func=lambda series_id: f"{labels[series_id]['__name__']}{{{', '.join(f'{key}={value}' for key, value in sorted(labels[series_id].items()) if key != '__name__')}}}"
             )
-            st.plotly_chart(users_chart, use_container_width=True, key=get_unique_key("analytics_users"))
-            st.markdown('</div>', unsafe_allow_html=True)
+            history = series_index.history_frame(chosen, start=datetime.now() - timedelta(hours=1))
+            if len(history):
+                st.plotly_chart(
+                    create_real_time_line_chart(history, 'timestamp', 'value', 'Last Hour (in-memory history)'),
+                    use_container_width=True, key="series_history_chart"
+                )
+    except (ValueError, re.error) as e:
+        st.error(str(e))
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'alerts':
+def render_alerts(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>🚨 Alert Management Center</h2></div>', unsafe_allow_html=True)
+    current_time = datetime.now()
+    
+    # Thresholds are evaluated by the collector on every sample; this view only reads the log
+    alert_system = collector.alert_system
     
-    # Check for alerts
-    alerts = st.session_state.alert_system.check_thresholds(all_metrics)
-    for alert in alerts:
-        st.session_state.alert_system.log_alert(alert)
+    # Severity totals come from running counters, not a scan of the history
+    alert_counts = alert_system.get_alert_counts()
+    count_cols = st.columns(4)
+    for col, severity in zip(count_cols, ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']):
+        with col:
+            st.metric(f"{severity.title()} Alerts", alert_counts.get(severity, 0))
     
-    recent_alerts = st.session_state.alert_system.get_recent_alerts(10)
+    filter_col1, filter_col2 = st.columns(2)
+    with filter_col1:
+        metric_filter = st.selectbox("Metric", ["All"] + alert_system.alert_store.metrics(), key="alert_metric_filter")
+    with filter_col2:
+        severity_filter = st.selectbox("Severity", ["All", "CRITICAL", "HIGH", "MEDIUM", "LOW"], key="alert_severity_filter")
+    
+    recent_alerts = alert_system.query_alerts(
+        metric=None if metric_filter == "All" else metric_filter,
+        severity=None if severity_filter == "All" else severity_filter,
+        limit=10
+    )
     
     if recent_alerts:
-        for alert in reversed(recent_alerts):
+        for alert in recent_alerts:
             severity_color = {
                 'CRITICAL': '🔴',
                 'HIGH': '🟠', 
@@ -525,8 +629,8 @@ elif st.session_state.active_section == 'alerts':
                 <div style="display: flex; justify-content: space-between; align-items: center;">
                     <div>
                         <strong>{severity_color} {alert['severity']} ALERT</strong><br>
-                        <span style="font-size: 1.1rem;">{alert['metric'].replace('_', ' ').title()}: <strong>{alert['value']:.2f}</strong></span><br>
-                        <small>Threshold: {alert['threshold']:.2f} | Time: {alert['timestamp'].strftime('%H:%M:%S')}</small>
+                        <span style="font-size: 1.1rem;">{alert['metric'].replace('_', ' ').title()}{f" @ {alert['host']}" if alert.get('host') else ''}: <strong>{alert['value']:.2f}</strong></span><br>
+                        <small>{f"Rule: {alert['expr']}" if 'expr' in alert else f"Threshold: {alert['threshold']:.2f}"} | Time: {alert['timestamp'].strftime('%H:%M:%S')}</small>
                     </div>
                     <div style="font-size: 2rem; opacity: 0.7;">{severity_color}</div>
                 </div>
@@ -545,13 +649,39 @@ elif st.session_state.active_section == 'alerts':
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'server':
+def render_server(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>🌐 Server Performance Dashboard</h2></div>', unsafe_allow_html=True)
-    display_server_metrics(server_metrics)
+    display_server_metrics(metrics.server)
+    
+    # Percentiles are merged from per-bucket quantile sketches, not recomputed from raw samples
+    st.subheader("⏱️ Latency Percentiles (Last Hour)")
+    current_time = datetime.now()
+    display_latency_percentiles({
+        metric: collector.storage.query_quantiles(metric, start=current_time - timedelta(hours=1), end=current_time)
+        for metric in config.SKETCH_CONFIG['metrics']
+    })
+    
+    # Hosts pushing through the ingest server, each stored as its own series
+    hosts = collector.storage.list_hosts()
+    if hosts:
+        st.subheader("🖥️ Fleet")
+        st.dataframe(pd.DataFrame(hosts), use_container_width=True, hide_index=True)
+        
+        host_col, metric_col = st.columns(2)
+        with host_col:
+            fleet_host = st.selectbox("Host", [host['host'] for host in hosts], key="fleet_host")
+        with metric_col:
+            fleet_metric = st.selectbox("Metric", ['cpu_usage', 'memory_usage', 'disk_usage', 'response_time',
+                                                   'requests_per_second', 'error_rate'], key="fleet_metric")
+        fleet_chart = create_history_chart(
+            collector.storage, fleet_metric, f"{fleet_metric.replace('_', ' ').title()} on {fleet_host}",
+            start=current_time - timedelta(hours=1), host=fleet_host
+        )
+        st.plotly_chart(fleet_chart, use_container_width=True, key="fleet_chart")
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'settings':
+def render_settings(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>⚙️ Dashboard Settings</h2></div>', unsafe_allow_html=True)
     
@@ -569,36 +699,147 @@ elif st.session_state.active_section == 'settings':
         st.number_input("Data Points", min_value=10, max_value=1000, value=100)
         st.checkbox("Auto-save Data", value=True)
     
+    # Large backfills are better run from the command line: python -m importer FILE...
+    st.subheader("📥 Import History")
+    import_path = st.text_input(
+        "CSV or Parquet file", key="import_path", placeholder="/path/to/history.csv",
+        help=f"Columns: {', '.join(HISTORY_COLUMNS)}. Rows older than {config.SEGMENT_CONFIG['retention_days']} days are not kept."
+    )
+    if st.button("Import", key="import_button", disabled=not import_path):
+        try:
+            with st.spinner("Importing..."):
+                stats = import_history(import_path, storage=collector.storage, segments=collector.segments)
+            st.success(
+                f"Imported {stats['rows']:,} rows in {stats['seconds']:.1f}s: {stats['inserted']:,} samples stored, "
+                f"{stats['sealed']:,} sealed into history segments ({stats['skipped']:,} already stored)"
+            )
+            if stats['expired'] or stats['rejected']:
+                st.warning(
+                    f"{stats['expired']:,} rows were older than the {config.SEGMENT_CONFIG['retention_days']}-day "
+                    f"history retention and {stats['rejected']:,} rows had no usable timestamp or values; neither was stored"
+                )
+        except (OSError, ValueError, ImportError) as e:
+            st.error(f"Failed to import {import_path}: {str(e)}")
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'reports':
+def render_reports(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>📋 Analytics Reports</h2></div>', unsafe_allow_html=True)
+    current_time = datetime.now()
     
     st.subheader("📊 Performance Summary")
     
-    if len(st.session_state.metrics_history) > 0:
-        df = pd.DataFrame(st.session_state.metrics_history)
+    # Running aggregates are maintained by the collector, so this is O(1) in history length
+    stats = collector.aggregates.summary(window=config.REPORT_WINDOW, now=current_time)
+    
+    if stats['cpu_usage']['count'] > 0:
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Avg CPU Usage", f"{df['cpu_usage'].mean():.1f}%")
-            st.metric("Max Memory", f"{df['memory_usage'].max():.1f}%")
+            st.metric("Avg CPU Usage", f"{stats['cpu_usage']['mean']:.1f}%")
+            st.metric("Max Memory", f"{stats['memory_usage']['max']:.1f}%")
         
         with col2:
-            st.metric("Total Revenue", f"${df['revenue'].sum():,.0f}")
-            st.metric("Peak Users", f"{df['active_users'].max():,}")
+            st.metric("Total Revenue", f"${stats['revenue']['sum']:,.0f}")
+            st.metric("Peak Users", f"{stats['active_users']['max']:,.0f}")
         
         with col3:
-            st.metric("Avg Response", f"{df['response_time'].mean():.0f}ms")
-            st.metric("Total Requests", f"{df['requests_per_second'].sum():,}")
+            st.metric("Avg Response", f"{stats['response_time']['mean']:.0f}ms")
+            st.metric("Total Requests", f"{stats['requests_per_second']['sum']:,.0f}")
+    
+    st.subheader("⏱️ Latency Percentiles")
+    report_window_seconds = config.AGGREGATE_CONFIG['windows'][config.REPORT_WINDOW][0]
+    display_latency_percentiles({
+        metric: collector.storage.query_quantiles(
+            metric, start=current_time - timedelta(seconds=report_window_seconds), end=current_time
+        )
+        for metric in config.SKETCH_CONFIG['metrics']
+    })
+    
+    st.subheader("📈 Long-Range History")
+    
+    history_ranges = {"Last Hour": timedelta(hours=1), "Last 24 Hours": timedelta(days=1),
+                      "Last 7 Days": timedelta(days=7), "Last 30 Days": timedelta(days=30)}
+    range_col, metric_col = st.columns(2)
+    with range_col:
+        history_range = st.selectbox("Time Range", list(history_ranges), index=1, key="report_history_range")
+    with metric_col:
+        history_metric = st.selectbox("Metric", config.AGGREGATE_CONFIG['metrics'], key="report_history_metric")
+    
+    # Sealed days map raw samples straight from segment files; otherwise the storage
+    # query planner reads the coarsest rollup tier that still fills the chart
+    coverage = collector.segments.coverage()
+    use_segments = st.checkbox(
+        "Raw samples from sealed segments", key="report_history_segments", disabled=coverage is None,
+        help=f"Sealed through {coverage[1]:%Y-%m-%d %H:%M}" if coverage else "No days have been sealed yet"
+    )
+    if use_segments and coverage:
+        history_chart = create_segment_chart(
+            collector.segments, history_metric, history_metric.replace('_', ' ').title(),
+            start=current_time - history_ranges[history_range], end=current_time
+        )
+    else:
+        history_chart = create_range_chart(
+            collector.storage, history_metric, history_metric.replace('_', ' ').title(),
+            start=current_time - history_ranges[history_range], end=current_time
+        )
+    st.plotly_chart(history_chart, use_container_width=True, key="report_history_chart")
+    
+    st.subheader("📤 Export Data")
+    
+    source_col, format_col, range_col = st.columns(3)
+    with source_col:
+        export_source = st.selectbox("Source", EXPORT_SOURCES, key="export_source",
+                                     format_func=lambda source: "Raw samples" if source == 'raw' else f"{source} rollups")
+    with format_col:
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format", format_func=str.upper)
+    with range_col:
+        export_range = st.selectbox("Time Range", list(history_ranges), index=1, key="export_range")
+    export_metrics = st.multiselect(
+        "Metrics", [metric for metrics in config.METRIC_FAMILIES.values() for metric in metrics],
+        default=config.AGGREGATE_CONFIG['metrics'], key="export_metrics"
+    )
+    export_start = current_time - history_ranges[export_range]
+    
+    # The ingest server streams exports chunk by chunk, so nothing is held in this process
+    export_url = get_export_url()
+    if export_url:
+        query = urlencode({
+            'source': export_source, 'format': export_format, 'metrics': ','.join(export_metrics),
+            'start': export_start.isoformat(timespec='seconds'), 'end': current_time.isoformat(timespec='seconds')
+        })
+        st.link_button("⬇️ Download", f"{export_url}/export?{query}", disabled=not export_metrics)
+    else:
+        # Streamlit hands download data to the browser in one piece, so this path is capped
+        max_mb = config.EXPORT_CONFIG['max_inline_bytes'] / 1048576
+        st.caption(f"No ingest server is reachable from this browser, so exports are built in memory here, up to "
+                   f"{max_mb:.0f} MB. Run python -m ingest_server (or set EXPORT_CONFIG['public_url']) to stream larger ones.")
+        if st.button("Prepare Download", key="export_prepare", disabled=not export_metrics):
+            st.session_state.pop('export_file', None)
+            try:
+                chunks, mime, file_name = export(
+                    collector.storage, export_source, export_format, export_metrics, export_start, current_time
+                )
+                data = bytearray()
+                for chunk in chunks:
+                    data += chunk
+                    if len(data) > config.EXPORT_CONFIG['max_inline_bytes']:
+                        raise ValueError(f"the export is larger than {max_mb:.0f} MB; choose a shorter range or stream it from the ingest server")
+                st.session_state.export_file = (bytes(data), mime, file_name)
+            except (ValueError, ImportError) as e:
+                st.error(f"Failed to export metrics: {str(e)}")
+        if 'export_file' in st.session_state:
+            data, mime, file_name = st.session_state.export_file
+            st.download_button("⬇️ Download", data, file_name=file_name, mime=mime, key="export_download")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'realtime':
+def render_realtime(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>🔄 Real-Time Monitor</h2></div>', unsafe_allow_html=True)
+    current_time = datetime.now()
     
     # Auto-refresh real-time data
     placeholder = st.empty()
@@ -610,30 +851,65 @@ elif st.session_state.active_section == 'realtime':
             # Real-time metrics
             col1, col2, col3 = st.columns(3)
             with col1:
-                display_system_metrics(system_metrics)
+                display_system_metrics(metrics.system)
             with col2:
-                display_business_metrics(business_metrics, st.session_state.previous_metrics)
+                display_business_metrics(metrics.business, st.session_state.previous_metrics)
             with col3:
-                display_server_metrics(server_metrics)
+                display_server_metrics(metrics.server)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_section == 'mobile':
+def render_mobile(metrics):
     st.markdown('<div class="section-container">', unsafe_allow_html=True)
     st.markdown('<div class="section-header"><h2>📱 Mobile Dashboard View</h2></div>', unsafe_allow_html=True)
     
     # Compact mobile-friendly layout
     st.metric("System Health", "98.5%", "↗️ +0.2%")
-    st.metric("Revenue Today", f"${business_metrics['revenue']:,.0f}", "↗️ +12%")
-    st.metric("Active Users", f"{business_metrics['active_users']:,}", "↗️ +8%")
+    st.metric("Revenue Today", f"${metrics.business['revenue']:,.0f}", "↗️ +12%")
+    st.metric("Active Users", f"{metrics.business['active_users']:,}", "↗️ +8%")
     
-    st.progress(system_metrics['cpu_usage'] / 100)
-    st.caption(f"CPU Usage: {system_metrics['cpu_usage']:.1f}%")
+    st.progress(metrics.system['cpu_usage'] / 100)
+    st.caption(f"CPU Usage: {metrics.system['cpu_usage']:.1f}%")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Update previous metrics
-st.session_state.previous_metrics = all_metrics.copy()
+SECTION_RENDERERS = {
+    'overview': render_overview,
+    'system': render_system,
+    'business': render_business,
+    'analytics': render_analytics,
+    'alerts': render_alerts,
+    'server': render_server,
+    'settings': render_settings,
+    'reports': render_reports,
+    'realtime': render_realtime,
+    'mobile': render_mobile
+}
+
+# Sections showing live data rerun on their own as a fragment; the header,
+# navigation, sidebar and CSS above are only rendered on full-page reruns
+LIVE_SECTIONS = {'overview', 'system', 'business', 'analytics', 'alerts', 'server', 'reports', 'realtime', 'mobile'}
+
+def render_section(renderer):
+    """Render one section against a fresh lazily-read metrics snapshot"""
+    metrics = MetricsProvider(collector)
+    if not collector.has_sample():
+        # Only possible in viewer mode, before the collector daemon has written anything; checked
+        # without touching a metric family so each section still reads only the families it shows
+        st.info("Waiting for the collector to write its first sample...")
+        return
+    renderer(metrics)
+    
+    # Update previous metrics
+    if 'business' in metrics.loaded:
+        st.session_state.previous_metrics = metrics.business
+
+# Display content based on active section
+active_renderer = SECTION_RENDERERS[st.session_state.active_section]
+if st.session_state.active_section in LIVE_SECTIONS:
+    st.fragment(render_section, run_every=refresh_interval if auto_refresh else None)(active_renderer)
+else:
+    render_section(active_renderer)
 
 # Enhanced Footer
 st.markdown("""
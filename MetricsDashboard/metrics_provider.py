@@ -0,0 +1,31 @@
+from functools import cached_property
+
+class MetricsProvider:
+    def __init__(self, collector):
+        self.collector = collector
+        self.loaded = set()
+
+    def _load(self, family):
+        """Read one metric family from the collector's latest sample"""
+        self.loaded.add(family)
+        return self.collector.latest(family)
+
+    @cached_property
+    def system(self):
+        """System metrics, read on first access and memoized for this rerun"""
+        return self._load('system')
+
+    @cached_property
+    def business(self):
+        """Business metrics, read on first access and memoized for this rerun"""
+        return self._load('business')
+
+    @cached_property
+    def server(self):
+        """Server metrics, read on first access and memoized for this rerun"""
+        return self._load('server')
+
+    @cached_property
+    def all(self):
+        """All metric families merged into one dict"""
+        return {**self.system, **self.business, **self.server}
@@ -0,0 +1,97 @@
+import threading
+import numpy as np
+import pandas as pd
+
+class MetricsRingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = {}
+        self._timestamps = np.empty(2 * capacity, dtype='datetime64[ns]')
+        self._head = -1  # physical index of the newest sample
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _allocate(self, sample):
+        """Preallocate one array per metric from the first sample's types"""
+        for metric, value in sample.items():
+            if metric == 'timestamp':
+                continue
+            dtype = np.int64 if isinstance(value, (int, np.integer)) and not isinstance(value, bool) else np.float64
+            self.columns[metric] = np.zeros(2 * self.capacity, dtype=dtype)
+
+    def append(self, sample):
+        """Append one merged metrics sample in O(1)"""
+        with self._lock:
+            if not self.columns:
+                self._allocate(sample)
+
+            # Every slot is mirrored at +capacity so the newest N samples
+            # always sit in one contiguous slice of the backing arrays
+            head = (self._head + 1) % self.capacity
+            mirror = head + self.capacity
+            timestamp = np.datetime64(sample['timestamp'], 'ns')
+            self._timestamps[head] = timestamp
+            self._timestamps[mirror] = timestamp
+
+            for metric, column in self.columns.items():
+                value = sample.get(metric)
+                if value is None:
+                    value = np.nan if column.dtype.kind == 'f' else 0
+                column[head] = value
+                column[mirror] = value
+
+            self._head = head
+            self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _slice(self, n):
+        n = self._size if n is None else max(0, min(n, self._size))
+        end = self._head + self.capacity + 1
+        return slice(end - n, end)
+
+    def timestamps(self, n=None):
+        """Get a zero-copy view of the last n timestamps, oldest first"""
+        return self._timestamps[self._slice(n)]
+
+    def window(self, metric, n=None):
+        """Get a zero-copy view of the last n values of a metric, oldest first"""
+        return self.columns[metric][self._slice(n)]
+
+    def latest(self):
+        """Get the newest sample as a dict"""
+        if self._size == 0:
+            return None
+
+        latest = {'timestamp': pd.Timestamp(self._timestamps[self._head]).to_pydatetime()}
+        for metric, column in self.columns.items():
+            latest[metric] = column[self._head].item()
+        return latest
+
+    def extend(self, frame):
+        """Append the rows of a wide DataFrame such as MetricsStorage.query_window returns, oldest first"""
+        for sample in frame.tail(self.capacity).to_dict('records'):
+            self.append({metric: None if pd.isna(value) else value for metric, value in sample.items()})
+
+    def _frame(self, window, metrics):
+        # Copied, because the collector keeps writing into the shared arrays after this returns
+        data = {'timestamp': self._timestamps[window].copy()}
+        for metric in metrics or self.columns:
+            if metric in self.columns:
+                data[metric] = self.columns[metric][window].copy()
+        return pd.DataFrame(data, copy=False)
+
+    def to_frame(self, n=None, metrics=None):
+        """Build a DataFrame over the last n samples"""
+        with self._lock:
+            return self._frame(self._slice(n), metrics)
+
+    def since(self, timestamp, metrics=None, n=None):
+        """Build a DataFrame over those of the last n samples newer than timestamp (None for all of them)"""
+        with self._lock:
+            window = self._slice(n)
+            if timestamp is not None:
+                first = np.searchsorted(self._timestamps[window], np.datetime64(timestamp, 'ns'), side='right')
+                window = slice(window.start + first, window.stop)
+            return self._frame(window, metrics)
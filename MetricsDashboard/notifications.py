@@ -0,0 +1,187 @@
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import config
+
+def format_alert(alert):
+    """Format the details block for one alert"""
+    # Alerts from remote hosts and from rules say where and why they fired
+    extras = ''.join(
+        f"{label}: {alert[key]}\n            " for key, label in (('host', 'Host'), ('rule', 'Rule'), ('expr', 'Expression'))
+        if alert.get(key) is not None
+    )
+    return f"""
+            Metric: {alert['metric'].replace('_', ' ').title()}
+            {extras}Current Value: {alert['value']:.2f}
+            Threshold: {alert['threshold']:.2f}
+            Severity: {alert['severity']}
+            Time: {alert['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
+            """
+
+def build_alert_message(alerts, email_config):
+    """Build one email for a single alert or a digest of several"""
+    msg = MIMEMultipart()
+    msg['From'] = email_config['sender_email']
+    msg['To'] = email_config['recipient_email']
+
+    if len(alerts) == 1:
+        alert = alerts[0]
+        msg['Subject'] = f"🚨 KPI Alert: {alert['metric'].upper()} - {alert['severity']}"
+        details = format_alert(alert)
+    else:
+        severities = sorted({alert['severity'] for alert in alerts})
+        msg['Subject'] = f"🚨 KPI Alert Digest: {len(alerts)} alerts ({', '.join(severities)})"
+        details = "\n".join(format_alert(alert) for alert in alerts)
+
+    body = f"""
+            Alert Details:
+            {details}
+            Please investigate immediately.
+
+            MetricsDashboard Alert System
+            """
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+class NotificationDispatcher:
+    def __init__(self, email_config=None, settings=None):
+        self.email_config = email_config or config.EMAIL_CONFIG
+        self.settings = {**config.NOTIFICATION_CONFIG, **(settings or {})}
+
+        self.queue = queue.Queue(maxsize=self.settings['queue_size'])
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        # submit() runs on producer threads; the other counters only change on the worker
+        self._dropped_lock = threading.Lock()
+
+        self._connection = None
+        self._connection_used = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def submit(self, alert):
+        """Queue an alert for delivery without blocking; returns False if it was dropped"""
+        try:
+            self.queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def start(self):
+        """Start the delivery worker thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Deliver what is already queued, then stop the worker and close the connection"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still inside deliver(); the worker owns the connection and closes it when it exits
+                return
+            self._thread = None
+        self._close_connection()
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self.queue.empty()):
+            try:
+                alert = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                self._close_idle_connection()
+                continue
+
+            # Alerts arriving within the batch window go out as one digest
+            batch = [alert]
+            deadline = time.monotonic() + self.settings['batch_window']
+            while len(batch) < self.settings['max_batch_size']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self.deliver(batch)
+            except Exception as e:
+                # One bad batch (an alert missing a field, say) must not kill the only worker
+                print(f"Failed to deliver alert batch: {str(e)}")
+                self.failed += len(batch)
+        self._close_connection()
+
+    def deliver(self, alerts):
+        """Send a batch of alerts, retrying with exponential backoff"""
+        msg = build_alert_message(alerts, self.email_config)
+        retries = self.settings['max_retries']
+
+        for attempt in range(retries + 1):
+            try:
+                connection = self._get_connection()
+                connection.sendmail(
+                    self.email_config['sender_email'], self.email_config['recipient_email'], msg.as_string()
+                )
+                self._connection_used = time.monotonic()
+                self.sent += len(alerts)
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                self._close_connection()
+                if attempt == retries:
+                    print(f"Failed to send email alert: {str(e)}")
+                    break
+                time.sleep(self.settings['retry_backoff'] * (2 ** attempt))
+
+        self.failed += len(alerts)
+        return False
+
+    def _get_connection(self):
+        """Reuse the open SMTP session when it is still alive, otherwise reconnect"""
+        if self._connection is not None:
+            try:
+                if self._connection.noop()[0] == 250:
+                    return self._connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_connection()
+
+        connection = smtplib.SMTP(
+            self.email_config['smtp_server'], self.email_config['smtp_port'],
+            timeout=self.settings['smtp_timeout']
+        )
+        try:
+            if self.email_config.get('use_tls', True):
+                connection.starttls()
+            if self.email_config.get('sender_password'):
+                connection.login(self.email_config['sender_email'], self.email_config['sender_password'])
+        except (smtplib.SMTPException, OSError):
+            # The session never became usable, so close its socket before deliver() retries
+            connection.close()
+            raise
+
+        self._connection = connection
+        self._connection_used = time.monotonic()
+        return connection
+
+    def _close_idle_connection(self):
+        if self._connection is not None and time.monotonic() - self._connection_used > self.settings['idle_timeout']:
+            self._close_connection()
+
+    def _close_connection(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._connection = None
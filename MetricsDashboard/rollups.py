@@ -0,0 +1,134 @@
+import math
+from sketches import DDSketch
+import config
+
+SECONDS_PER_DAY = 86400
+
+def bucket_start(timestamp, width):
+    """Start of the bucket of the given width that holds an epoch timestamp"""
+    return timestamp - timestamp % width
+
+def plan_tier(start, end, max_points, now=None, tiers=None, retention_days=None):
+    """Pick the coarsest tier that still fills the chart and still holds the range"""
+    tiers = tiers or config.ROLLUP_CONFIG['tiers']
+    retention_days = retention_days or {
+        'raw': config.STORAGE_CONFIG['retention_days'], **config.ROLLUP_CONFIG['retention_days']
+    }
+    now = now if now is not None else end
+    min_points = max_points * config.ROLLUP_CONFIG['min_fill']
+
+    def covers(tier):
+        return start >= now - retention_days[tier] * SECONDS_PER_DAY
+
+    candidates = sorted(tiers.items(), key=lambda item: item[1], reverse=True)
+    for tier, width in candidates:
+        if (end - start) / width >= min_points and covers(tier):
+            return tier
+    if covers('raw'):
+        return 'raw'
+
+    # Nothing fine enough still holds the start of the range; fall back to the
+    # finest tier that does
+    for tier, _ in reversed(candidates):
+        if covers(tier):
+            return tier
+    return candidates[0][0]
+
+def cover_range(start, end, tiers=None):
+    """Split [start, end) into (tier, first_bucket, end_bucket) spans using as few buckets as possible"""
+    tiers = tiers or config.ROLLUP_CONFIG['tiers']
+    ordered = sorted(tiers.items(), key=lambda item: item[1], reverse=True)
+
+    # Whole coarse buckets cover the middle of the range and finer tiers fill
+    # in the ragged edges; the finest tier's edge buckets may overhang slightly
+    def cover(low, high, level):
+        if low >= high:
+            return []
+        tier, width = ordered[level]
+        if level == len(ordered) - 1:
+            return [(tier, bucket_start(low, width), high)]
+
+        inner_low = math.ceil(low / width) * width
+        inner_high = math.floor(high / width) * width
+        if inner_low >= inner_high:
+            return cover(low, high, level + 1)
+        return cover(low, inner_low, level + 1) + [(tier, inner_low, inner_high)] + cover(inner_high, high, level + 1)
+
+    return cover(start, end, 0)
+
+class RollupAccumulator:
+    def __init__(self, tiers=None):
+        self.tiers = tiers or config.ROLLUP_CONFIG['tiers']
+        # (tier, metric, bucket) -> [min, max, sum, count, last, last_time] since the last drain
+        self.partials = {}
+        self.sketch_metrics = set(config.SKETCH_CONFIG['metrics'])
+        self.sketches = {}
+
+    def add(self, metric, timestamp, value):
+        """Fold one raw sample into its bucket on every tier"""
+        for tier, width in self.tiers.items():
+            key = (tier, metric, bucket_start(timestamp, width))
+            if metric in self.sketch_metrics:
+                sketch = self.sketches.get(key)
+                if sketch is None:
+                    sketch = self.sketches[key] = DDSketch()
+                sketch.add(value)
+
+            partial = self.partials.get(key)
+            if partial is None:
+                self.partials[key] = [value, value, value, 1, value, timestamp]
+                continue
+
+            partial[0] = min(partial[0], value)
+            partial[1] = max(partial[1], value)
+            partial[2] += value
+            partial[3] += 1
+            if timestamp >= partial[5]:
+                partial[4] = value
+                partial[5] = timestamp
+
+    def drain(self):
+        """Take the partial buckets accumulated since the last drain as rows for an upsert"""
+        rows = [(*key, *partial) for key, partial in self.partials.items()]
+        self.partials = {}
+        return rows
+
+    def drain_sketches(self):
+        """Take the partial bucket sketches accumulated since the last drain"""
+        sketches, self.sketches = self.sketches, {}
+        return sketches
+
+    def restore(self, rows, sketches):
+        """Put back drained buckets whose write failed, merged with any accumulated since"""
+        for tier, metric, bucket, low, high, total, count, last, last_time in rows:
+            partial = self.partials.get((tier, metric, bucket))
+            if partial is None:
+                self.partials[(tier, metric, bucket)] = [low, high, total, count, last, last_time]
+                continue
+
+            partial[0] = min(partial[0], low)
+            partial[1] = max(partial[1], high)
+            partial[2] += total
+            partial[3] += count
+            if last_time > partial[5]:
+                partial[4] = last
+                partial[5] = last_time
+
+        for key, sketch in sketches.items():
+            pending = self.sketches.get(key)
+            self.sketches[key] = sketch if pending is None else sketch.merge(pending)
+
+    def pending_sketches(self, tier, metric, start, end):
+        """Partial bucket sketches for one tier and metric in [start, end) not yet written"""
+        return [
+            sketch for (key_tier, key_metric, bucket), sketch in self.sketches.items()
+            if key_tier == tier and key_metric == metric and start <= bucket < end
+        ]
+
+    def pending(self, tier, metric, start, end):
+        """Partial buckets for one tier and metric not yet written, as upsert rows"""
+        return [
+            (key_tier, key_metric, bucket, *partial)
+            for (key_tier, key_metric, bucket), partial in self.partials.items()
+            if key_tier == tier and key_metric == metric and start <= bucket <= end
+        ]
@@ -0,0 +1,183 @@
+import operator
+import re
+from collections import deque
+from datetime import datetime
+import config
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+RULE_PATTERN = re.compile(
+    r"""^\s*
+    (?:(?P<agg>avg|min|max|sum|count|rate|last)\s*\(\s*(?P<agg_metric>\w+)\s*(?:,\s*(?P<window>\d+[smh]))?\s*\)
+      |(?P<metric>\w+))
+    \s*(?P<op>>=|<=|==|!=|>|<)\s*
+    (?P<threshold>-?\d+(?:\.\d+)?)
+    (?:\s+for\s+(?P<for_count>\d+)\s*(?P<for_unit>samples?|[smh]))?
+    \s*$""",
+    re.VERBOSE
+)
+
+def parse_duration(text):
+    """Convert a duration such as '60s' or '5m' to seconds"""
+    return int(text[:-1]) * DURATION_UNITS[text[-1]]
+
+class RollingWindow:
+    def __init__(self, window=None, max_samples=None):
+        self.window = window
+        self.max_samples = max_samples
+        self.samples = deque()
+        self.total = 0.0
+        self._min = deque()
+        self._max = deque()
+
+    def add(self, timestamp, value):
+        """Add a sample and evict anything older than the window, amortized O(1)"""
+        if self.samples and timestamp < self.samples[-1][0]:
+            # The clock went backwards; start the window over rather than mix timelines
+            self.clear()
+
+        self.samples.append((timestamp, value))
+        self.total += value
+
+        # Monotonic deques keep the window min/max at their heads
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+
+        cutoff = timestamp - self.window if self.window is not None else float('-inf')
+        while self.samples[0][0] < cutoff or (self.max_samples and len(self.samples) > self.max_samples):
+            _, old = self.samples.popleft()
+            self.total -= old
+
+        oldest = self.samples[0][0]
+        while self._min[0][0] < oldest:
+            self._min.popleft()
+        while self._max[0][0] < oldest:
+            self._max.popleft()
+
+    def clear(self):
+        """Drop every sample in the window"""
+        self.samples.clear()
+        self.total = 0.0
+        self._min.clear()
+        self._max.clear()
+
+    def covers(self, fraction):
+        """Whether the samples held span at least this fraction of the time window"""
+        if self.window is None:
+            return True
+        return bool(self.samples) and self.samples[-1][0] - self.samples[0][0] >= fraction * self.window
+
+    def value(self, agg):
+        """Current value of an aggregate over the window"""
+        if agg == 'avg':
+            return self.total / len(self.samples)
+        elif agg == 'sum':
+            return self.total
+        elif agg == 'count':
+            return float(len(self.samples))
+        elif agg == 'min':
+            return self._min[0][1]
+        elif agg == 'max':
+            return self._max[0][1]
+        elif agg == 'rate':
+            (first_ts, first), (last_ts, last) = self.samples[0], self.samples[-1]
+            return (last - first) / (last_ts - first_ts) if last_ts > first_ts else 0.0
+        return self.samples[-1][1]
+
+class Rule:
+    def __init__(self, name, expr, severity='MEDIUM', min_coverage=None):
+        match = RULE_PATTERN.match(expr)
+        if not match:
+            raise ValueError(f"Invalid alert rule expression: {expr}")
+
+        self.name = name
+        self.expr = expr
+        self.severity = severity
+        self.agg = match.group('agg') or 'last'
+        self.metric = match.group('agg_metric') or match.group('metric')
+        self.compare = OPERATORS[match.group('op')]
+        self.threshold = float(match.group('threshold'))
+
+        # Without an explicit window, rate() compares consecutive samples and
+        # every other aggregate sees only the latest sample
+        window = match.group('window')
+        if window:
+            self.window = RollingWindow(window=parse_duration(window))
+        else:
+            self.window = RollingWindow(max_samples=2 if self.agg == 'rate' else 1)
+        self.min_coverage = min_coverage if min_coverage is not None else config.ALERT_RULE_MIN_COVERAGE
+
+        for_unit = match.group('for_unit')
+        self.for_samples = int(match.group('for_count')) if for_unit and for_unit.startswith('sample') else 1
+        self.for_seconds = parse_duration(match.group('for_count') + for_unit) if for_unit and not for_unit.startswith('sample') else 0
+
+        self.consecutive = 0
+        self.pending_since = None
+        self.firing = False
+
+    def evaluate(self, metrics, timestamp):
+        """Feed one sample into the rule; returns an alert when the rule starts firing"""
+        if self.metric not in metrics:
+            return None
+
+        now = timestamp.timestamp()
+        self.window.add(now, float(metrics[self.metric]))
+        if not self.window.covers(self.min_coverage):
+            # A window that has only just started filling (at startup, or after the clock
+            # went backwards) would let a single sample stand in for the whole duration
+            return None
+        value = self.window.value(self.agg)
+
+        if not self.compare(value, self.threshold):
+            # Condition cleared: re-arm so the next breach alerts again
+            self.consecutive = 0
+            self.pending_since = None
+            self.firing = False
+            return None
+
+        self.consecutive += 1
+        if self.pending_since is None:
+            self.pending_since = now
+
+        held = self.consecutive >= self.for_samples and now - self.pending_since >= self.for_seconds
+        if not held or self.firing:
+            return None
+
+        self.firing = True
+        return {
+            'metric': self.metric,
+            'value': value,
+            'threshold': self.threshold,
+            'timestamp': timestamp,
+            'severity': self.severity,
+            'rule': self.name,
+            'expr': self.expr
+        }
+
+class RuleEngine:
+    def __init__(self, rules):
+        self.rules = [Rule(rule['name'], rule['expr'], rule.get('severity', 'MEDIUM')) for rule in rules]
+        self.metrics = {rule.metric for rule in self.rules}
+
+    def evaluate(self, metrics):
+        """Evaluate every rule against one sample and return the alerts that fired"""
+        timestamp = metrics.get('timestamp') or datetime.now()
+        alerts = []
+        for rule in self.rules:
+            alert = rule.evaluate(metrics, timestamp)
+            if alert:
+                alerts.append(alert)
+        return alerts
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import psutil
+import config
+
+# psutil needs about this long between cpu_percent calls for a meaningful reading
+MIN_CPU_INTERVAL = 0.1
+
+class SystemSampler:
+    def __init__(self, interval=None, buffer_size=None):
+        self.interval = interval or config.SAMPLE_INTERVAL
+        self.samples = deque(maxlen=buffer_size or config.SAMPLE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Prime the CPU counter; that first reading covers no interval (it is always
+        # 0.0), so nothing is published until a read that measures a real delta
+        psutil.cpu_percent(interval=None)
+        self._primed_at = time.monotonic()
+
+    def sample(self):
+        """Collect one snapshot of CPU, memory, disk and network counters"""
+        net = psutil.net_io_counters()
+        snapshot = {
+            'timestamp': datetime.now(),
+            'cpu_usage': psutil.cpu_percent(interval=None),
+            'memory_usage': psutil.virtual_memory().percent,
+            'disk_usage': psutil.disk_usage('/').percent,
+            'network_sent': net.bytes_sent,
+            'network_recv': net.bytes_recv
+        }
+
+        with self._lock:
+            self.samples.append(snapshot)
+        return snapshot
+
+    def start(self):
+        """Start the background sampling thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background sampling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # cpu_percent(interval=None) reports usage since the previous call,
+        # so sampling on a fixed schedule gives the same figure as a blocking
+        # interval without ever stalling the caller
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Failed to sample system metrics: {str(e)}")
+
+    def latest(self):
+        """Get the most recent sample, taking the first one here if the thread has not yet"""
+        with self._lock:
+            if self.samples:
+                return dict(self.samples[-1])
+        time.sleep(max(0.0, self._primed_at + MIN_CPU_INTERVAL - time.monotonic()))
+        return dict(self.sample())
+
+    def get_samples(self, limit=None):
+        """Get buffered samples, oldest first"""
+        with self._lock:
+            samples = list(self.samples)
+        return samples[-limit:] if limit else samples
@@ -0,0 +1,320 @@
+import bisect
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import config
+
+INDEX_FILE = 'index.json'
+LOCK_FILE = '.lock'
+
+# Column files are fixed little-endian layouts so any reader can map them directly
+TIME_DTYPE = np.dtype('<i8')
+VALUE_DTYPE = np.dtype('<f8')
+
+def to_ns(timestamp):
+    """Convert a naive datetime to int64 nanoseconds since the epoch (wall clock preserved)"""
+    return pd.Timestamp(timestamp).value
+
+class SegmentStore:
+    def __init__(self, directory=None, segment_seconds=None, retention_days=None):
+        self.directory = directory or config.SEGMENT_CONFIG['directory']
+        self.segment_ns = int((segment_seconds or config.SEGMENT_CONFIG['segment_seconds']) * 1e9)
+        self.retention_days = retention_days or config.SEGMENT_CONFIG['retention_days']
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Index entries sorted by start time; segments cover disjoint periods
+        self.segments = []
+        self.starts = []
+        self.sealed_until = None
+        self._maps = {}
+        self._index_mtime = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def refresh(self, force=False):
+        """Reload the segment index if another process has sealed segments since the last read"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime and not force:
+            return
+
+        with open(path, encoding='utf-8') as f:
+            index = json.load(f)
+        with self._lock:
+            self.segments = sorted(index['segments'], key=lambda entry: entry['start'])
+            self.starts = [entry['start'] for entry in self.segments]
+            self.sealed_until = index.get('sealed_until')
+            self._index_mtime = mtime
+            live = {entry['path'] for entry in self.segments}
+            self._maps = {key: arrays for key, arrays in self._maps.items() if key[0] in live}
+
+    @contextmanager
+    def _updating(self):
+        """Hold the index locked against other threads and processes while it is read, changed and saved"""
+        with self._lock, open(os.path.join(self.directory, LOCK_FILE), 'a') as lock_file:
+            # The importer CLI and the collector's sealer run in separate processes
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Two saves can land within one mtime tick, so always reread under the lock
+                self.refresh(force=True)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'sealed_until': self.sealed_until, 'segments': self.segments}, f)
+        os.replace(path + '.tmp', path)
+        self._index_mtime = os.stat(path).st_mtime_ns
+
+    def _write_segment(self, start, columns):
+        """Write {metric: (ns timestamps, values)} as one segment directory and index it"""
+        name = str(start)
+        if os.path.exists(os.path.join(self.directory, name)):
+            # A rewritten segment gets a new directory so readers still mapping the old files are unaffected
+            name = f"{start}.{time.time_ns()}"
+        path = os.path.join(self.directory, name)
+        # Build the directory under a temporary name so readers never see a partial segment
+        shutil.rmtree(path + '.tmp', ignore_errors=True)
+        os.makedirs(path + '.tmp')
+
+        rows = {}
+        for metric, (times, values) in columns.items():
+            order = np.argsort(times, kind='stable')
+            np.ascontiguousarray(times[order], dtype=TIME_DTYPE).tofile(os.path.join(path + '.tmp', f"{metric}.i64"))
+            np.ascontiguousarray(values[order], dtype=VALUE_DTYPE).tofile(os.path.join(path + '.tmp', f"{metric}.f64"))
+            rows[metric] = len(times)
+        os.replace(path + '.tmp', path)
+
+        entry = {'path': name, 'start': start, 'end': start + self.segment_ns, 'rows': rows}
+        position = bisect.bisect(self.starts, start)
+        self.segments.insert(position, entry)
+        self.starts.insert(position, start)
+        return entry
+
+    def _overlapping(self, low, high):
+        """Index entries whose period intersects [low, high] nanoseconds"""
+        position = max(bisect.bisect_right(self.starts, low) - 1, 0)
+        entries = []
+        for entry in self.segments[position:]:
+            if entry['start'] > high:
+                break
+            if entry['end'] > low:
+                entries.append(entry)
+        return entries
+
+    def write(self, frame):
+        """Seal a DataFrame of timestamp plus metric columns, like generate_historical_data returns"""
+        times = frame['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+        periods = times // self.segment_ns * self.segment_ns
+        metrics = [column for column in frame.columns if column != 'timestamp']
+
+        written = []
+        with self._updating():
+            starts = np.unique(periods).tolist()
+            for start in starts:
+                if self._overlapping(start, start + self.segment_ns - 1):
+                    raise ValueError(f"A segment already covers {pd.Timestamp(start)}")
+
+            for start in starts:
+                in_period = periods == start
+                columns = {}
+                for metric in metrics:
+                    values = frame[metric].to_numpy(dtype=np.float64)[in_period]
+                    keep = ~np.isnan(values)
+                    if keep.any():
+                        columns[metric] = (times[in_period][keep], values[keep])
+                if columns:
+                    written.append(self._write_segment(start, columns))
+            self._save_index()
+        return written
+
+    def seal(self, storage, metrics=None, now=None):
+        """Seal every whole period that ended before now into segments, reading samples from storage"""
+        metrics = metrics or [metric for family in config.METRIC_FAMILIES.values() for metric in family]
+        now_ns = to_ns(now or datetime.now()) - int(config.SEGMENT_CONFIG['seal_delay'] * 1e9)
+        open_period = now_ns // self.segment_ns * self.segment_ns
+
+        with self._lock:
+            first = self.sealed_until
+        if first is None:
+            oldest = storage.oldest_timestamp(metrics)
+            if oldest is None:
+                return []
+            first = int(oldest * 1e9) // self.segment_ns * self.segment_ns
+
+        written = []
+        for start in range(first, open_period, self.segment_ns):
+            # Query outside the lock so readers are not held up while a day is read back
+            columns = {}
+            for metric in metrics:
+                timestamps, values = storage.query_arrays(
+                    metric, pd.Timestamp(start).to_pydatetime(), pd.Timestamp(start + self.segment_ns).to_pydatetime()
+                )
+                if len(values):
+                    # Storage epochs are float seconds; whole microseconds are what datetimes carry
+                    columns[metric] = (np.round(timestamps * 1e6).astype(np.int64) * 1000, values)
+
+            replaced = None
+            with self._updating():
+                # An import may already have written part of this day; the two are merged
+                if columns:
+                    entry, _, replaced = self._merge_period(start, columns)
+                    if entry is not None:
+                        written.append(entry)
+                self.sealed_until = max(self.sealed_until or start, start + self.segment_ns)
+                self._save_index()
+            self._remove([replaced] if replaced else [])
+
+        self.apply_retention(now)
+        return written
+
+    def merge(self, columns):
+        """Merge {metric: (ns timestamps, values)} from any periods into their segments, creating them as
+        needed and keeping samples already sealed at the same timestamp; returns the samples added"""
+        periods = {}
+        for metric, (times, values) in columns.items():
+            times = np.asarray(times, dtype=TIME_DTYPE)
+            values = np.asarray(values, dtype=VALUE_DTYPE)
+            starts = times // self.segment_ns * self.segment_ns
+            for start in np.unique(starts).tolist():
+                in_period = starts == start
+                periods.setdefault(start, {})[metric] = (times[in_period], values[in_period])
+
+        added = {}
+        replaced = []
+        with self._updating():
+            # The collector's sealer may run in another process, so merge into its latest index
+            for start in sorted(periods):
+                _, period_added, old = self._merge_period(start, periods[start])
+                for metric, arrays in period_added.items():
+                    added.setdefault(metric, []).append(arrays)
+                if old:
+                    replaced.append(old)
+            if periods:
+                self._save_index()
+        self._remove(replaced)
+        return {
+            metric: (np.concatenate([times for times, _ in parts]), np.concatenate([values for _, values in parts]))
+            for metric, parts in added.items()
+        }
+
+    def _merge_period(self, start, columns):
+        """Rewrite one period's segment with the samples in columns it does not hold yet (caller holds
+        the lock and saves the index); returns (new entry or None, samples added, replaced directory)"""
+        existing = self._overlapping(start, start + self.segment_ns - 1)
+        if len(existing) > 1 or (existing and existing[0]['start'] != start):
+            raise ValueError(f"Segments around {pd.Timestamp(start)} do not match the configured segment length")
+        entry = existing[0] if existing else None
+        empty = (np.empty(0, dtype=TIME_DTYPE), np.empty(0, dtype=VALUE_DTYPE))
+
+        merged = {}
+        added = {}
+        for metric in set(columns) | set(entry['rows'] if entry else ()):
+            old_times, old_values = self._open(entry, metric) if entry and metric in entry['rows'] else empty
+            times, values = columns.get(metric, empty)
+            fresh = ~np.isnan(values) & ~np.isin(times, old_times) & ~pd.Index(times).duplicated(keep='last')
+            if fresh.any():
+                added[metric] = (times[fresh], values[fresh])
+            merged[metric] = (np.concatenate([old_times, times[fresh]]), np.concatenate([old_values, values[fresh]]))
+        if not added:
+            return None, added, None
+
+        if entry is not None:
+            position = self.segments.index(entry)
+            del self.segments[position]
+            del self.starts[position]
+            self._maps = {key: arrays for key, arrays in self._maps.items() if key[0] != entry['path']}
+        return self._write_segment(start, merged), added, entry['path'] if entry else None
+
+    def is_sealed(self, times):
+        """Mask of ns timestamps in periods the sealer has already moved past"""
+        self.refresh()
+        with self._lock:
+            sealed_until = self.sealed_until
+        if sealed_until is None:
+            return np.zeros(len(times), dtype=bool)
+        return np.asarray(times) < sealed_until
+
+    def _remove(self, paths):
+        for path in paths:
+            # Another process may still have the files mapped; the index no longer lists them either way
+            shutil.rmtree(os.path.join(self.directory, path), ignore_errors=True)
+
+    def apply_retention(self, now=None):
+        """Delete segments whose whole period is older than the retention period"""
+        cutoff = to_ns(now or datetime.now()) - int(self.retention_days * 86400 * 1e9)
+        with self._updating():
+            expired = [entry for entry in self.segments if entry['end'] <= cutoff]
+            if not expired:
+                return 0
+            self.segments = [entry for entry in self.segments if entry['end'] > cutoff]
+            self.starts = [entry['start'] for entry in self.segments]
+            live = {entry['path'] for entry in self.segments}
+            self._maps = {key: arrays for key, arrays in self._maps.items() if key[0] in live}
+            self._save_index()
+
+        self._remove([entry['path'] for entry in expired])
+        return len(expired)
+
+    def _open(self, entry, metric):
+        key = (entry['path'], metric)
+        arrays = self._maps.get(key)
+        if arrays is None:
+            path = os.path.join(self.directory, entry['path'])
+            arrays = self._maps[key] = (
+                np.memmap(os.path.join(path, f"{metric}.i64"), dtype=TIME_DTYPE, mode='r'),
+                np.memmap(os.path.join(path, f"{metric}.f64"), dtype=VALUE_DTYPE, mode='r')
+            )
+        return arrays
+
+    def arrays(self, metric, start=None, end=None):
+        """Map one metric between two times into (datetime64 timestamps, float64 values) arrays"""
+        self.refresh()
+        low = to_ns(start) if start else np.iinfo(np.int64).min
+        high = to_ns(end) if end else np.iinfo(np.int64).max
+
+        times = []
+        values = []
+        with self._lock:
+            for entry in self._overlapping(low, high):
+                if metric not in entry['rows']:
+                    continue
+                segment_times, segment_values = self._open(entry, metric)
+                first = np.searchsorted(segment_times, low, side='left')
+                last = np.searchsorted(segment_times, high, side='right')
+                if first == last:
+                    continue
+                times.append(segment_times[first:last])
+                values.append(segment_values[first:last])
+
+        # A range inside one segment is a pair of views onto the mapped files
+        if len(times) == 1:
+            return times[0].view('datetime64[ns]'), values[0]
+        if not times:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype=np.float64)
+        return np.concatenate(times).view('datetime64[ns]'), np.concatenate(values)
+
+    def query(self, metric, start=None, end=None):
+        """Read one metric between two times as a DataFrame of timestamp and value columns"""
+        times, values = self.arrays(metric, start, end)
+        return pd.DataFrame({'timestamp': times, metric: values})
+
+    def coverage(self):
+        """(first, last) times covered by sealed segments, or None before anything is sealed"""
+        self.refresh()
+        with self._lock:
+            if not self.segments:
+                return None
+            return pd.Timestamp(self.segments[0]['start']).to_pydatetime(), pd.Timestamp(self.segments[-1]['end']).to_pydatetime()
@@ -0,0 +1,282 @@
+import re
+import threading
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from chunk_encoding import ChunkedSeries
+from storage import to_epoch
+from agent import parse_labels
+import config
+
+NAME_LABEL = '__name__'
+
+SELECTOR_PATTERN = re.compile(r'^\s*(?P<metric>[A-Za-z_:][\w:]*)?\s*(?:\{(?P<matchers>.*)\})?\s*$')
+MATCHER_PATTERN = re.compile(r'\s*(?P<key>[A-Za-z_]\w*)\s*(?P<op>=~|!~|!=|=)\s*"(?P<value>(?:[^"\\]|\\.)*)"\s*(?:,|$)')
+
+AGGREGATIONS = ['avg', 'sum', 'min', 'max', 'count']
+
+def parse_selector(selector):
+    """Parse 'metric{key="value", key!="value", key=~"regex"}' into [(key, op, value)] matchers"""
+    match = SELECTOR_PATTERN.match(selector)
+    if not match or not (match.group('metric') or match.group('matchers')):
+        raise ValueError(f"Invalid series selector: {selector}")
+
+    matchers = []
+    if match.group('metric'):
+        matchers.append((NAME_LABEL, '=', match.group('metric')))
+
+    body = match.group('matchers') or ''
+    position = 0
+    while position < len(body.rstrip()):
+        matcher = MATCHER_PATTERN.match(body, position)
+        if not matcher:
+            raise ValueError(f"Invalid label matcher in selector: {selector}")
+        value = matcher.group('value').replace('\\"', '"').replace('\\\\', '\\')
+        matchers.append((matcher.group('key'), matcher.group('op'), value))
+        position = matcher.end()
+
+    if not matchers:
+        raise ValueError(f"Series selector matches nothing: {selector}")
+    return matchers
+
+class SeriesIndex:
+    def __init__(self, capacity=1024):
+        # Label keys and values are interned so postings and series keys hold small ints
+        self.string_ids = {}
+        self.strings = []
+
+        self.series_ids = {}
+        self.series_labels = []
+        self.postings = defaultdict(list)
+        self.values_by_key = defaultdict(set)
+        self._posting_arrays = {}
+        self._point_ids = {}
+
+        # Recent history of every series, compressed; timestamps are storage epochs
+        self.history = []
+        self.history_seconds = config.CHUNK_CONFIG['history_days'] * 86400
+
+        self.latest = np.full(capacity, np.nan)
+        self.latest_time = np.full(capacity, np.nan)
+        self._lock = threading.Lock()
+
+    def intern(self, text):
+        """Get the id of a string, assigning one on first sight"""
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def _get_or_create(self, metric, labels):
+        pairs = tuple(sorted(
+            (self.intern(key), self.intern(str(value)))
+            for key, value in {**labels, NAME_LABEL: metric}.items()
+        ))
+        series_id = self.series_ids.get(pairs)
+        if series_id is not None:
+            return series_id
+
+        series_id = self.series_ids[pairs] = len(self.series_labels)
+        self.series_labels.append(pairs)
+        self.history.append(ChunkedSeries())
+        for key_id, value_id in pairs:
+            # Ids only grow, so appending keeps every postings list sorted
+            self.postings[(key_id, value_id)].append(series_id)
+            self._posting_arrays.pop((key_id, value_id), None)
+            self.values_by_key[key_id].add(value_id)
+
+        if series_id >= len(self.latest):
+            self.latest = np.concatenate([self.latest, np.full(len(self.latest), np.nan)])
+            self.latest_time = np.concatenate([self.latest_time, np.full(len(self.latest_time), np.nan)])
+        return series_id
+
+    def observe(self, metric, labels, value, timestamp=None):
+        """Record the latest value of the series for a metric and label set"""
+        with self._lock:
+            series_id = self._get_or_create(metric, labels)
+            self._store(series_id, value, timestamp)
+            return series_id
+
+    def observe_sample(self, sample, labels):
+        """Record every numeric metric in a sample under one label set"""
+        timestamp = to_epoch(sample['timestamp']) if 'timestamp' in sample else None
+        with self._lock:
+            for metric, value in sample.items():
+                if metric != 'timestamp' and isinstance(value, (int, float)):
+                    self._store(self._get_or_create(metric, labels), value, timestamp)
+
+    def observe_points(self, points):
+        """Record (metric, timestamp, value, host, labels) points from the ingest server"""
+        with self._lock:
+            for metric, timestamp, value, host, labels in points:
+                # Agents repeat the same few label strings, so skip re-parsing them
+                key = (metric, host, labels)
+                series_id = self._point_ids.get(key)
+                if series_id is None:
+                    series_id = self._point_ids[key] = self._get_or_create(metric, {**parse_labels(labels), 'host': host})
+                self._store(series_id, value, timestamp)
+
+    def load_remote(self, storage, after_id=None):
+        """Index remote series written to storage by another process: the newest point of each on the
+        first call (after_id None), then every point stored after after_id; returns the rowid to pass next"""
+        if after_id is None:
+            last_id, points = storage.latest_remote_points()
+        else:
+            last_id, points = storage.query_points_after(after_id)
+        if points:
+            self.observe_points(points)
+        return last_id
+
+    def _store(self, series_id, value, timestamp):
+        if timestamp is None:
+            self.latest[series_id] = value
+            return
+        if timestamp < self.latest_time[series_id]:
+            return
+
+        self.latest[series_id] = value
+        self.latest_time[series_id] = timestamp
+        history = self.history[series_id]
+        history.append(timestamp, value)
+        history.trim(timestamp - self.history_seconds)
+
+    def history_frame(self, series_id, start=None, end=None):
+        """Decode the in-memory history of one series as a DataFrame of timestamp and value"""
+        with self._lock:
+            timestamps, values = self.history[series_id].arrays(
+                to_epoch(start) if start else None, to_epoch(end) if end else None
+            )
+        return pd.DataFrame({'timestamp': pd.to_datetime(timestamps, unit='s'), 'value': values})
+
+    def select(self, selector):
+        """Resolve a selector to the sorted ids of the series it matches"""
+        matchers = parse_selector(selector)
+        with self._lock:
+            return self._match(matchers).tolist()
+
+    def _postings(self, key_id, value_id):
+        """Sorted series ids for one label pair, as an array cached until the pair gains a series"""
+        key = (key_id, value_id)
+        array = self._posting_arrays.get(key)
+        if array is None:
+            array = self._posting_arrays[key] = np.array(self.postings.get(key, ()), dtype=np.int64)
+        return array
+
+    def _match(self, matchers):
+        """Sorted array of the series ids matching every matcher"""
+        # Each matcher becomes a group of postings lists: the series it
+        # accepts (or rejects) are the union of that group
+        equal = []
+        including = []
+        excluding = []
+        for key, op, value in matchers:
+            key_id = self.string_ids.get(key)
+            if op == '=':
+                value_id = self.string_ids.get(value)
+                if key_id is None or value_id is None:
+                    return np.empty(0, dtype=np.int64)
+                equal.append(self._postings(key_id, value_id))
+            elif op == '!=':
+                value_id = self.string_ids.get(value)
+                if key_id is not None and value_id is not None:
+                    excluding.append([self._postings(key_id, value_id)])
+            else:
+                group = self._regex_postings(key_id, value)
+                (including if op == '=~' else excluding).append(group)
+
+        # Start from the smallest exact-match list (already sorted) and filter
+        # it through a membership mask of every other matcher
+        if equal:
+            equal.sort(key=len)
+            candidates = equal[0]
+            including = [[postings] for postings in equal[1:]] + including
+        elif including:
+            first = including.pop(0)
+            candidates = np.sort(np.concatenate(first)) if first else np.empty(0, dtype=np.int64)
+        else:
+            candidates = np.arange(len(self.series_labels), dtype=np.int64)
+
+        mask = np.zeros(len(self.series_labels), dtype=bool)
+        for group, keep in [(group, True) for group in including] + [(group, False) for group in excluding]:
+            if not len(candidates):
+                break
+            for postings in group:
+                mask[postings] = True
+            candidates = candidates[mask[candidates] == keep]
+            for postings in group:
+                mask[postings] = False
+        return candidates
+
+    def _regex_postings(self, key_id, pattern):
+        """Postings lists of every value of a key that fully matches a regex"""
+        if key_id is None:
+            return []
+        compiled = re.compile(pattern)
+        return [
+            self._postings(key_id, value_id)
+            for value_id in self.values_by_key.get(key_id, ())
+            if compiled.fullmatch(self.strings[value_id])
+        ]
+
+    def labels(self, series_id):
+        """Label set of a series, including its metric name under __name__"""
+        return {self.strings[key_id]: self.strings[value_id] for key_id, value_id in self.series_labels[series_id]}
+
+    def label_keys(self):
+        """Every label key in use, except the metric name"""
+        with self._lock:
+            return sorted(self.strings[key_id] for key_id in self.values_by_key if self.strings[key_id] != NAME_LABEL)
+
+    def frame(self, series_ids):
+        """Matching series with their labels and latest values as a DataFrame"""
+        with self._lock:
+            rows = []
+            for series_id in series_ids:
+                labels = self.labels(series_id)
+                rows.append({
+                    'series': series_id,
+                    'metric': labels.pop(NAME_LABEL),
+                    'labels': ','.join(f"{key}={value}" for key, value in sorted(labels.items())),
+                    'value': self.latest[series_id]
+                })
+        return pd.DataFrame(rows, columns=['series', 'metric', 'labels', 'value'])
+
+    def aggregate(self, selector, by=(), func='avg'):
+        """Aggregate the latest values of matching series, grouped by label keys, as {group: value}"""
+        if func not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {func}")
+
+        matchers = parse_selector(selector)
+        with self._lock:
+            ids = self._match(matchers)
+            if not len(ids):
+                return {}
+            values = self.latest[ids]
+            keep = ~np.isnan(values)
+            ids, values = ids[keep], values[keep]
+
+            # One group code per series from the interned values of the group-by keys
+            key_ids = [self.string_ids.get(key) for key in by]
+            groups = {}
+            codes = np.empty(len(ids), dtype=np.int64)
+            for i, series_id in enumerate(ids.tolist()):
+                pairs = dict(self.series_labels[series_id])
+                group = tuple(pairs.get(key_id) for key_id in key_ids)
+                codes[i] = groups.setdefault(group, len(groups))
+            names = [
+                tuple(self.strings[value_id] if value_id is not None else '' for value_id in group)
+                for group in groups
+            ]
+
+        counts = np.bincount(codes, minlength=len(names))
+        if func == 'count':
+            result = counts.astype(np.float64)
+        elif func in ('sum', 'avg'):
+            result = np.bincount(codes, weights=values, minlength=len(names))
+            if func == 'avg':
+                result = result / counts
+        else:
+            result = np.full(len(names), np.inf if func == 'min' else -np.inf)
+            (np.minimum if func == 'min' else np.maximum).at(result, codes, values)
+        return dict(zip(names, result.tolist()))
@@ -0,0 +1,153 @@
+import math
+import struct
+import numpy as np
+import config
+
+HEADER = struct.Struct('<ddddqii')
+
+class DDSketch:
+    def __init__(self, relative_accuracy=None, max_bins=None):
+        self.relative_accuracy = relative_accuracy or config.SKETCH_CONFIG['relative_accuracy']
+        self.max_bins = max_bins or config.SKETCH_CONFIG['max_bins']
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        # Bin k holds values in (gamma^(k-1), gamma^k]; negative values are
+        # binned by magnitude in their own store
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=None, max_bins=None):
+        """Build a sketch from an array of values in one vectorized pass"""
+        sketch = cls(relative_accuracy, max_bins)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return sketch
+
+        for store, magnitudes in ((sketch.positive, values[values > 0]), (sketch.negative, -values[values < 0])):
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / sketch._log_gamma).astype(np.int64), return_counts=True)
+            store.update(zip(keys.tolist(), counts.tolist()))
+            if len(store) > sketch.max_bins:
+                sketch._collapse(store)
+        sketch.zero_count = int((values == 0).sum())
+        sketch.count = len(values)
+        sketch.total = float(values.sum())
+        sketch.min = float(values.min())
+        sketch.max = float(values.max())
+        return sketch
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        """Representative value of a bin, within relative_accuracy of anything in it"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """Add a value to the sketch"""
+        if value > 0:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + count
+            if len(self.positive) > self.max_bins:
+                self._collapse(self.positive)
+        elif value < 0:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + count
+            if len(self.negative) > self.max_bins:
+                self._collapse(self.negative)
+        else:
+            self.zero_count += count
+
+        self.count += count
+        self.total += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self, store):
+        """Fold the smallest-magnitude bins together to stay within max_bins"""
+        keys = sorted(store)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        target = excess[-1]
+        for key in excess[:-1]:
+            store[target] += store.pop(key)
+
+    def merge(self, other):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.count == 0:
+            return self
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+            if len(store) > self.max_bins:
+                self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1), or None for an empty sketch"""
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def quantiles(self, qs):
+        """Estimate several quantiles at once as {q: value}"""
+        return {q: self.quantile(q) for q in qs}
+
+    def to_bytes(self):
+        """Serialize the sketch for storage"""
+        parts = [HEADER.pack(
+            self.relative_accuracy, self.total, self.min, self.max, self.zero_count,
+            len(self.positive), len(self.negative)
+        )]
+        for store in (self.positive, self.negative):
+            parts.append(np.fromiter(store.keys(), dtype='<i4', count=len(store)).tobytes())
+            parts.append(np.fromiter(store.values(), dtype='<i8', count=len(store)).tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a sketch serialized with to_bytes"""
+        relative_accuracy, total, low, high, zero_count, n_positive, n_negative = HEADER.unpack_from(data)
+        sketch = cls(relative_accuracy)
+        offset = HEADER.size
+        for store, size in ((sketch.positive, n_positive), (sketch.negative, n_negative)):
+            keys = np.frombuffer(data, dtype='<i4', count=size, offset=offset)
+            offset += 4 * size
+            counts = np.frombuffer(data, dtype='<i8', count=size, offset=offset)
+            offset += 8 * size
+            store.update(zip(keys.tolist(), counts.tolist()))
+
+        sketch.zero_count = zero_count
+        sketch.count = zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        sketch.total = total
+        sketch.min = low
+        sketch.max = high
+        return sketch
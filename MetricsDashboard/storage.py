@@ -0,0 +1,596 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from rollups import RollupAccumulator, bucket_start, cover_range, plan_tier
+from sketches import DDSketch
+import config
+
+EPOCH = datetime(1970, 1, 1)
+
+# Buckets that are still open were partly written by earlier flushes (and
+# imports can land in any bucket), so partial aggregates are merged rather
+# than replaced
+ROLLUP_MERGE = """
+    ON CONFLICT (tier, metric, bucket) DO UPDATE SET
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        sum_value = sum_value + excluded.sum_value,
+        count = count + excluded.count,
+        last_value = CASE WHEN excluded.last_time >= last_time THEN excluded.last_value ELSE last_value END,
+        last_time = MAX(last_time, excluded.last_time)
+"""
+
+def to_epoch(timestamp):
+    """Convert a naive datetime to seconds since the epoch (wall clock preserved)"""
+    return (timestamp - EPOCH).total_seconds()
+
+def from_epoch(seconds):
+    """Convert seconds since the epoch back to a naive datetime"""
+    return EPOCH + timedelta(seconds=seconds)
+
+class MetricsStorage:
+    def __init__(self, db_path=None, batch_size=None, flush_interval=None, retention_days=None, max_pending=None):
+        self.db_path = db_path or config.STORAGE_CONFIG['db_path']
+        self.batch_size = batch_size or config.STORAGE_CONFIG['batch_size']
+        self.flush_interval = flush_interval or config.STORAGE_CONFIG['flush_interval']
+        self.retention_days = retention_days or config.STORAGE_CONFIG['retention_days']
+        self.max_pending = max_pending or config.STORAGE_CONFIG['max_pending']
+
+        self.pending = []
+        self.pending_hosts = {}
+        self.rollups = RollupAccumulator()
+        self.dropped = 0
+        self.last_flush = time.monotonic()
+        self._flush_failed = False
+        self.last_retention = 0.0
+        self._lock = threading.RLock()
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Create tables and indexes, and switch the database to WAL mode"""
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    metric TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    value REAL
+                )
+            """)
+            self._migrate_samples()
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS hosts (
+                    host TEXT PRIMARY KEY,
+                    labels TEXT,
+                    last_seen REAL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    timestamp REAL NOT NULL,
+                    metric TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    value REAL,
+                    threshold REAL,
+                    host TEXT,
+                    rule TEXT,
+                    expr TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts (timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_metric_time ON alerts (metric, timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_severity_time ON alerts (severity, timestamp)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollups (
+                    tier TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    bucket REAL NOT NULL,
+                    min_value REAL,
+                    max_value REAL,
+                    sum_value REAL,
+                    count INTEGER,
+                    last_value REAL,
+                    last_time REAL,
+                    PRIMARY KEY (tier, metric, bucket)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sketches (
+                    tier TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    bucket REAL NOT NULL,
+                    sketch BLOB NOT NULL,
+                    PRIMARY KEY (tier, metric, bucket)
+                ) WITHOUT ROWID
+            """)
+            self.conn.commit()
+
+    def _migrate_samples(self):
+        """Add the host and labels columns to databases created before remote ingestion"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(samples)")}
+        if 'host' not in columns:
+            self.conn.execute("ALTER TABLE samples ADD COLUMN host TEXT")
+        if 'labels' not in columns:
+            self.conn.execute("ALTER TABLE samples ADD COLUMN labels TEXT")
+
+        # Local samples have a NULL host, so every lookup is by (metric, host)
+        self.conn.execute("DROP INDEX IF EXISTS idx_samples_metric_time")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_samples_metric_host_time ON samples (metric, host, timestamp)"
+        )
+
+    def write_sample(self, sample):
+        """Queue one merged metrics sample from the local collector for the next batched insert"""
+        timestamp = to_epoch(sample['timestamp'])
+        rows = [
+            (metric, timestamp, float(value), None, None)
+            for metric, value in sample.items()
+            if metric != 'timestamp' and isinstance(value, (int, float))
+        ]
+
+        with self._lock:
+            self.pending.extend(rows)
+            for metric, _, value, _, _ in rows:
+                self.rollups.add(metric, timestamp, value)
+            self._maybe_flush()
+
+    def write_points(self, points):
+        """Queue (metric, timestamp, value, host, labels) points pushed by remote agents"""
+        with self._lock:
+            self.pending.extend(points)
+            for _, timestamp, _, host, labels in points:
+                seen = self.pending_hosts.get(host)
+                if seen is None or timestamp >= seen[1]:
+                    self.pending_hosts[host] = (labels, timestamp)
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        elapsed = time.monotonic() - self.last_flush
+        # After a failed flush, wait out a whole interval rather than retry on every write
+        if (len(self.pending) >= self.batch_size and not self._flush_failed) or elapsed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all pending rows and rollup buckets in a single transaction"""
+        with self._lock:
+            self.last_flush = time.monotonic()
+            if not self.pending:
+                return 0
+
+            rows, self.pending = self.pending, []
+            hosts, self.pending_hosts = self.pending_hosts, {}
+            rollup_rows = self.rollups.drain()
+            sketches = self.rollups.drain_sketches()
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT INTO samples (metric, timestamp, value, host, labels) VALUES (?, ?, ?, ?, ?)", rows
+                    )
+                    self.conn.executemany("""
+                        INSERT INTO hosts (host, labels, last_seen) VALUES (?, ?, ?)
+                        ON CONFLICT (host) DO UPDATE SET
+                            labels = excluded.labels,
+                            last_seen = MAX(last_seen, excluded.last_seen)
+                    """, [(host, labels, last_seen) for host, (labels, last_seen) in hosts.items()])
+                    self.conn.executemany(
+                        "INSERT INTO rollups (tier, metric, bucket, min_value, max_value, sum_value, count, last_value, last_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)" + ROLLUP_MERGE, rollup_rows
+                    )
+                    self._merge_sketches(sketches)
+            except sqlite3.Error as e:
+                # The transaction was rolled back; keep everything for the next flush, since
+                # the usual cause ("database is locked") is transient
+                print(f"Failed to write metrics batch: {str(e)}")
+                self._flush_failed = True
+                self.pending = rows + self.pending
+                overflow = len(self.pending) - self.max_pending
+                if overflow > 0:
+                    # A failure that persists must not grow memory without bound; the oldest rows go first
+                    print(f"Dropped the {overflow} oldest pending metric rows; storage has been failing")
+                    del self.pending[:overflow]
+                    self.dropped += overflow
+                for host, (labels, last_seen) in hosts.items():
+                    seen = self.pending_hosts.get(host)
+                    if seen is None or last_seen > seen[1]:
+                        self.pending_hosts[host] = (labels, last_seen)
+                self.rollups.restore(rollup_rows, sketches)
+                return 0
+            self._flush_failed = False
+
+            # Retention is cheap to check but not worth running on every batch
+            if self.last_flush - self.last_retention >= config.STORAGE_CONFIG['retention_check_interval']:
+                self.apply_retention()
+            return len(rows)
+
+    def import_samples(self, columns):
+        """Insert {metric: (epoch timestamps, values)} local samples in one transaction, skipping
+        any already stored, and fold them into the rollups and sketches; returns the number inserted"""
+        inserted = 0
+        with self._lock:
+            try:
+                with self.conn:
+                    for metric, (timestamps, values) in columns.items():
+                        order = np.argsort(timestamps, kind='stable')
+                        timestamps = np.asarray(timestamps, dtype=np.float64)[order]
+                        values = np.asarray(values, dtype=np.float64)[order]
+                        if not len(timestamps):
+                            continue
+
+                        # Backfills overlap and get re-run, so a sample already stored is never written twice
+                        existing = self.conn.execute(
+                            "SELECT timestamp FROM samples WHERE metric = ? AND host IS NULL AND timestamp BETWEEN ? AND ?",
+                            (metric, float(timestamps[0]), float(timestamps[-1]))
+                        ).fetchall()
+                        if existing:
+                            new = ~np.isin(timestamps, np.array(existing, dtype=np.float64).ravel())
+                            timestamps, values = timestamps[new], values[new]
+                            if not len(timestamps):
+                                continue
+
+                        self.conn.executemany(
+                            "INSERT INTO samples (metric, timestamp, value) VALUES (?, ?, ?)",
+                            zip(itertools.repeat(metric), timestamps.tolist(), values.tolist())
+                        )
+                        self._import_rollups(metric, timestamps, values)
+                        inserted += len(timestamps)
+            except sqlite3.Error as e:
+                print(f"Failed to import metrics batch: {str(e)}")
+                return 0
+        return inserted
+
+    def import_rollups(self, columns):
+        """Fold {metric: (epoch timestamps, values)} samples kept outside the samples table (sealed
+        straight into segments) into the rollups and sketches, in one transaction"""
+        with self._lock:
+            try:
+                with self.conn:
+                    for metric, (timestamps, values) in columns.items():
+                        order = np.argsort(timestamps, kind='stable')
+                        if len(order):
+                            self._import_rollups(
+                                metric, np.asarray(timestamps, dtype=np.float64)[order], np.asarray(values, dtype=np.float64)[order]
+                            )
+            except sqlite3.Error as e:
+                print(f"Failed to import rollups: {str(e)}")
+
+    def _import_rollups(self, metric, timestamps, values):
+        """Aggregate sorted samples into whole buckets per tier and merge them in (caller holds the transaction)"""
+        sketches = {}
+        now = datetime.now()
+        for tier, width in self.rollups.tiers.items():
+            # Buckets the next retention sweep would delete are not written at all
+            all_buckets = timestamps - timestamps % width
+            first = np.searchsorted(
+                all_buckets, to_epoch(now - timedelta(days=config.ROLLUP_CONFIG['retention_days'][tier])), side='left'
+            )
+            if first == len(timestamps):
+                continue
+            buckets, tier_timestamps, tier_values = all_buckets[first:], timestamps[first:], values[first:]
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(buckets)] - 1
+            self.conn.executemany(
+                "INSERT INTO rollups (tier, metric, bucket, min_value, max_value, sum_value, count, last_value, last_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)" + ROLLUP_MERGE,
+                zip(
+                    itertools.repeat(tier), itertools.repeat(metric), buckets[starts].tolist(),
+                    np.minimum.reduceat(tier_values, starts).tolist(), np.maximum.reduceat(tier_values, starts).tolist(),
+                    np.add.reduceat(tier_values, starts).tolist(), (ends - starts + 1).tolist(),
+                    tier_values[ends].tolist(), tier_timestamps[ends].tolist()
+                )
+            )
+            if metric in self.rollups.sketch_metrics:
+                for bucket, chunk in zip(buckets[starts].tolist(), np.split(tier_values, starts[1:])):
+                    sketches[(tier, metric, bucket)] = DDSketch.from_values(chunk)
+        self._merge_sketches(sketches)
+
+    def _merge_sketches(self, sketches):
+        """Merge partial bucket sketches into the stored ones (caller holds the transaction)"""
+        for (tier, metric, bucket), sketch in sketches.items():
+            row = self.conn.execute(
+                "SELECT sketch FROM sketches WHERE tier = ? AND metric = ? AND bucket = ?", (tier, metric, bucket)
+            ).fetchone()
+            if row is not None:
+                sketch = DDSketch.from_bytes(row[0]).merge(sketch)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sketches (tier, metric, bucket, sketch) VALUES (?, ?, ?, ?)",
+                (tier, metric, bucket, sketch.to_bytes())
+            )
+
+    def apply_retention(self):
+        """Delete samples older than the retention period, and rollups past their tier's"""
+        with self._lock:
+            self.last_retention = time.monotonic()
+            now = datetime.now()
+            cutoff = to_epoch(now - timedelta(days=self.retention_days))
+            with self.conn:
+                cursor = self.conn.execute("DELETE FROM samples WHERE timestamp < ?", (cutoff,))
+                self.conn.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,))
+                self.conn.execute("DELETE FROM hosts WHERE last_seen < ?", (cutoff,))
+                for tier, days in config.ROLLUP_CONFIG['retention_days'].items():
+                    tier_cutoff = to_epoch(now - timedelta(days=days))
+                    self.conn.execute("DELETE FROM rollups WHERE tier = ? AND bucket < ?", (tier, tier_cutoff))
+                    self.conn.execute("DELETE FROM sketches WHERE tier = ? AND bucket < ?", (tier, tier_cutoff))
+            return cursor.rowcount
+
+    def query_window(self, metrics, start=None, end=None, limit=None, host=None):
+        """Query a time window of metrics for one host (None is local) as a wide DataFrame, oldest first"""
+        start_ts = to_epoch(start) if start else float('-inf')
+        end_ts = to_epoch(end) if end else float('inf')
+
+        rows = []
+        with self._lock:
+            for metric in metrics:
+                query = "SELECT metric, timestamp, value FROM samples WHERE metric = ? AND host IS ? AND timestamp BETWEEN ? AND ?"
+                params = [metric, host, start_ts, end_ts]
+                if limit:
+                    query += " ORDER BY timestamp DESC LIMIT ?"
+                    params.append(limit)
+                metric_rows = self.conn.execute(query, params).fetchall()
+
+                # Include rows still waiting for the next batched insert
+                metric_rows += [
+                    row[:3] for row in self.pending
+                    if row[0] == metric and row[3] == host and start_ts <= row[1] <= end_ts
+                ]
+                if limit:
+                    metric_rows = sorted(metric_rows, key=lambda row: row[1])[-limit:]
+                rows.extend(metric_rows)
+
+        if not rows:
+            return pd.DataFrame(columns=['timestamp', *metrics])
+
+        df = pd.DataFrame(rows, columns=['metric', 'timestamp', 'value'])
+        df = df.pivot_table(index='timestamp', columns='metric', values='value', aggfunc='last')
+        df = df.reset_index().rename_axis(columns=None)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df.reindex(columns=['timestamp', *metrics])
+
+    def latest_values(self, metrics, host=None):
+        """Get the newest value of each metric for one host, plus the newest timestamp among them"""
+        latest = {}
+        newest = None
+        with self._lock:
+            for metric in metrics:
+                row = self.conn.execute(
+                    "SELECT timestamp, value FROM samples WHERE metric = ? AND host IS ? ORDER BY timestamp DESC LIMIT 1",
+                    (metric, host)
+                ).fetchone()
+                for pending in self.pending:
+                    if pending[0] == metric and pending[3] == host and (row is None or pending[1] >= row[0]):
+                        row = pending[1:3]
+                if row is None:
+                    continue
+                latest[metric] = row[1]
+                newest = row[0] if newest is None else max(newest, row[0])
+
+        if newest is not None:
+            latest['timestamp'] = from_epoch(newest)
+        return latest
+
+    def query_arrays(self, metric, start, end, host=None):
+        """Query one metric from start up to (not including) end as (epoch timestamps, values) arrays"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT timestamp, value FROM samples WHERE metric = ? AND host IS ? AND timestamp >= ? AND timestamp < ? "
+                "ORDER BY timestamp",
+                (metric, host, to_epoch(start), to_epoch(end))
+            ).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return data[:, 0], data[:, 1]
+
+    def oldest_timestamp(self, metrics, host=None):
+        """Epoch timestamp of the oldest stored sample of any of the metrics, or None"""
+        oldest = None
+        with self._lock:
+            for metric in metrics:
+                # One lookup per metric so each is answered from the (metric, host, timestamp) index
+                (timestamp,) = self.conn.execute(
+                    "SELECT MIN(timestamp) FROM samples WHERE metric = ? AND host IS ?", (metric, host)
+                ).fetchone()
+                if timestamp is not None and (oldest is None or timestamp < oldest):
+                    oldest = timestamp
+        return oldest
+
+    def latest_remote_points(self):
+        """Get the newest point of every remote (metric, host) series, with the newest sample rowid seen"""
+        with self._lock:
+            last_id = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM samples").fetchone()[0]
+            # SQLite takes the bare columns from the row holding MAX(timestamp)
+            rows = self.conn.execute(
+                "SELECT metric, MAX(timestamp), value, host, labels FROM samples "
+                "WHERE host IS NOT NULL AND rowid <= ? GROUP BY metric, host", (last_id,)
+            ).fetchall()
+        return last_id, sorted(rows, key=lambda row: row[1])
+
+    def query_points_after(self, point_id):
+        """Get remote (metric, timestamp, value, host, labels) points stored after a sample rowid in
+        insertion order, with the newest rowid seen"""
+        with self._lock:
+            last_id = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM samples").fetchone()[0]
+            if last_id < point_id:
+                # Retention emptied the table, so rowids started over
+                point_id = 0
+            rows = self.conn.execute(
+                "SELECT metric, timestamp, value, host, labels FROM samples "
+                "WHERE rowid > ? AND rowid <= ? AND host IS NOT NULL ORDER BY rowid", (point_id, last_id)
+            ).fetchall()
+        return last_id, rows
+
+    def list_hosts(self):
+        """Get every remote host that has pushed samples, most recently seen first"""
+        with self._lock:
+            hosts = {host: (labels, last_seen) for host, labels, last_seen in self.conn.execute(
+                "SELECT host, labels, last_seen FROM hosts"
+            )}
+            for host, (labels, last_seen) in self.pending_hosts.items():
+                if host not in hosts or last_seen >= hosts[host][1]:
+                    hosts[host] = (labels, last_seen)
+
+        return [
+            {'host': host, 'labels': labels, 'last_seen': from_epoch(last_seen)}
+            for host, (labels, last_seen) in sorted(hosts.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+
+    def query_rollup(self, metric, tier, start=None, end=None):
+        """Query one rollup tier as a DataFrame of per-bucket avg/min/max/count/last, oldest first"""
+        width = self.rollups.tiers[tier]
+        start_ts = bucket_start(to_epoch(start), width) if start else float('-inf')
+        end_ts = to_epoch(end) if end else float('inf')
+
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT tier, metric, bucket, min_value, max_value, sum_value, count, last_value, last_time "
+                "FROM rollups WHERE tier = ? AND metric = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (tier, metric, start_ts, end_ts)
+            ).fetchall()
+            pending = self.rollups.pending(tier, metric, start_ts, end_ts)
+
+        # Fold in partial buckets still waiting for the next flush
+        buckets = {row[2]: list(row[3:]) for row in rows}
+        for _, _, bucket, low, high, total, count, last, last_time in pending:
+            current = buckets.get(bucket)
+            if current is None:
+                buckets[bucket] = [low, high, total, count, last, last_time]
+                continue
+            current[0] = min(current[0], low)
+            current[1] = max(current[1], high)
+            current[2] += total
+            current[3] += count
+            if last_time >= current[5]:
+                current[4], current[5] = last, last_time
+
+        columns = ['timestamp', metric, 'min', 'max', 'count', 'last']
+        if not buckets:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame(
+            [(bucket, total / count, low, high, count, last) for bucket, (low, high, total, count, last, _) in sorted(buckets.items())],
+            columns=columns
+        )
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+
+    def query_series(self, metric, start, end=None, max_points=None):
+        """Query one metric over a range from the coarsest tier that still fills max_points"""
+        end = end or datetime.now()
+        max_points = max_points or config.CHART_DOWNSAMPLING['max_points']
+        tier = plan_tier(to_epoch(start), to_epoch(end), max_points, now=to_epoch(datetime.now()))
+
+        if tier == 'raw':
+            df = self.query_window([metric], start=start, end=end)
+        else:
+            df = self.query_rollup(metric, tier, start=start, end=end)
+        df.attrs['tier'] = tier
+        return df
+
+    def query_quantiles(self, metric, quantiles=None, start=None, end=None):
+        """Estimate quantiles of a metric over a time range by merging bucket sketches"""
+        quantiles = quantiles or config.SKETCH_CONFIG['quantiles']
+        if start is None:
+            coarsest = max(self.rollups.tiers, key=self.rollups.tiers.get)
+            spans = [(coarsest, float('-inf'), float('inf'))]
+        else:
+            spans = cover_range(to_epoch(start), to_epoch(end or datetime.now()), self.rollups.tiers)
+
+        sketch = DDSketch()
+        with self._lock:
+            for tier, low, high in spans:
+                for (blob,) in self.conn.execute(
+                    "SELECT sketch FROM sketches WHERE tier = ? AND metric = ? AND bucket >= ? AND bucket < ?",
+                    (tier, metric, low, high)
+                ):
+                    sketch.merge(DDSketch.from_bytes(blob))
+                for pending in self.rollups.pending_sketches(tier, metric, low, high):
+                    sketch.merge(pending)
+        return sketch.quantiles(quantiles)
+
+    def write_alert(self, alert):
+        """Persist one alert"""
+        row = (
+            to_epoch(alert['timestamp']), alert['metric'], alert['severity'], alert['value'],
+            alert['threshold'], alert.get('host'), alert.get('rule'), alert.get('expr')
+        )
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO alerts (timestamp, metric, severity, value, threshold, host, rule, expr) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row
+                    )
+            except sqlite3.Error as e:
+                print(f"Failed to write alert: {str(e)}")
+
+    def query_alerts(self, metric=None, severity=None, start=None, end=None, limit=None):
+        """Query stored alerts, oldest first (the newest ones when limited)"""
+        conditions = []
+        params = []
+        for column, value in (('metric', metric), ('severity', severity)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(to_epoch(end))
+
+        query = "SELECT timestamp, metric, severity, value, threshold, host, rule, expr FROM alerts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._alert_from_row(row) for row in reversed(rows)]
+
+    def last_alert_id(self):
+        """Get the rowid of the newest stored alert, or 0 when none are stored"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM alerts").fetchone()[0]
+
+    def query_alerts_after(self, alert_id):
+        """Get alerts stored after the given rowid in insertion order, with the newest rowid seen"""
+        # Insertion order rather than timestamps, so alerts sharing a timestamp or
+        # written late with an older one (replayed agent backlogs) are still returned
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT rowid, timestamp, metric, severity, value, threshold, host, rule, expr FROM alerts "
+                "WHERE rowid > ? ORDER BY rowid", (alert_id,)
+            ).fetchall()
+        if not rows:
+            return alert_id, []
+        return rows[-1][0], [self._alert_from_row(row[1:]) for row in rows]
+
+    def _alert_from_row(self, row):
+        timestamp, metric, severity, value, threshold, host, rule, expr = row
+        alert = {
+            'metric': metric,
+            'value': value,
+            'threshold': threshold,
+            'timestamp': from_epoch(timestamp),
+            'severity': severity
+        }
+        for key, extra in (('host', host), ('rule', rule), ('expr', expr)):
+            if extra is not None:
+                alert[key] = extra
+        return alert
+
+    def close(self):
+        """Flush pending rows and close the connection"""
+        with self._lock:
+            self.flush()
+            self.conn.close()
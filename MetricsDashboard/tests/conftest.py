@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules are imported flat (import config), as when the dashboard runs from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
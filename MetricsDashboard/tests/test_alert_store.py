@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from alert_store import AlertStore
+
+START = datetime(2025, 1, 1)
+
+def alert(second, metric='cpu_usage', severity='high'):
+    return {'metric': metric, 'severity': severity, 'value': second, 'threshold': 0,
+            'timestamp': START + timedelta(seconds=second)}
+
+def test_query_orders_by_timestamp_not_arrival():
+    store = AlertStore(capacity=10)
+    # A replayed agent backlog arrives after newer alerts
+    for second in (50, 60, 10, 20, 60):
+        store.add(alert(second))
+
+    newest = store.query(limit=3)
+    assert [a['value'] for a in newest] == [60, 60, 50]
+    # Alerts sharing a timestamp come newest arrival first
+    assert newest[0] is store.recent(1)[0]
+    assert [a['value'] for a in store.query(start=START + timedelta(seconds=15),
+                                            end=START + timedelta(seconds=50))] == [50, 20]
+
+def test_query_filters_and_evicts_the_oldest_arrival():
+    store = AlertStore(capacity=4)
+    for second, metric, severity in [(5, 'cpu_usage', 'high'), (1, 'revenue', 'critical'),
+                                     (3, 'cpu_usage', 'critical'), (4, 'revenue', 'high'), (2, 'cpu_usage', 'high')]:
+        store.add(alert(second, metric, severity))
+
+    assert len(store) == 4
+    assert [a['value'] for a in store.query()] == [4, 3, 2, 1]
+    assert [a['value'] for a in store.query(metric='cpu_usage')] == [3, 2]
+    assert [a['value'] for a in store.query(metric='cpu_usage', severity='high')] == [2]
+    assert [a['value'] for a in store.query(severity='critical', limit=1)] == [3]
+    assert store.counts() == {'high': 2, 'critical': 2}
+    assert store.query(metric='missing') == []
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from chunk_encoding import ChunkedSeries, decode_chunk, encode_chunk
+
+def assert_roundtrip(timestamps, values, miniblock=None):
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    decoded_times, decoded_values = decode_chunk(encode_chunk(timestamps, values, miniblock), miniblock)
+    np.testing.assert_array_equal(decoded_times, timestamps)
+    # Compared bit for bit, so NaN payloads and the sign of zero must survive too
+    np.testing.assert_array_equal(decoded_values.view(np.uint64), values.view(np.uint64))
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 127, 128, 129, 257, 1024])
+def test_roundtrip_lengths_around_miniblocks(count):
+    rng = np.random.default_rng(count)
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(900, 1100, count))
+    assert_roundtrip(timestamps, np.round(rng.normal(50, 5, count), 1), miniblock=128)
+
+def test_roundtrip_special_values():
+    values = [0.0, -0.0, np.nan, np.inf, -np.inf, 1.5, -0.0, np.nan, 5e-324, -1.7976931348623157e308, 0.0]
+    assert_roundtrip(np.arange(len(values)) * 1000, values)
+
+def test_roundtrip_keeps_nan_payloads():
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    values.view(np.uint64)[1] = 0x7FF8_0000_DEAD_BEEF
+    values.view(np.uint64)[2] = 0xFFF0_0000_0000_0001
+    assert_roundtrip([0, 1, 2, 3], values)
+
+def test_roundtrip_irregular_deltas():
+    rng = np.random.default_rng(7)
+    # Steady runs, jitter, long gaps, repeated and backwards timestamps
+    deltas = np.concatenate([
+        np.full(200, 1000), rng.integers(-5, 5, 200) + 1000, [0, 0, 86_400_000, 1, -3000, 10**12],
+        rng.integers(0, 2**31, 150)
+    ])
+    timestamps = -10**15 + np.cumsum(deltas)
+    assert_roundtrip(timestamps, rng.standard_normal(len(timestamps)), miniblock=64)
+
+def test_roundtrip_random_bits():
+    rng = np.random.default_rng(3)
+    bits = rng.integers(0, 2**63, 500, dtype=np.uint64) | (rng.integers(0, 2, 500, dtype=np.uint64) << np.uint64(63))
+    assert_roundtrip(np.arange(500) * 997, bits.view(np.float64))
+
+def test_chunked_series_matches_appended_samples():
+    rng = np.random.default_rng(11)
+    timestamps = 1_700_000_000 + np.cumsum(rng.uniform(0.5, 1.5, 2500)).round(3)
+    values = rng.normal(0, 1, 2500)
+    values[[10, 1500]] = [np.nan, -0.0]
+
+    series = ChunkedSeries(chunk_size=1000, resolution=1000)
+    series.extend(timestamps[:1200], values[:1200])
+    for timestamp, value in zip(timestamps[1200:], values[1200:]):
+        series.append(timestamp, value)
+
+    assert len(series) == 2500
+    assert len(series.chunks) == 2
+    decoded_times, decoded_values = series.arrays()
+    np.testing.assert_allclose(decoded_times, timestamps, rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(decoded_values.view(np.uint64), values.view(np.uint64))
+
+    window_times, _ = series.arrays(timestamps[900], timestamps[1100])
+    assert len(window_times) == 201
+
+    assert series.trim(timestamps[1500]) == 1
+    assert len(series) == 1500
@@ -0,0 +1,24 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+from data_generator import DataGenerator
+
+END = datetime(2025, 3, 15, 12, 30)
+
+@pytest.mark.parametrize('freq', ['H', '15min', 'D', 'B', 'MS'])
+def test_chunks_cover_the_same_timestamps_as_date_range(freq):
+    expected = pd.date_range(start=datetime(2025, 1, 14, 12, 30), end=END, freq=freq)
+    chunks = list(DataGenerator().iter_historical_data(days=60, freq=freq, seed=1, chunk_size=7, end_date=END))
+
+    assert all(len(chunk) <= 7 for chunk in chunks)
+    assert pd.DatetimeIndex(pd.concat(chunks)['timestamp']).equals(expected)
+
+def test_generate_historical_data_accepts_calendar_frequencies():
+    frame = DataGenerator().generate_historical_data(days=60, freq='MS', seed=1)
+    assert len(frame) >= 1 and frame['timestamp'].dt.is_month_start.all()
+    assert list(frame.columns) == ['timestamp', 'revenue', 'users', 'conversion_rate', 'response_time']
+
+def test_an_empty_range_still_has_the_columns():
+    frame = DataGenerator().generate_historical_data(days=-1)
+    assert len(frame) == 0
+    assert list(frame.columns) == ['timestamp', 'revenue', 'users', 'conversion_rate', 'response_time']
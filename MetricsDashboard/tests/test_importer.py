@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+import pandas as pd
+from importer import import_history
+from segments import SegmentStore
+from storage import MetricsStorage
+
+def test_import_splits_by_retention_and_reimport_inserts_nothing(tmp_path):
+    now = datetime.now().replace(microsecond=0)
+    ages = [timedelta(days=400), timedelta(days=100, hours=3), timedelta(days=100), timedelta(days=10),
+            timedelta(hours=2), timedelta(hours=1)]
+    rows = [{'timestamp': (now - age).isoformat(), 'revenue': 100.0 + i, 'users': 10 + i,
+             'conversion_rate': 2.5, 'response_time': 300.0} for i, age in enumerate(ages)]
+    rows.append({'timestamp': 'not a time', 'revenue': 1.0, 'users': 1, 'conversion_rate': 1.0, 'response_time': 1.0})
+    path = tmp_path / 'history.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+    storage = MetricsStorage(db_path=str(tmp_path / 'metrics.db'))
+    segments = SegmentStore(str(tmp_path / 'segments'))
+    stats = import_history(str(path), storage=storage, segments=segments, chunk_rows=3, now=now)
+
+    # 4 metrics per row: the 400-day-old row is past segment retention, the
+    # 100-day-old ones only fit in segments, the rest are inside sample retention
+    assert (stats['rows'], stats['rejected'], stats['expired']) == (7, 1, 1)
+    assert (stats['inserted'], stats['sealed'], stats['skipped']) == (12, 8, 0)
+
+    stored = storage.query_window(['revenue', 'active_users'])
+    assert stored['revenue'].tolist() == [103.0, 104.0, 105.0]
+    assert stored['active_users'].tolist() == [13.0, 14.0, 15.0]
+    sealed_times, sealed_values = segments.arrays('revenue')
+    assert sealed_values.tolist() == [101.0, 102.0]
+    assert sealed_times.tolist() == [pd.Timestamp(now - ages[1]).value, pd.Timestamp(now - ages[2]).value]
+    # Rows only kept in segments still reach the daily rollups
+    daily = storage.query_rollup('revenue', '1d', start=now - timedelta(days=101))
+    assert daily['count'].sum() == 5
+
+    again = import_history(str(path), storage=storage, segments=segments, chunk_rows=3, now=now)
+    assert (again['inserted'], again['sealed'], again['skipped']) == (0, 0, 20)
+    assert len(storage.query_window(['revenue'])) == 3
+    assert len(segments.arrays('revenue')[1]) == 2
+    storage.close()
@@ -0,0 +1,107 @@
+import http.client
+import json
+import socket
+import time
+from datetime import datetime
+import pytest
+import config
+from agent import MetricsAgent
+from alert_system import AlertSystem
+from ingest_server import IngestServer, parse_line, parse_payload
+from storage import MetricsStorage, to_epoch
+
+NOW = int(time.time())
+
+@pytest.fixture
+def server(tmp_path):
+    storage = MetricsStorage(db_path=str(tmp_path / 'metrics.db'))
+    server = IngestServer(storage=storage, alert_system=AlertSystem(), settings={'http_port': 0, 'udp_port': 0})
+    server.start()
+    yield server
+    server.stop(10)
+    storage.close()
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.http_port, timeout=5)
+    try:
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def wait_for_rows(server, metric, host, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        rows = server.storage.query_window([metric], host=host)
+        if len(rows) >= count:
+            return rows
+        time.sleep(0.02)
+    return server.storage.query_window([metric], host=host)
+
+def test_parse_line_reads_labels_value_and_timestamp():
+    metric, timestamp, value, host, labels = parse_line(f"cpu_usage,role=web,host=web-1,region=eu 42.5 {NOW}", 0)
+    assert (metric, value, host, labels) == ('cpu_usage', 42.5, 'web-1', 'region=eu,role=web')
+    assert timestamp == pytest.approx(to_epoch(datetime.fromtimestamp(NOW)))
+    assert parse_line("cpu_usage,host=web-1 1", 123.0)[1] == 123.0
+
+@pytest.mark.parametrize('line', [
+    "cpu_usage 42", "cpu_usage,region=eu 42", "cpu_usage,host 42", "cpu_usage,host=web-1 abc",
+    "cpu_usage,host=web-1 nan", "cpu_usage,host=web-1 inf", "cpu_usage,host=web-1 1 2 3"
+])
+def test_parse_line_rejects_malformed_lines(line):
+    with pytest.raises(ValueError):
+        parse_line(line, 0)
+
+def test_parse_payload_rejects_bad_lines_individually():
+    points, rejected = parse_payload("# comment\ncpu_usage,host=a 1\n\nbad line here x\ncpu_usage,host=b 1 1e300\nmem,host=a 2\n", 0)
+    assert [point[3] for point in points] == ['a', 'a']
+    assert rejected == 2
+
+def test_http_ingest_accepts_good_lines_and_counts_bad_ones(server):
+    body = f"cpu_usage,host=web-1 91 {NOW}\ncpu_usage,host=web-1 92 {NOW + 1}\nnot a metric line"
+    assert request(server, 'POST', '/ingest', body) == (202, {'accepted': 2, 'rejected': 1})
+    assert wait_for_rows(server, 'cpu_usage', 'web-1', 2)['cpu_usage'].tolist() == [91.0, 92.0]
+    assert server.series_index.select('cpu_usage{host="web-1"}')
+
+def test_http_ingest_answers_400_when_every_line_is_bad(server):
+    assert request(server, 'POST', '/ingest', "nonsense\ncpu_usage,host=a nan") == (400, {'accepted': 0, 'rejected': 2})
+
+def test_health_and_routing(server):
+    status, stats = request(server, 'GET', '/health')
+    assert status == 200 and set(stats) == {'accepted', 'rejected', 'dropped', 'queued_batches'}
+    assert request(server, 'GET', '/ingest')[0] == 405
+    assert request(server, 'GET', '/missing')[0] == 404
+
+def test_udp_datagrams_are_stored(server):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(f"memory_usage,host=db-1 55 {NOW}\nbroken".encode(), ('127.0.0.1', server.udp_port))
+    assert wait_for_rows(server, 'memory_usage', 'db-1', 1)['memory_usage'].tolist() == [55.0]
+    assert server.rejected == 1
+
+def test_agent_delivers_and_drops_refused_batches(server):
+    agent = MetricsAgent('web-9', {'region': 'eu'}, server='127.0.0.1', http_port=server.http_port)
+    assert agent.send({'timestamp': datetime.now(), 'cpu_usage': 12.5, 'requests_per_second': 100})
+    assert (agent.sent, agent.dropped, len(agent.backlog)) == (2, 0, 0)
+    assert wait_for_rows(server, 'cpu_usage', 'web-9', 1)['cpu_usage'].tolist() == [12.5]
+
+    # A batch the server cannot parse at all would be refused again on every retry
+    agent.labels = {'bad tag': 'x y'}
+    assert not agent.send({'cpu_usage': 1.0})
+    assert (agent.dropped, len(agent.backlog)) == (1, 0)
+    agent.close()
+
+def test_agent_backlog_overflow_is_counted(monkeypatch):
+    monkeypatch.setitem(config.INGEST_CONFIG, 'agent_backlog', 3)
+    with socket.socket() as sock:
+        # A port nothing listens on, so every send fails to connect
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    agent = MetricsAgent('web-1', server='127.0.0.1', http_port=port)
+    assert not agent.send({'cpu_usage': 1.0, 'memory_usage': 2.0})
+    assert not agent.send({'cpu_usage': 3.0, 'memory_usage': 4.0})
+
+    assert len(agent.backlog) == 3
+    assert agent.dropped == 1
+    assert agent.backlog[0].startswith('memory_usage,host=web-1 2.0')
+    agent.close()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from metrics_store import MetricsRingBuffer
+
+START = datetime(2025, 1, 1)
+
+def sample(i):
+    return {'timestamp': START + timedelta(seconds=i), 'cpu_usage': float(i), 'active_users': i}
+
+def test_window_wraps_around_and_keeps_the_newest_samples_in_order():
+    buffer = MetricsRingBuffer(5)
+    for i in range(12):
+        buffer.append(sample(i))
+
+    assert len(buffer) == 5
+    assert buffer.window('cpu_usage').tolist() == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert buffer.window('active_users', 2).tolist() == [10, 11]
+    assert buffer.latest() == sample(11)
+
+def test_to_frame_is_a_copy_the_collector_can_keep_writing_past():
+    buffer = MetricsRingBuffer(3)
+    for i in range(3):
+        buffer.append(sample(i))
+    frame = buffer.to_frame(metrics=['cpu_usage'])
+    for i in range(3, 6):
+        buffer.append(sample(i))
+
+    assert frame.columns.tolist() == ['timestamp', 'cpu_usage']
+    assert frame['cpu_usage'].tolist() == [0.0, 1.0, 2.0]
+
+def test_since_returns_only_newer_samples():
+    buffer = MetricsRingBuffer(10)
+    for i in range(15):
+        buffer.append(sample(i))
+
+    assert buffer.since(START + timedelta(seconds=12))['cpu_usage'].tolist() == [13.0, 14.0]
+    assert buffer.since(START + timedelta(seconds=14)).empty
+    assert buffer.since(None, n=3)['cpu_usage'].tolist() == [12.0, 13.0, 14.0]
+    assert buffer.since(np.datetime64(START, 'ns'), n=2)['cpu_usage'].tolist() == [13.0, 14.0]
+
+def test_extend_appends_stored_rows_with_gaps_as_nan():
+    buffer = MetricsRingBuffer(4)
+    frame = pd.DataFrame({
+        'timestamp': pd.date_range(START, periods=6, freq='s'),
+        'cpu_usage': [0.0, 1.0, 2.0, np.nan, 4.0, 5.0]
+    })
+    buffer.extend(frame)
+
+    assert len(buffer) == 4
+    np.testing.assert_array_equal(buffer.window('cpu_usage'), [2.0, np.nan, 4.0, 5.0])
+    assert buffer.timestamps()[-1] == np.datetime64(START + timedelta(seconds=5), 'ns')
@@ -0,0 +1,114 @@
+import email
+import smtplib
+import time
+from datetime import datetime
+from email.header import decode_header, make_header
+import pytest
+import notifications
+from notifications import NotificationDispatcher
+
+EMAIL_CONFIG = {
+    'smtp_server': 'localhost', 'smtp_port': 25, 'sender_email': 'alerts@example.com',
+    'recipient_email': 'ops@example.com', 'sender_password': 'secret', 'use_tls': True
+}
+
+class StubSMTP:
+    """Records what an SMTP server would have received; failures are scripted per test"""
+    sessions = []
+    fail_sends = 0
+    fail_login = False
+
+    def __init__(self, host, port, timeout=None):
+        self.messages = []
+        self.closed = False
+        StubSMTP.sessions.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        if StubSMTP.fail_login:
+            raise smtplib.SMTPAuthenticationError(535, b'authentication failed')
+
+    def noop(self):
+        return (250, b'OK')
+
+    def sendmail(self, sender, recipient, message):
+        if StubSMTP.fail_sends:
+            StubSMTP.fail_sends -= 1
+            raise smtplib.SMTPServerDisconnected('connection lost')
+        self.messages.append(message)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(StubSMTP, 'sessions', [])
+    monkeypatch.setattr(StubSMTP, 'fail_sends', 0)
+    monkeypatch.setattr(StubSMTP, 'fail_login', False)
+    monkeypatch.setattr(notifications.smtplib, 'SMTP', StubSMTP)
+    return StubSMTP
+
+def alert(metric='cpu_usage', host=None):
+    alert = {'metric': metric, 'value': 91.0, 'threshold': 80.0, 'severity': 'HIGH', 'timestamp': datetime(2025, 1, 1)}
+    if host:
+        alert['host'] = host
+    return alert
+
+def test_alerts_within_the_batch_window_go_out_as_one_digest(smtp):
+    dispatcher = NotificationDispatcher(EMAIL_CONFIG, {'batch_window': 0.3})
+    dispatcher.start()
+    for host in ('web-1', 'web-2', 'web-3'):
+        assert dispatcher.submit(alert(host=host))
+    dispatcher.stop(5)
+
+    messages = [email.message_from_string(message) for session in smtp.sessions for message in session.messages]
+    assert len(messages) == 1
+    assert 'KPI Alert Digest: 3 alerts' in str(make_header(decode_header(messages[0]['Subject'])))
+    body = messages[0].get_payload()[0].get_payload(decode=True).decode()
+    assert all(f"Host: {host}" in body for host in ('web-1', 'web-2', 'web-3'))
+    assert (dispatcher.sent, dispatcher.failed) == (3, 0)
+    assert all(session.closed for session in smtp.sessions)
+
+def test_failed_sends_are_retried_with_exponential_backoff(smtp, monkeypatch):
+    delays = []
+    monkeypatch.setattr(notifications.time, 'sleep', delays.append)
+    smtp.fail_sends = 2
+    dispatcher = NotificationDispatcher(EMAIL_CONFIG, {'max_retries': 3, 'retry_backoff': 0.5})
+
+    assert dispatcher.deliver([alert()])
+    assert delays == [0.5, 1.0]
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+    # Every failed session was closed before reconnecting
+    assert [session.closed for session in smtp.sessions] == [True, True, False]
+
+def test_a_failed_login_closes_the_socket_on_every_attempt(smtp, monkeypatch):
+    monkeypatch.setattr(notifications.time, 'sleep', lambda seconds: None)
+    smtp.fail_login = True
+    dispatcher = NotificationDispatcher(EMAIL_CONFIG, {'max_retries': 2})
+
+    assert not dispatcher.deliver([alert(), alert()])
+    assert len(smtp.sessions) == 3
+    assert all(session.closed for session in smtp.sessions)
+    assert (dispatcher.sent, dispatcher.failed) == (0, 2)
+
+def test_a_full_queue_drops_and_counts_new_alerts(smtp):
+    dispatcher = NotificationDispatcher(EMAIL_CONFIG, {'queue_size': 2})
+    results = [dispatcher.submit(alert()) for _ in range(5)]
+
+    assert results == [True, True, False, False, False]
+    assert dispatcher.dropped == 3
+
+def test_a_bad_alert_does_not_stop_the_worker(smtp):
+    dispatcher = NotificationDispatcher(EMAIL_CONFIG, {'batch_window': 0.05})
+    dispatcher.start()
+    dispatcher.submit({'metric': 'cpu_usage'})
+    time.sleep(0.3)
+    dispatcher.submit(alert())
+    dispatcher.stop(5)
+
+    assert (dispatcher.sent, dispatcher.failed) == (1, 1)
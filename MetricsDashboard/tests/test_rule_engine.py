@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from alert_system import AlertSystem
+from rule_engine import RollingWindow, Rule
+
+START = datetime(2025, 1, 1)
+
+def feed(rule, values, step=10, metric='cpu_usage'):
+    """Evaluate one sample per value, step seconds apart; returns the offsets at which the rule fired"""
+    fired = []
+    for i, value in enumerate(values):
+        if rule.evaluate({metric: value}, START + timedelta(seconds=i * step)):
+            fired.append(i * step)
+    return fired
+
+def test_window_aggregates_match_a_full_rescan():
+    rng = np.random.default_rng(4)
+    timestamps = np.cumsum(rng.uniform(0.1, 5, 2000))
+    values = rng.normal(50, 20, 2000)
+    window = RollingWindow(window=30)
+
+    for i, (timestamp, value) in enumerate(zip(timestamps, values)):
+        window.add(timestamp, value)
+        held = values[:i + 1][timestamps[:i + 1] >= timestamp - 30]
+        assert window.value('avg') == pytest.approx(held.mean())
+        assert window.value('sum') == pytest.approx(held.sum())
+        assert window.value('min') == held.min()
+        assert window.value('max') == held.max()
+        assert window.value('count') == len(held)
+        assert window.value('last') == value
+
+def test_sample_count_window_and_rate():
+    window = RollingWindow(max_samples=3)
+    for timestamp, value in enumerate([5.0, 1.0, 4.0, 9.0, 2.0]):
+        window.add(float(timestamp), value)
+    assert (window.value('min'), window.value('max'), window.value('count')) == (2.0, 9.0, 3.0)
+    assert window.value('rate') == pytest.approx((2.0 - 4.0) / 2)
+
+def test_clock_going_backwards_restarts_the_window():
+    window = RollingWindow(window=60)
+    window.add(100.0, 90.0)
+    window.add(50.0, 10.0)
+    assert (window.value('max'), window.value('count')) == (10.0, 1.0)
+
+def test_covers_needs_the_samples_to_span_the_window():
+    window = RollingWindow(window=60)
+    assert not window.covers(0.9)
+    for timestamp in range(0, 60, 10):
+        window.add(float(timestamp), 1.0)
+        assert not window.covers(0.9)
+    window.add(60.0, 1.0)
+    assert window.covers(0.9)
+    assert RollingWindow(max_samples=1).covers(0.9)
+
+def test_windowed_rule_does_not_fire_before_its_window_is_covered():
+    rule = Rule('cpu', 'min(cpu_usage, 60s) > 90', min_coverage=0.9)
+    # Every sample breaches, but the first ones would stand in for the whole minute
+    assert feed(rule, [99.0] * 10) == [60]
+
+def test_for_duration_holds_then_fires_once_and_rearms():
+    rule = Rule('cpu', 'cpu_usage > 80 for 30s')
+    assert feed(rule, [90, 90, 90, 90, 90, 50, 90, 90, 90, 90]) == [30, 90]
+
+def test_for_samples_needs_consecutive_breaches():
+    rule = Rule('cpu', 'cpu_usage > 80 for 3 samples')
+    assert feed(rule, [90, 90, 50, 90, 90, 90, 90]) == [50]
+
+def test_response_time_alerts_come_from_its_rule_not_a_threshold():
+    alert_system = AlertSystem()
+    assert alert_system.check_thresholds({'response_time': 5000}) == []
+
+    fired = []
+    for i in range(12):
+        sample = {'timestamp': START + timedelta(seconds=i * 10), 'response_time': 2500.0}
+        fired += [(i * 10, alert['rule']) for alert in alert_system.check_rules(sample)]
+    # avg(response_time, 60s) > 2000 for 3 samples: the window is first covered at 60s, then held for 3 samples
+    assert fired == [(80, 'response_time_sustained')]
+
+    remote = alert_system.check_rules({'timestamp': START, 'response_time': 2500.0}, host='web-1')
+    assert remote == [] and 'web-1' in alert_system.host_rule_engines
@@ -0,0 +1,61 @@
+import json
+import multiprocessing
+import os
+import numpy as np
+from segments import SegmentStore, INDEX_FILE
+
+DAY_NS = 86400 * 10**9
+BASE_NS = 20000 * DAY_NS  # 2024-10-05, well inside retention of the store below
+
+def open_store(directory):
+    return SegmentStore(directory, segment_seconds=86400, retention_days=100000)
+
+def merge_days(directory, days, offset, barrier):
+    store = open_store(directory)
+    barrier.wait()
+    for day in days:
+        # Both processes also write into one shared day, at different timestamps
+        for start in (BASE_NS + day * DAY_NS, BASE_NS):
+            times = start + np.arange(offset, 100, 2, dtype=np.int64) * 10**9
+            store.merge({'cpu_usage': (times, times.astype(np.float64))})
+
+def test_merge_round_trips_and_skips_stored_samples(tmp_path):
+    store = open_store(str(tmp_path))
+    times = BASE_NS + np.arange(0, 3 * DAY_NS, DAY_NS // 4, dtype=np.int64)
+    added = store.merge({'revenue': (times, np.arange(len(times), dtype=np.float64))})
+
+    assert len(added['revenue'][0]) == len(times)
+    assert len(store.segments) == 3
+    assert store.merge({'revenue': (times, np.zeros(len(times)))}) == {}
+
+    stored_times, stored_values = store.arrays('revenue')
+    np.testing.assert_array_equal(stored_times.view(np.int64), times)
+    np.testing.assert_array_equal(stored_values, np.arange(len(times)))
+
+def test_concurrent_merges_from_two_processes_keep_every_segment(tmp_path):
+    directory = str(tmp_path)
+    open_store(directory)
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(2)
+    workers = [
+        context.Process(target=merge_days, args=(directory, range(1 + offset, 25, 2), offset, barrier))
+        for offset in (0, 1)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+        index = json.load(f)
+    starts = sorted(entry['start'] for entry in index['segments'])
+    assert starts == [BASE_NS + day * DAY_NS for day in range(25)]
+
+    # Every directory on disk is indexed, so no merge was lost and none left behind
+    paths = {entry['path'] for entry in index['segments']}
+    assert {name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))} == paths
+
+    # The shared day holds both processes' samples
+    times, _ = open_store(directory).arrays('cpu_usage', end=np.datetime64(BASE_NS + DAY_NS - 1, 'ns'))
+    np.testing.assert_array_equal(times.view(np.int64), BASE_NS + np.arange(100, dtype=np.int64) * 10**9)
@@ -0,0 +1,26 @@
+import time
+from ingest_server import parse_line
+from series_index import SeriesIndex
+from storage import MetricsStorage
+
+def test_load_remote_seeds_latest_points_then_tails_new_ones(tmp_path):
+    now = int(time.time())
+    writer = MetricsStorage(db_path=str(tmp_path / 'metrics.db'))
+    writer.write_points([
+        parse_line(f"cpu_usage,host=web-{host},region=eu {value} {now + value}", 0)
+        for host in (1, 2) for value in (10, 20)
+    ])
+    writer.flush()
+
+    # Seeded from what an ingest server in another process stored
+    index = SeriesIndex()
+    last_id = index.load_remote(MetricsStorage(db_path=str(tmp_path / 'metrics.db')))
+    series = index.select('cpu_usage{region="eu"}')
+    assert [index.labels(series_id)['host'] for series_id in series] == ['web-1', 'web-2']
+    assert index.latest[series].tolist() == [20.0, 20.0]
+
+    writer.write_points([parse_line(f"memory_usage,host=db-1 55 {now + 100}", 0)])
+    writer.flush()
+    index.load_remote(writer, last_id)
+    assert index.frame(index.select('{host="db-1"}'))['value'].tolist() == [55.0]
+    writer.close()
@@ -0,0 +1,80 @@
+import math
+import numpy as np
+import pytest
+from sketches import DDSketch
+
+QUANTILES = [0.0, 0.01, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0]
+
+def exact_quantile(values, q):
+    # The sketch ranks like this too: the value at index floor(q * (n - 1))
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+def assert_relative_accuracy(sketch, values, accuracy):
+    for q in QUANTILES:
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= accuracy * abs(expected) + 1e-12, q
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_relative_accuracy_on_heavy_tailed_values(accuracy):
+    values = np.random.default_rng(1).lognormal(6, 1.5, 20000)
+    sketch = DDSketch(relative_accuracy=accuracy)
+    for value in values:
+        sketch.add(value)
+    assert_relative_accuracy(sketch, values, accuracy)
+
+def test_relative_accuracy_with_negatives_and_zeros():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([-rng.lognormal(2, 1, 3000), np.zeros(500), rng.lognormal(4, 1, 6000)])
+    assert_relative_accuracy(DDSketch.from_values(values, relative_accuracy=0.01), values, 0.01)
+
+def test_from_values_matches_repeated_add():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.lognormal(5, 2, 5000), -rng.lognormal(1, 1, 500), [0.0, 0.0, -0.0]])
+    added = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        added.add(value)
+    built = DDSketch.from_values(values, relative_accuracy=0.01)
+
+    assert built.positive == added.positive
+    assert built.negative == added.negative
+    assert (built.zero_count, built.count, built.min, built.max) == (added.zero_count, added.count, added.min, added.max)
+    assert math.isclose(built.total, added.total, rel_tol=1e-9)
+    assert built.quantiles(QUANTILES) == added.quantiles(QUANTILES)
+
+def test_from_values_skips_nan():
+    sketch = DDSketch.from_values([1.0, np.nan, 2.0])
+    assert sketch.count == 2
+    assert DDSketch.from_values([np.nan]).quantile(0.5) is None
+
+def test_merge_matches_one_sketch_of_all_values():
+    values = np.random.default_rng(4).lognormal(3, 1, 9000)
+    merged = DDSketch.from_values(values[:1000])
+    merged.merge(DDSketch.from_values(values[1000:5000])).merge(DDSketch.from_values(values[5000:]))
+    whole = DDSketch.from_values(values)
+    assert merged.positive == whole.positive
+    assert merged.count == whole.count
+    assert merged.quantiles(QUANTILES) == whole.quantiles(QUANTILES)
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(relative_accuracy=0.01).merge(DDSketch.from_values([1.0], relative_accuracy=0.02))
+
+def test_collapse_keeps_quantiles_above_the_folded_bin_accurate():
+    # Too many bins for max_bins: the smallest ones are folded into one, so only
+    # quantiles that fall in that bin lose accuracy
+    values = np.random.default_rng(5).lognormal(0, 2, 20000)
+    sketch = DDSketch.from_values(values, relative_accuracy=0.01, max_bins=256)
+    assert len(sketch.positive) == 256
+    folded_upper = sketch.gamma ** min(sketch.positive)
+    checked = [q for q in QUANTILES if exact_quantile(values, q) > folded_upper]
+    assert 0.99 in checked
+    for q in checked:
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected
+
+def test_bytes_roundtrip():
+    values = np.random.default_rng(6).normal(0, 100, 5000)
+    sketch = DDSketch.from_values(values)
+    restored = DDSketch.from_bytes(sketch.to_bytes())
+    assert (restored.positive, restored.negative, restored.zero_count) == (sketch.positive, sketch.negative, sketch.zero_count)
+    assert (restored.count, restored.total, restored.min, restored.max) == (sketch.count, sketch.total, sketch.min, sketch.max)
@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import datetime, timedelta
+from storage import MetricsStorage
+
+class LockedConnection:
+    """Stands in for the storage connection, failing writes like a database another process has locked"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.locked = True
+
+    def executemany(self, *args):
+        if self.locked:
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def write_samples(storage, count, start=0):
+    now = datetime.now().replace(microsecond=0)
+    for i in range(start, start + count):
+        storage.write_sample({'timestamp': now - timedelta(seconds=100 - i), 'cpu_usage': float(i)})
+
+def stored_count(db_path, query="SELECT COUNT(*) FROM samples"):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_failed_flush_keeps_rows_and_writes_them_later(tmp_path):
+    db_path = str(tmp_path / 'metrics.db')
+    storage = MetricsStorage(db_path=db_path, batch_size=1000, flush_interval=3600)
+    write_samples(storage, 10)
+    locked = storage.conn = LockedConnection(storage.conn)
+
+    assert storage.flush() == 0
+    assert len(storage.pending) == 10
+    # Queued rows are still visible to queries while they wait
+    assert storage.query_window(['cpu_usage'])['cpu_usage'].tolist() == [float(i) for i in range(10)]
+
+    write_samples(storage, 5, start=10)
+    locked.locked = False
+    assert storage.flush() == 15
+    assert storage.pending == []
+    assert stored_count(db_path) == 15
+    # The rollup buckets drained by the failed flush were put back and written too
+    assert stored_count(db_path, "SELECT SUM(count) FROM rollups WHERE tier = '1m' AND metric = 'cpu_usage'") == 15
+    storage.close()
+
+def test_pending_rows_are_capped_while_flushes_keep_failing(tmp_path):
+    storage = MetricsStorage(db_path=str(tmp_path / 'metrics.db'), batch_size=1000, flush_interval=3600, max_pending=8)
+    storage.conn = LockedConnection(storage.conn)
+    write_samples(storage, 5)
+    storage.flush()
+    write_samples(storage, 5, start=5)
+    storage.flush()
+
+    assert storage.dropped == 2
+    assert [row[2] for row in storage.pending] == [float(i) for i in range(2, 10)]
@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from alert_system import AlertSystem
+from storage import MetricsStorage, from_epoch
+from aggregates import MetricAggregator
+from series_index import SeriesIndex
+from segments import SegmentStore
+from metrics_store import MetricsRingBuffer
+import config
+
+class MetricsViewer:
+    def __init__(self, interval=None, storage=None):
+        self.interval = interval or config.COLLECTOR_INTERVAL
+        self.storage = storage or MetricsStorage()
+        self.alert_system = AlertSystem(storage=self.storage)
+        self.aggregates = MetricAggregator()
+        # Remote series are read back from what the ingest server has stored
+        self.series_index = SeriesIndex()
+        self._last_point_id = None
+        # Segments are sealed by the collector daemon; this only maps them for reading
+        self.segments = SegmentStore()
+        self.history = MetricsRingBuffer(config.MAX_DATA_POINTS)
+
+        self.sequence = 0
+        self._latest = {family: {} for family in config.METRIC_FAMILIES}
+        self._last_sample_ns = None
+        # The alert store loaded the stored alerts; only rows after these are tailed
+        self._last_alert_id = self.storage.last_alert_id()
+
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Read what the collector daemon has written so far before the first render
+        self.refresh()
+
+    def refresh(self):
+        """Tail storage for samples and alerts written since the last refresh"""
+        families = {}
+        for family, metrics in config.METRIC_FAMILIES.items():
+            # Storage keeps every value as REAL; restore whole numbers to ints for display
+            families[family] = {
+                metric: int(value) if isinstance(value, float) and value.is_integer() else value
+                for metric, value in self.storage.latest_values(metrics).items()
+            }
+
+        for family, family_metrics in families.items():
+            self.series_index.observe_sample(family_metrics, {'host': 'local', 'family': family})
+        self._last_point_id = self.series_index.load_remote(self.storage, self._last_point_id)
+
+        # Rows are matched on their exact nanosecond timestamp, with a second of
+        # overlap in the query so float rounding at the boundary never drops one
+        metrics = [metric for family in config.METRIC_FAMILIES.values() for metric in family]
+        if self._last_sample_ns is None:
+            longest = max(window for window, _ in self.aggregates.windows.values())
+            df = self.storage.query_window(self.aggregates.metrics, start=datetime.now() - timedelta(seconds=longest))
+            self.aggregates.backfill(df)
+            df = self.storage.query_window(metrics, limit=self.history.capacity)
+        else:
+            df = self.storage.query_window(metrics, start=from_epoch(self._last_sample_ns / 1e9 - 1))
+            df = df[df['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64) > self._last_sample_ns]
+            self.aggregates.backfill(df)
+        if len(df):
+            self.history.extend(df)
+            self._last_sample_ns = int(df['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64).max())
+
+        if self.storage.last_alert_id() < self._last_alert_id:
+            # Retention emptied the alerts table, so rowids started over
+            self._last_alert_id = 0
+        self._last_alert_id, alerts = self.storage.query_alerts_after(self._last_alert_id)
+        self.alert_system.alert_store.load(alerts)
+
+        with self._condition:
+            self._latest = families
+            self.sequence += 1
+            self._condition.notify_all()
+
+    def start(self):
+        """Start the background thread that tails storage"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-viewer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop tailing storage"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh metrics from storage: {str(e)}")
+
+    def latest(self, family=None):
+        """Get the latest stored sample, merged or for one metric family"""
+        with self._condition:
+            if family is not None:
+                return dict(self._latest[family])
+            return {**self._latest['system'], **self._latest['business'], **self._latest['server']}
+
+    def has_sample(self):
+        """Whether the collector daemon has written any sample yet"""
+        with self._condition:
+            return any(self._latest.values())
+
+    def wait_for_sample(self, after_sequence, timeout=None):
+        """Block until a refresh newer than after_sequence is published"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after_sequence, timeout)
+            return self.sequence